@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Materialized per-category aggregates for /products.
+
+Instead of a GROUP BY over every product on each cache miss (O(rows)),
+a small `category_stats` table holds count / sum / max per category and is
+kept up to date by triggers on `products` - in the same transaction as the
+write, whatever code path does the write. Reading it is O(categories).
+
+    INSERT product → count + 1, sum + price, max = GREATEST(max, price)
+                     (NULL price: counted, but left out of sum / avg / max;
+                      NULL category: not summarized at all)
+    DELETE product → count - 1, sum - price,
+                     if it WAS the max: max = MAX(price) for that category
+                     (an index lookup on (category, price), not a scan)
+    UPDATE product → remove old row + add new row
+
+Maintenance:
+    python aggregates.py install   # create table, index and triggers
+    python aggregates.py rebuild   # recompute everything from products
+    python aggregates.py check     # compare with a live GROUP BY
+"""
+
+import argparse
+
+# Same semantics as the GROUP BY: COUNT(*) counts every product, AVG/MAX skip
+# NULL prices (priced_count is AVG's denominator). NULL categories have no row.
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS category_stats (
+        category VARCHAR(50) PRIMARY KEY,
+        product_count INT NOT NULL DEFAULT 0,
+        priced_count INT NOT NULL DEFAULT 0,
+        price_sum DECIMAL(20,2) NOT NULL DEFAULT 0,
+        max_price DECIMAL(10,2) NULL
+    )
+    ''',
+    # Makes "recompute max after delete" an index lookup
+    'CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price)',
+    '''
+    CREATE OR REPLACE TRIGGER products_stats_insert AFTER INSERT ON products FOR EACH ROW
+    BEGIN
+        IF NEW.category IS NOT NULL THEN
+            INSERT INTO category_stats (category, product_count, priced_count, price_sum, max_price)
+            VALUES (NEW.category, 1, NEW.price IS NOT NULL, COALESCE(NEW.price, 0), NEW.price)
+            ON DUPLICATE KEY UPDATE
+                product_count = product_count + 1,
+                priced_count = priced_count + (NEW.price IS NOT NULL),
+                price_sum = price_sum + COALESCE(NEW.price, 0),
+                max_price = COALESCE(GREATEST(max_price, NEW.price), max_price, NEW.price);
+        END IF;
+    END
+    ''',
+    '''
+    CREATE OR REPLACE TRIGGER products_stats_delete AFTER DELETE ON products FOR EACH ROW
+    BEGIN
+        IF OLD.category IS NOT NULL THEN
+            UPDATE category_stats
+               SET product_count = product_count - 1,
+                   priced_count = priced_count - (OLD.price IS NOT NULL),
+                   price_sum = price_sum - COALESCE(OLD.price, 0)
+             WHERE category = OLD.category;
+            -- A NULL max here means the summary lost track: recompute rather than skip
+            IF OLD.price >= COALESCE((SELECT max_price FROM category_stats WHERE category = OLD.category), OLD.price) THEN
+                UPDATE category_stats
+                   SET max_price = (SELECT MAX(price) FROM products WHERE category = OLD.category)
+                 WHERE category = OLD.category;
+            END IF;
+        END IF;
+    END
+    ''',
+    '''
+    CREATE OR REPLACE TRIGGER products_stats_update AFTER UPDATE ON products FOR EACH ROW
+    BEGIN
+        IF NOT (OLD.category <=> NEW.category AND OLD.price <=> NEW.price) THEN
+            IF OLD.category IS NOT NULL THEN
+                UPDATE category_stats
+                   SET product_count = product_count - 1,
+                       priced_count = priced_count - (OLD.price IS NOT NULL),
+                       price_sum = price_sum - COALESCE(OLD.price, 0)
+                 WHERE category = OLD.category;
+            END IF;
+            IF NEW.category IS NOT NULL THEN
+                INSERT INTO category_stats (category, product_count, priced_count, price_sum, max_price)
+                VALUES (NEW.category, 1, NEW.price IS NOT NULL, COALESCE(NEW.price, 0), NEW.price)
+                ON DUPLICATE KEY UPDATE
+                    product_count = product_count + 1,
+                    priced_count = priced_count + (NEW.price IS NOT NULL),
+                    price_sum = price_sum + COALESCE(NEW.price, 0),
+                    max_price = COALESCE(GREATEST(max_price, NEW.price), max_price, NEW.price);
+            END IF;
+            IF OLD.category IS NOT NULL
+               AND OLD.price >= COALESCE((SELECT max_price FROM category_stats WHERE category = OLD.category), OLD.price) THEN
+                UPDATE category_stats
+                   SET max_price = (SELECT MAX(price) FROM products WHERE category = OLD.category)
+                 WHERE category = OLD.category;
+            END IF;
+        END IF;
+    END
+    ''',
+]
+
+TRIGGERS = ('products_stats_insert', 'products_stats_delete', 'products_stats_update')
+
+READ_QUERY = '''
+    SELECT category, product_count as count,
+           CAST(price_sum / NULLIF(priced_count, 0) AS DOUBLE) as avg_price,
+           CAST(max_price AS DOUBLE) as max_price
+    FROM category_stats
+    WHERE product_count > 0
+    ORDER BY avg_price DESC
+'''
+
+GROUP_BY_QUERY = '''
+    SELECT category, COUNT(*) as count,
+           CAST(AVG(price) AS DOUBLE) as avg_price, CAST(MAX(price) AS DOUBLE) as max_price
+    FROM products
+    WHERE category IS NOT NULL
+    GROUP BY category
+    ORDER BY avg_price DESC
+'''
+
+
+def install(conn):
+    """Create the summary table, index and triggers (idempotent)."""
+    with conn.cursor() as cur:
+        for statement in SCHEMA:
+            cur.execute(statement)
+        # Tables from before priced_count existed: add it and recount
+        upgraded = cur.execute("SHOW COLUMNS FROM category_stats LIKE 'priced_count'") == 0
+        if upgraded:
+            cur.execute('ALTER TABLE category_stats ADD COLUMN priced_count INT NOT NULL DEFAULT 0 AFTER product_count')
+    conn.commit()
+    if upgraded:
+        rebuild(conn)
+
+
+def drop_triggers(conn):
+    """Bulk loads can drop the triggers and rebuild() afterwards."""
+    with conn.cursor() as cur:
+        for name in TRIGGERS:
+            cur.execute(f'DROP TRIGGER IF EXISTS {name}')
+    conn.commit()
+
+
+def rebuild(conn):
+    """Recompute every category from scratch (reconciliation). Returns categories written."""
+    with conn.cursor() as cur:
+        cur.execute('DELETE FROM category_stats')
+        cur.execute('''
+            INSERT INTO category_stats (category, product_count, priced_count, price_sum, max_price)
+            SELECT category, COUNT(*), COUNT(price), COALESCE(SUM(price), 0), MAX(price)
+            FROM products
+            WHERE category IS NOT NULL
+            GROUP BY category
+        ''')
+        written = cur.rowcount
+    conn.commit()
+    return written
+
+
+def read(conn):
+    """Per-category count / avg / max - O(categories)."""
+    with conn.cursor() as cur:
+        cur.execute(READ_QUERY)
+        return cur.fetchall()
+
+
+def _rounded(value):
+    # avg is NULL for a category whose prices are all NULL
+    return None if value is None else round(value, 4)
+
+
+def check(conn):
+    """Return categories where the summary disagrees with a live GROUP BY."""
+    with conn.cursor() as cur:
+        cur.execute(GROUP_BY_QUERY)
+        expected = {row['category']: row for row in cur.fetchall()}
+    actual = {row['category']: row for row in read(conn)}
+
+    mismatches = []
+    for category in sorted(set(expected) | set(actual), key=str):
+        want, got = expected.get(category), actual.get(category)
+        if want is None or got is None or want['count'] != got['count'] \
+                or _rounded(want['avg_price']) != _rounded(got['avg_price']) \
+                or want['max_price'] != got['max_price']:
+            mismatches.append({'category': category, 'expected': want, 'actual': got})
+    return mismatches
+
+
+def main():
+    from app import connect_db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['install', 'rebuild', 'check'])
+    args = parser.parse_args()
+
+    conn = connect_db()
+    try:
+        if args.command == 'install':
+            install(conn)
+            print('category_stats table, index and triggers installed')
+        elif args.command == 'rebuild':
+            print(f'Rebuilt {rebuild(conn)} categories from products')
+        else:
+            mismatches = check(conn)
+            for m in mismatches:
+                print(f"MISMATCH {m['category']}: expected {m['expected']} got {m['actual']}")
+            print('category_stats matches products' if not mismatches else f'{len(mismatches)} mismatches - run rebuild')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,67 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 import redis
 import pymysql
-import time
 import os
 import json
+import math
+from db_pool import ConnectionPool
+import cache_aside
+from cache_aside import CacheAside
+from two_tier import LocalCache, InvalidationBus
+import customer_cache
+from customer_cache import CustomerCache
+from codec import make_codec
+import aggregates
+import seed
 
 app = Flask(__name__)
 
 redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, decode_responses=True)
+# Cached query results are bytes written by a codec (see codec.py)
+redis_binary = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379)
 
 # Counters to track database vs cache hits
+# cache_hits = l1_hits + l2_hits
 stats = {
     'db_hits': 0,
-    'cache_hits': 0
+    'cache_hits': 0,
+    'l1_hits': 0,
+    'l2_hits': 0
 }
 
-def get_db():
+# L1: in-process cache in front of Redis (L2), kept coherent via pub/sub
+L1_TTL = float(os.getenv('L1_TTL', 5))
+local_cache = LocalCache(max_entries=int(os.getenv('L1_MAX_ENTRIES', 1024)), default_ttl=L1_TTL)
+invalidation_bus = InvalidationBus(redis_client, local_cache)
+
+def connect_db(**kwargs):
+    """Open a brand new connection (TCP + auth handshake every time)"""
     return pymysql.connect(
         host=os.getenv('DB_HOST', 'localhost'),
         user='user',
         password='pass',
         database='testdb',
-        cursorclass=pymysql.cursors.DictCursor
+        cursorclass=pymysql.cursors.DictCursor,
+        **kwargs
     )
 
+# Reuse warm connections instead of connecting on every cache miss
+db_pool = ConnectionPool(
+    connect_db,
+    size=int(os.getenv('DB_POOL_SIZE', 5)),
+    max_overflow=int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', 5))
+)
+
+def get_db():
+    """Check out a pooled connection - close() / `with` returns it to the pool"""
+    return db_pool.connection()
+
+INITIAL_PRODUCTS = int(os.getenv('INITIAL_PRODUCTS', 10000))
+
 def init_db():
-    time.sleep(10)
+    # Wait until MariaDB accepts connections (retry with backoff, no fixed sleep)
+    seed.wait_for_db(connect_db).close()
     conn = get_db()
     with conn.cursor() as cur:
         cur.execute('''
@@ -37,11 +73,13 @@ def init_db():
                 description TEXT
             )
         ''')
+    # Per-category summary kept current by triggers (before seeding, so it counts the seed)
+    aggregates.install(conn)
+    with conn.cursor() as cur:
         cur.execute('SELECT COUNT(*) as cnt FROM products')
         if cur.fetchone()['cnt'] == 0:
-            for i in range(100):
-                values = ','.join([f"('Product {i*100+j}', {10+j*0.5}, 'Category {j%10}', 'Description for product {i*100+j}')" for j in range(100)])
-                cur.execute(f"INSERT INTO products (name, price, category, description) VALUES {values}")
+            # Small demo catalog - use seed.py for millions of rows
+            seed.seed_executemany(conn, seed.generate_rows(INITIAL_PRODUCTS))
 
         # Customers table for TTL demo
         cur.execute('''
@@ -57,58 +95,97 @@ def init_db():
             cur.execute("INSERT INTO customers (name, email, points) VALUES ('Alice', 'alice@test.com', 100)")
             cur.execute("INSERT INTO customers (name, email, points) VALUES ('Bob', 'bob@test.com', 200)")
         conn.commit()
+
+        # Products seeded before the triggers existed - build the summary once
+        cur.execute('SELECT COUNT(*) as cnt FROM category_stats')
+        if cur.fetchone()['cnt'] == 0:
+            aggregates.rebuild(conn)
     conn.close()
 
 def query_from_db():
     """Execute database query and increment counter"""
     stats['db_hits'] += 1
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute('''
-            SELECT category, COUNT(*) as count, AVG(price) as avg_price, MAX(price) as max_price
-            FROM products
-            GROUP BY category
-            ORDER BY avg_price DESC
-        ''')
-        result = cur.fetchall()
-    conn.close()
-    # Convert Decimal to float for JSON
-    for row in result:
-        row['avg_price'] = float(row['avg_price'])
-        row['max_price'] = float(row['max_price'])
-    return result
+    # Pre-aggregated per category (see aggregates.py) - O(categories), not O(rows)
+    with get_db() as conn:
+        return aggregates.read(conn)
+
+
+# json | msgpack | prerendered (keep the HTTP JSON bytes, no decode on a hit)
+# optionally compressed with zlib / lz4 above CACHE_COMPRESS_THRESHOLD bytes
+cache_codec = make_codec(
+    os.getenv('CACHE_CODEC', 'prerendered'),
+    compression=os.getenv('CACHE_COMPRESSION') or None,
+    threshold=int(os.getenv('CACHE_COMPRESS_THRESHOLD', 1024))
+)
+products_cache = CacheAside(redis_binary, codec=cache_codec)
 
 
+def data_response(data, **fields):
+    """
+    JSON response with `data` first. Pre-rendered JSON bytes are spliced in
+    as-is - only the small per-request fields get encoded.
+    """
+    if isinstance(data, bytes):
+        tail = json.dumps(fields, separators=(',', ':'))[1:]
+        body = b'{"data":' + data + (b',' + tail.encode() if fields else b'}')
+        return Response(body, mimetype='application/json')
+    return jsonify({'data': data, **fields})
+
+PRODUCT_SOURCE_MESSAGES = {
+    cache_aside.HIT: 'Data served from Redis - no database query needed',
+    cache_aside.STALE: 'Expired entry served while another request refreshes it',
+    cache_aside.SHARED: 'Waited for another request to refresh the cache',
+    cache_aside.MISS: 'Cache miss - data fetched from database and cached',
+    cache_aside.EARLY_REFRESH: 'Entry close to expiry - refreshed early from database',
+}
+
 @app.route('/products')
 def products_with_cache():
     """
     Get products with Redis caching.
     Demonstrates: Cache reduces database load by serving repeated requests from memory.
     """
-    cache_key = 'products:stats'
-    cached = redis_client.get(cache_key)
-
-    if cached:
+    cached = local_cache.get('products:stats')
+    if cached is not None:
         stats['cache_hits'] += 1
-        return jsonify({
-            'data': json.loads(cached),
-            'source': 'CACHE (Redis)',
-            'message': 'Data served from Redis - no database query needed',
-            'db_hits_total': stats['db_hits'],
-            'cache_hits_total': stats['cache_hits']
-        })
-
-    # Cache miss - must query database
-    result = query_from_db()
-    redis_client.setex(cache_key, 60, json.dumps(result))  # Cache for 60 seconds
-
-    return jsonify({
-        'data': result,
-        'source': 'DATABASE (MySQL)',
-        'message': 'Cache miss - data fetched from database and cached',
-        'db_hits_total': stats['db_hits'],
-        'cache_hits_total': stats['cache_hits']
-    })
+        stats['l1_hits'] += 1
+        return data_response(
+            cached,
+            source='CACHE (L1 in-process)',
+            cache_status=cache_aside.HIT,
+            message='Data served from this app\'s memory - no network round trip',
+            db_hits_total=stats['db_hits'],
+            cache_hits_total=stats['cache_hits']
+        )
+
+    # Only one caller recomputes on a miss; others wait or get the stale copy.
+    # Entries near expiry are refreshed early so the 60s TTL never herds.
+    result, source = products_cache.get_or_compute('products:stats', 60, query_from_db)
+    if source != cache_aside.STALE:
+        local_cache.set('products:stats', result)
+
+    if source in (cache_aside.HIT, cache_aside.STALE, cache_aside.SHARED):
+        stats['cache_hits'] += 1
+        stats['l2_hits'] += 1
+        return data_response(
+            result,
+            source='CACHE (Redis)',
+            cache_status=source,
+            codec=cache_codec.name,
+            message=PRODUCT_SOURCE_MESSAGES[source],
+            db_hits_total=stats['db_hits'],
+            cache_hits_total=stats['cache_hits']
+        )
+
+    return data_response(
+        result,
+        source='DATABASE (MySQL)',
+        cache_status=source,
+        codec=cache_codec.name,
+        message=PRODUCT_SOURCE_MESSAGES[source],
+        db_hits_total=stats['db_hits'],
+        cache_hits_total=stats['cache_hits']
+    )
 
 
 @app.route('/products/no-cache')
@@ -127,7 +204,65 @@ def products_no_cache():
     })
 
 
+@app.route('/products/add')
+def add_product():
+    """
+    Insert a product - the category_stats trigger updates the aggregates
+    in the same transaction, no GROUP BY needed.
+    """
+    category = request.args.get('category', 'Category 0')
+    try:
+        price = float(request.args.get('price', 99.99))
+    except ValueError:
+        price = None
+    # products.price is DECIMAL(10,2)
+    if price is None or not math.isfinite(price) or not 0 <= price < 1e8:
+        return jsonify({'error': 'price must be a number between 0 and 99999999.99'}), 400
+    if not category or len(category) > 50:
+        return jsonify({'error': 'category must be 1-50 characters'}), 400
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute('INSERT INTO products (name, price, category, description) VALUES (%s, %s, %s, %s)',
+                    ('New product', price, category, 'Added via /products/add'))
+        product_id = cur.lastrowid
+        conn.commit()
+    invalidate_products()
+    return jsonify({'added': {'id': product_id, 'category': category, 'price': price},
+                    'message': 'Product added, category aggregates updated incrementally'})
+
+
+@app.route('/products/<int:product_id>/delete')
+def delete_product(product_id):
+    """Delete a product - if it was its category's max price, only that max is recomputed"""
+    with get_db() as conn, conn.cursor() as cur:
+        deleted = cur.execute('DELETE FROM products WHERE id = %s', (product_id,))
+        conn.commit()
+    if not deleted:
+        return jsonify({'error': 'product not found'}), 404
+    invalidate_products()
+    return jsonify({'deleted': product_id, 'message': 'Product deleted, category aggregates updated incrementally'})
+
+
+@app.route('/products/aggregates/rebuild')
+def rebuild_aggregates():
+    """Recompute category_stats from products (reconciliation)"""
+    with get_db() as conn:
+        categories = aggregates.rebuild(conn)
+        mismatches = aggregates.check(conn)
+    invalidate_products()
+    return jsonify({'categories_rebuilt': categories, 'mismatches_after_rebuild': mismatches})
+
+
+def invalidate_products():
+    products_cache.invalidate('products:stats')
+    invalidation_bus.invalidate('products:stats')
+
+
 CUSTOMER_CACHE_TTL = 10  # Short TTL for demo (10 seconds)
+# 'through' (DB + cache together) or 'behind' (cache now, DB in batches)
+CUSTOMER_WRITE_STRATEGY = os.getenv('CUSTOMER_WRITE_STRATEGY', customer_cache.WRITE_THROUGH)
+
+# One Redis hash per customer instead of a single customers:all blob
+customers = CustomerCache(redis_client, get_db, ttl=CUSTOMER_CACHE_TTL)
 
 @app.route('/customers')
 def get_customers():
@@ -136,32 +271,40 @@ def get_customers():
     Cache expires after 10 seconds - then fresh data is fetched.
     """
     cache_key = 'customers:all'
-    cached = redis_client.get(cache_key)
-    ttl = redis_client.ttl(cache_key)
+    local = local_cache.get_with_ttl(cache_key)
+    if local:
+        data, ttl = local[0], int(local[1])
+        stats['cache_hits'] += 1
+        stats['l1_hits'] += 1
+        return jsonify({
+            'data': data,
+            'source': 'CACHE (L1 in-process)',
+            'ttl_remaining': ttl,
+            'message': f'From this app\'s memory. Expires in {ttl}s. Update now and see stale data!'
+        })
 
-    if cached:
+    # All customer rows + TTLs in one pipeline; only missing rows hit MySQL
+    result, ttl, loaded = customers.get_all()
+    # Never keep the L1 copy longer than Redis would
+    local_cache.set(cache_key, result, min(L1_TTL, ttl))
+
+    if not loaded:
         stats['cache_hits'] += 1
+        stats['l2_hits'] += 1
         return jsonify({
-            'data': json.loads(cached),
-            'source': 'CACHE',
+            'data': result,
+            'source': 'CACHE (Redis)',
             'ttl_remaining': ttl,
             'message': f'From cache. Expires in {ttl}s. Update now and see stale data!'
         })
 
-    # Cache miss - query DB
     stats['db_hits'] += 1
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute('SELECT * FROM customers')
-        result = cur.fetchall()
-    conn.close()
-
-    redis_client.setex(cache_key, CUSTOMER_CACHE_TTL, json.dumps(result))
     return jsonify({
         'data': result,
         'source': 'DATABASE',
-        'ttl_remaining': CUSTOMER_CACHE_TTL,
-        'message': 'Fresh from DB and cached for 10s'
+        'rows_from_db': loaded,
+        'ttl_remaining': ttl,
+        'message': f'{loaded} row(s) fresh from DB and cached for {CUSTOMER_CACHE_TTL}s'
     })
 
 
@@ -171,15 +314,13 @@ def add_points(customer_id):
     Add points to customer - demonstrates stale cache problem.
     Data is updated in DB but cache still shows old value until TTL expires!
     """
-    conn = get_db()
-    with conn.cursor() as cur:
+    with get_db() as conn, conn.cursor() as cur:
         cur.execute('UPDATE customers SET points = points + 50 WHERE id = %s', (customer_id,))
         conn.commit()
         cur.execute('SELECT * FROM customers WHERE id = %s', (customer_id,))
         customer = cur.fetchone()
-    conn.close()
 
-    ttl = redis_client.ttl('customers:all')
+    ttl = redis_client.ttl(customer_cache.row_key(customer_id))
     return jsonify({
         'updated': customer,
         'cache_invalidated': False,
@@ -193,16 +334,16 @@ def add_points_with_invalidation(customer_id):
     """
     Add points AND invalidate cache - proper way to handle updates.
     """
-    conn = get_db()
-    with conn.cursor() as cur:
+    with get_db() as conn, conn.cursor() as cur:
         cur.execute('UPDATE customers SET points = points + 50 WHERE id = %s', (customer_id,))
         conn.commit()
         cur.execute('SELECT * FROM customers WHERE id = %s', (customer_id,))
         customer = cur.fetchone()
-    conn.close()
 
-    # Invalidate cache so next read gets fresh data
-    redis_client.delete('customers:all')
+    # Invalidate cache so next read gets fresh data:
+    # only this customer's row in Redis + the L1 copy held by EVERY app instance
+    customers.invalidate(customer_id)
+    invalidation_bus.invalidate('customers:all')
 
     return jsonify({
         'updated': customer,
@@ -211,6 +352,40 @@ def add_points_with_invalidation(customer_id):
     })
 
 
+@app.route('/customers/<int:customer_id>/add-points-write')
+def add_points_with_write_strategy(customer_id):
+    """
+    Add points through the cache (write-through or write-behind).
+    ?strategy=through|behind overrides CUSTOMER_WRITE_STRATEGY.
+    """
+    strategy = request.args.get('strategy', CUSTOMER_WRITE_STRATEGY)
+    if strategy not in customer_cache.STRATEGIES:
+        return jsonify({'error': f'unknown strategy {strategy!r}', 'choices': customer_cache.STRATEGIES}), 400
+
+    customer = customers.add_points(customer_id, 50, strategy)
+    if customer is None:
+        return jsonify({'error': 'customer not found'}), 404
+    invalidation_bus.invalidate('customers:all')
+
+    messages = {
+        customer_cache.WRITE_THROUGH: 'DB and cached row updated together - no stale data, no list rebuild',
+        customer_cache.WRITE_BEHIND: 'Cached row updated now - MySQL catches up in the next batch flush'
+    }
+    return jsonify({
+        'updated': customer,
+        'strategy': strategy,
+        'pending_db_writes': customers.pending(),
+        'message': messages[strategy]
+    })
+
+
+@app.route('/customers/flush')
+def flush_customer_writes():
+    """Flush write-behind point increments to MySQL now"""
+    flushed = customers.flush_pending()
+    return jsonify({'rows_flushed': flushed, 'write_stats': customers.stats})
+
+
 @app.route('/stats')
 def get_stats():
     """
@@ -220,12 +395,28 @@ def get_stats():
     total_requests = stats['db_hits'] + stats['cache_hits']
     cache_hit_rate = (stats['cache_hits'] / total_requests * 100) if total_requests > 0 else 0
 
+    def ratio(count):
+        return f"{(count / total_requests * 100) if total_requests > 0 else 0:.1f}%"
+
     return jsonify({
         'total_requests': total_requests,
         'db_hits': stats['db_hits'],
         'cache_hits': stats['cache_hits'],
         'cache_hit_rate': f"{cache_hit_rate:.1f}%",
+        'tiers': {
+            'l1_hits': stats['l1_hits'],
+            'l2_hits': stats['l2_hits'],
+            'db_hits': stats['db_hits'],
+            'l1_hit_rate': ratio(stats['l1_hits']),
+            'l2_hit_rate': ratio(stats['l2_hits']),
+            'db_rate': ratio(stats['db_hits']),
+            'l1_entries': len(local_cache),
+            'l1': local_cache.stats
+        },
         'db_queries_avoided': stats['cache_hits'],
+        'db_pool': db_pool.stats(),
+        'stampede_protection': products_cache.stats,
+        'customer_writes': customers.stats,
         'message': f"Redis cache prevented {stats['cache_hits']} database queries!"
     })
 
@@ -233,10 +424,13 @@ def get_stats():
 @app.route('/stats/reset')
 def reset_stats():
     """Reset statistics counters and clear all caches"""
-    stats['db_hits'] = 0
-    stats['cache_hits'] = 0
+    for key in stats:
+        stats[key] = 0
+    for key in products_cache.stats:
+        products_cache.stats[key] = 0
     redis_client.delete('products:stats')
-    redis_client.delete('customers:all')
+    customers.clear()
+    invalidation_bus.invalidate_all()
     return jsonify({'status': 'Stats and cache reset', 'db_hits': 0, 'cache_hits': 0})
 
 
@@ -257,6 +451,13 @@ def index():
                     '3. /stats → see 1 db_hit, 9 cache_hits'
                 ]
             },
+            'demo1b_materialized_aggregates': {
+                'endpoints': {
+                    '/products/add?category=Category 1&price=500': 'Insert a product (aggregates updated by trigger)',
+                    '/products/<id>/delete': 'Delete a product (max recomputed only if needed)',
+                    '/products/aggregates/rebuild': 'Full rebuild + consistency check'
+                }
+            },
             'demo2_cache_invalidation': {
                 'endpoints': {
                     '/customers': 'Get customers (cached 10s TTL)',
@@ -270,6 +471,18 @@ def index():
                     '4. Wait 10s or call /customers/1/add-points-invalidate',
                     '5. /customers → now shows updated points'
                 ]
+            },
+            'demo3_write_strategies': {
+                'endpoints': {
+                    '/customers/1/add-points-write?strategy=through': 'Update DB + cached row together',
+                    '/customers/1/add-points-write?strategy=behind': 'Update cached row, flush DB in batches',
+                    '/customers/flush': 'Flush pending write-behind increments now'
+                },
+                'try_this': [
+                    '1. /customers/1/add-points-write?strategy=behind (5 times)',
+                    '2. /customers → points already updated (served from cache)',
+                    '3. /stats → customer_writes: 5 pending increments, 1 DB update after flush'
+                ]
             }
         },
         'stats': {
@@ -281,4 +494,7 @@ def index():
 
 if __name__ == '__main__':
     init_db()
+    db_pool.start_reaper()
+    invalidation_bus.start()
+    customers.start_flusher(interval=float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 1)))
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: bytes stored and cache-hit latency per codec.
+
+"Hit latency" = decode the cached bytes + render the HTTP JSON body, which is
+what /products does on every cache hit. With --redis the Redis GET round trip
+is included too.
+
+    python bench_codec.py                    # CPU only, no services needed
+    python bench_codec.py --rows 5000        # bigger cached value
+    docker compose exec app python bench_codec.py --redis redis
+"""
+
+import argparse
+import json
+import random
+import time
+
+import codec as codecs
+
+CONFIGS = [
+    ('json', None), ('json', 'zlib'), ('json', 'lz4'),
+    ('msgpack', None), ('msgpack', 'zlib'), ('msgpack', 'lz4'),
+    ('prerendered', None), ('prerendered', 'zlib'), ('prerendered', 'lz4'),
+]
+
+
+def sample_rows(count):
+    """Rows shaped like the products table"""
+    rng = random.Random(42)
+    return [{
+        'id': i,
+        'name': f'Product {i}',
+        'price': round(rng.uniform(10, 60), 2),
+        'category': f'Category {i % 10}',
+        'description': f'Description for product {i}',
+    } for i in range(count)]
+
+
+def render(value, fields):
+    """Same work as app.data_response() without Flask"""
+    if isinstance(value, bytes):
+        return b'{"data":' + value + b',' + json.dumps(fields, separators=(',', ':'))[1:].encode()
+    return json.dumps({'data': value, **fields}).encode()
+
+
+def timeit(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help='rows in the cached value')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--threshold', type=int, default=1024, help='compress payloads above this size')
+    parser.add_argument('--redis', help='Redis host - include GET round trip in hit latency')
+    args = parser.parse_args()
+
+    rows = sample_rows(args.rows)
+    fields = {'source': 'CACHE (Redis)', 'cache_status': 'hit', 'db_hits_total': 1, 'cache_hits_total': 1}
+    client = None
+    if args.redis:
+        import redis
+        client = redis.Redis(host=args.redis, port=6379)
+
+    print(f"{args.rows} rows, {args.iterations} iterations\n")
+    print(f"{'codec':<20} {'bytes':>10} {'encode us':>10} {'hit us':>10}")
+    for name, compression in CONFIGS:
+        try:
+            c = codecs.make_codec(name, compression, args.threshold)
+        except ValueError as e:
+            label = name + (f'+{compression}' if compression else '')
+            print(f"{label:<20} skipped: {e}")
+            continue
+
+        data = c.encode(rows)
+        encode_us = timeit(lambda: c.encode_and_present(rows), args.iterations)
+
+        if client is not None:
+            key = f'bench:codec:{c.name}'
+            client.set(key, data)
+            hit = lambda: render(c.decode(client.get(key)), fields)
+        else:
+            hit = lambda: render(c.decode(data), fields)
+        hit_us = timeit(hit, args.iterations)
+
+        print(f"{c.name:<20} {len(data):>10} {encode_us:>10.1f} {hit_us:>10.1f}")
+        if client is not None:
+            client.delete(key)
+
+
+if __name__ == '__main__':
+    main()
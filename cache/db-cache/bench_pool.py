@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cache misses per second, connect-per-request vs connection pool.
+
+Simulates a cold-cache stampede: N threads all run the /products GROUP BY
+query at once. Run it inside the app container (or with DB_HOST set):
+
+    docker compose exec app python bench_pool.py --threads 20 --seconds 10
+"""
+
+import argparse
+import threading
+import time
+
+from app import connect_db
+from db_pool import ConnectionPool
+
+QUERY = '''
+    SELECT category, COUNT(*) as count, AVG(price) as avg_price, MAX(price) as max_price
+    FROM products
+    GROUP BY category
+    ORDER BY avg_price DESC
+'''
+
+
+def run_direct():
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute(QUERY)
+        cur.fetchall()
+    conn.close()
+
+
+def make_pooled(pool):
+    def run_pooled():
+        with pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(QUERY)
+            cur.fetchall()
+    return run_pooled
+
+
+def bench(name, fn, threads, seconds):
+    count = [0] * threads
+    latencies = [[] for _ in range(threads)]
+    stop_at = time.monotonic() + seconds
+
+    def worker(i):
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            fn()
+            latencies[i].append((time.perf_counter() - start) * 1000)
+            count[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.monotonic()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    all_latencies = sorted(l for per_thread in latencies for l in per_thread)
+    total = sum(count)
+    p50 = all_latencies[len(all_latencies) // 2] if all_latencies else 0
+    p99 = all_latencies[int(len(all_latencies) * 0.99)] if all_latencies else 0
+    print(f"{name:<10} {total:>8} misses  {total / elapsed:>9.1f} misses/s  "
+          f"p50 {p50:>7.2f} ms  p99 {p99:>7.2f} ms")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--pool-size', type=int, default=5)
+    parser.add_argument('--max-overflow', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.seconds}s per run\n")
+    direct = bench('direct', run_direct, args.threads, args.seconds)
+
+    pool = ConnectionPool(connect_db, size=args.pool_size, max_overflow=args.max_overflow, timeout=30)
+    pooled = bench('pooled', make_pooled(pool), args.threads, args.seconds)
+    pool_stats = pool.stats()
+    pool.close_all()
+
+    print(f"\nSpeedup: {pooled / direct:.2f}x")
+    print(f"Pool: created={pool_stats['created']} checkouts={pool_stats['checkouts']} "
+          f"waits={pool_stats['waits']} avg_wait={pool_stats['wait_time_avg_ms']}ms "
+          f"max_wait={pool_stats['wait_time_max_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
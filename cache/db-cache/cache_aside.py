@@ -0,0 +1,188 @@
+"""
+Cache-aside helper with stampede protection.
+
+Problem: when a hot key expires, every concurrent request misses at the same
+moment and they all run the same expensive query (thundering herd).
+
+Two defences:
+1. Single-flight - only ONE caller recomputes a key.
+     - within a worker process: other threads wait on an in-process Future
+     - across processes:        a Redis lock (SET NX PX) elects the recomputer,
+                                everyone else gets the stale value or waits
+2. Probabilistic early refresh ("XFetch") - each reader may recompute a bit
+   BEFORE expiry, with a probability that rises as expiry approaches and with
+   how slow the recompute is. Expiries stop lining up into a herd.
+
+Entries are stored as a Redis hash {v: encoded value, delta: recompute_seconds,
+exp: logical_expiry}; `v` is written by a pluggable codec (see codec.py), so
+the client must be created with decode_responses=False. The Redis TTL is
+longer than the logical TTL so a stale copy is still around to serve while
+one caller refreshes it.
+"""
+
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from codec import make_codec
+
+# Lua: delete the lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+# Sources returned alongside the value
+HIT = 'hit'                   # fresh value from Redis
+STALE = 'stale'               # expired value served while someone else refreshes
+MISS = 'miss'                 # this caller recomputed
+EARLY_REFRESH = 'early'       # this caller recomputed before expiry (XFetch)
+SHARED = 'shared'             # waited for another caller's recompute
+
+
+class CacheAside:
+    """
+    cache = CacheAside(redis_binary_client, codec=make_codec('msgpack'))
+    value, source = cache.get_or_compute('products:stats', 60, query_from_db)
+    """
+
+    def __init__(self, redis_client, codec=None, beta=1.0, stale_ttl=30, lock_ttl=10, wait_timeout=5.0):
+        self.redis = redis_client
+        self.codec = codec or make_codec('json')
+        self.beta = beta                  # >1 refreshes earlier, <1 later
+        self.stale_ttl = stale_ttl        # how long a stale copy survives past expiry
+        self.lock_ttl = lock_ttl          # recompute lock auto-expires (crashed holder)
+        self.wait_timeout = wait_timeout  # max time a caller waits for someone else
+        self._release = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+        self._inflight = {}               # key -> Future, recomputes running in this process
+        self._inflight_lock = threading.Lock()
+        self.stats = {'recomputes': 0, 'early_refreshes': 0, 'stale_served': 0, 'waits': 0}
+
+    def get_or_compute(self, key, ttl, compute):
+        """Return (value, source). `compute` is only called by the elected caller."""
+        entry = self._read(key)
+
+        if entry is not None:
+            now = time.time()
+            if now < entry['exp'] and not self._should_refresh_early(entry, now):
+                return entry['v'], HIT
+
+            # Expired (or picked for early refresh) - one caller refreshes,
+            # everyone else keeps serving the copy we already have
+            expired = now >= entry['exp']
+            refreshed = self._refresh(key, ttl, compute, wait=False)
+            if refreshed is not None:
+                if not expired:
+                    self.stats['early_refreshes'] += 1
+                return refreshed[0], MISS if expired else EARLY_REFRESH
+            if expired:
+                self.stats['stale_served'] += 1
+                return entry['v'], STALE
+            return entry['v'], HIT
+
+        # Nothing cached at all - must wait for (or do) the recompute
+        refreshed = self._refresh(key, ttl, compute, wait=True)
+        if refreshed is None or refreshed[1] == SHARED:
+            # Counted once per caller, whether it waited on a thread here, on Redis, or both
+            self.stats['waits'] += 1
+        if refreshed is not None:
+            return refreshed
+        return self._wait_for(key, ttl, compute)
+
+    def _should_refresh_early(self, entry, now):
+        # XFetch: now - delta * beta * ln(rand) >= expiry
+        # ln(rand) is negative, so the gap grows with the recompute cost
+        return now - entry['delta'] * self.beta * math.log(random.random() or 1e-12) >= entry['exp']
+
+    def _refresh(self, key, ttl, compute, wait):
+        """
+        Single-flight recompute. Returns (value, MISS) if THIS caller computed it,
+        (value, SHARED) if it waited (wait=True) on another thread in this
+        process, or None if someone else is refreshing.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            if not wait:
+                return None
+            try:
+                value = future.result(timeout=self.wait_timeout)
+            except Exception:
+                # Leader too slow or it failed: fall back to polling Redis /
+                # recomputing, same as when another process holds the lock
+                return None
+            return None if value is None else (value, SHARED)
+
+        try:
+            lock_key = f'lock:{key}'
+            token = str(uuid.uuid4())
+            if not self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+                # Another process is recomputing
+                future.set_result(None)
+                return None
+            try:
+                value = self._compute_and_store(key, ttl, compute)
+            finally:
+                self._release(keys=[lock_key], args=[token])
+            future.set_result(value)
+            return value, MISS
+        except BaseException as exc:
+            if not future.done():
+                future.set_exception(exc)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _wait_for(self, key, ttl, compute):
+        """Another process holds the lock: poll until its value lands in Redis."""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            entry = self._read(key)
+            if entry is not None:
+                return entry['v'], SHARED
+            if not self.redis.exists(f'lock:{key}'):
+                # Holder gave up (its compute failed): no point waiting out the timeout
+                entry = self._read(key)
+                if entry is not None:
+                    return entry['v'], SHARED
+                break
+            delay = min(delay * 2, 0.2)
+        # Recompute holder is too slow, failed or died - do it ourselves rather than fail
+        return self._compute_and_store(key, ttl, compute), MISS
+
+    def _compute_and_store(self, key, ttl, compute):
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        self.stats['recomputes'] += 1
+        data, value = self.codec.encode_and_present(value)
+        self._write(key, {'v': data, 'delta': delta, 'exp': time.time() + ttl}, ttl + self.stale_ttl)
+        return value
+
+    def _read(self, key):
+        entry = self.redis.hgetall(key)
+        if not entry:
+            return None
+        return {'v': self.codec.decode(entry[b'v']), 'delta': float(entry[b'delta']), 'exp': float(entry[b'exp'])}
+
+    def _write(self, key, entry, redis_ttl):
+        # HSET + EXPIRE in one MULTI so readers never see an entry without a TTL
+        self.redis.pipeline().hset(key, mapping=entry).expire(key, int(redis_ttl)).execute()
+
+    def invalidate(self, key):
+        self.redis.delete(key)
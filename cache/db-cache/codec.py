@@ -0,0 +1,127 @@
+"""
+Codecs for cached values.
+
+Every encoded value starts with a 2-byte header so any reader can decode it,
+whatever codec wrote it:
+
+    byte 0: format       j = JSON, m = msgpack
+    byte 1: compression  - = none, z = zlib, 4 = lz4
+
+Payloads bigger than `threshold` bytes are compressed (if a compressor is set).
+
+The 'prerendered' codec stores JSON and hands the raw JSON bytes back on a
+hit - the app splices them straight into the HTTP response, so a cache hit
+needs no decode and no re-encode at all.
+"""
+
+import decimal
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import lz4.frame
+except ImportError:  # optional
+    lz4 = None
+
+
+def _default(obj):
+    # MySQL DECIMAL columns come back as Decimal
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError(f'{type(obj).__name__} is not serializable')
+
+
+def _json_dumps(value):
+    return json.dumps(value, default=_default, separators=(',', ':')).encode()
+
+
+def _msgpack_dumps(value):
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def _msgpack_loads(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+FORMATS = {
+    b'j': (_json_dumps, json.loads),
+    b'm': (_msgpack_dumps, _msgpack_loads),
+}
+
+COMPRESSORS = {
+    b'-': (None, None),
+    b'z': (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if lz4 is not None:
+    COMPRESSORS[b'4'] = (lz4.frame.compress, lz4.frame.decompress)
+
+FORMAT_NAMES = {'json': b'j', 'msgpack': b'm', 'prerendered': b'j'}
+COMPRESSION_NAMES = {None: b'-', 'none': b'-', 'zlib': b'z', 'lz4': b'4'}
+
+
+class Codec:
+    """
+    codec = make_codec('msgpack', compression='zlib', threshold=1024)
+    data = codec.encode(rows)       # bytes, with header
+    rows = codec.decode(data)
+    """
+
+    def __init__(self, fmt=b'j', compression=b'-', threshold=1024, raw=False):
+        self.fmt = fmt
+        self.compression = compression
+        self.threshold = threshold
+        # raw=True: decode() returns JSON bytes instead of Python objects
+        self.raw = raw
+
+    def encode(self, value):
+        return self._frame(FORMATS[self.fmt][0](value))
+
+    def _frame(self, payload):
+        comp = b'-'
+        if self.compression != b'-' and len(payload) > self.threshold:
+            payload = COMPRESSORS[self.compression][0](payload)
+            comp = self.compression
+        return self.fmt + comp + payload
+
+    def decode(self, data):
+        fmt, comp, payload = data[:1], data[1:2], data[2:]
+        if comp != b'-':
+            payload = COMPRESSORS[comp][1](payload)
+        if self.raw:
+            # Already JSON? hand the bytes over untouched
+            return payload if fmt == b'j' else _json_dumps(FORMATS[fmt][1](payload))
+        return FORMATS[fmt][1](payload)
+
+    def encode_and_present(self, value):
+        """
+        Encode a freshly computed value for storage and return (data, value_for_caller).
+        For a raw codec the caller gets the same JSON bytes a hit would return,
+        rendered once instead of twice.
+        """
+        if not self.raw:
+            return self.encode(value), value
+        rendered = _json_dumps(value)
+        return self._frame(rendered), rendered
+
+    @property
+    def name(self):
+        fmt = 'prerendered' if self.raw else {b'j': 'json', b'm': 'msgpack'}[self.fmt]
+        comp = {b'-': '', b'z': '+zlib', b'4': '+lz4'}[self.compression]
+        return fmt + comp
+
+
+def make_codec(name='json', compression=None, threshold=1024):
+    if name not in FORMAT_NAMES:
+        raise ValueError(f'unknown codec {name!r}, choose from {sorted(FORMAT_NAMES)}')
+    if compression not in COMPRESSION_NAMES:
+        raise ValueError(f'unknown compression {compression!r}, choose from zlib, lz4')
+    if name == 'msgpack' and msgpack is None:
+        raise ValueError('msgpack codec needs `pip install msgpack`')
+    if compression == 'lz4' and lz4 is None:
+        raise ValueError('lz4 compression needs `pip install lz4`')
+    return Codec(FORMAT_NAMES[name], COMPRESSION_NAMES[compression], threshold, raw=name == 'prerendered')
@@ -0,0 +1,320 @@
+"""
+Per-customer cache layout with selectable write strategies.
+
+Layout (instead of one `customers:all` JSON blob):
+    customers:ids            SET   of customer ids
+    customer:{id}            HASH  id, name, email, points  (TTL, like before)
+    customers:points:pending HASH  id -> points not yet written to MySQL
+
+One update touches ONE small hash - the list is never rebuilt.
+
+Write strategies for add-points:
+    through - UPDATE MySQL, then replace the cached row (both stay in sync)
+    behind  - HINCRBY the cached row + a pending counter in Redis only.
+              A background worker flushes pending counters to MySQL in
+              batches, so 100 clicks on a hot customer = 1 UPDATE, not 100.
+              Dirty rows never expire before they are flushed.
+
+Filling a row = MySQL value + pending + flushing increments. A flush moves
+points from Redis into MySQL, so a fill that overlaps one could count a
+batch twice or miss it. customers:points:flush_gen is odd while a flush is
+in progress and bumped at its start and end; a fill only caches its result
+if the generation was even and unchanged from the SELECT to the HMGET.
+
+A write-through UPDATE makes any row SELECTed before it stale, so after the
+commit the writer bumps the row's version in customers:fill_gen and deletes
+the cached row. A fill only writes a row whose version is unchanged since
+before its SELECT - a reader that raced the UPDATE can't put the old points back.
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+log = logging.getLogger(__name__)
+
+WRITE_THROUGH = 'through'
+WRITE_BEHIND = 'behind'
+STRATEGIES = (WRITE_THROUGH, WRITE_BEHIND)
+
+IDS_KEY = 'customers:ids'
+PENDING_KEY = 'customers:points:pending'
+FLUSHING_KEY = 'customers:points:flushing'
+FLUSH_LOCK_KEY = 'lock:customers:flush'
+FLUSH_GEN_KEY = 'customers:points:flush_gen'
+FILL_GEN_KEY = 'customers:fill_gen'
+FILL_ATTEMPTS = 3
+
+# Populate a row only if it is not cached yet (never overwrite newer increments)
+# and no write-through UPDATE committed since the SELECT (row version unchanged)
+FILL_ROW_SCRIPT = """
+if (redis.call('hget', KEYS[2], ARGV[2]) or '0') ~= ARGV[3] then
+    return 0
+end
+if redis.call('exists', KEYS[1]) == 0 then
+    redis.call('hset', KEYS[1], unpack(ARGV, 4))
+    redis.call('expire', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# Write-through, after the commit: outdate every earlier SELECT of the row, drop the cached copy
+INVALIDATE_ROW_SCRIPT = """
+redis.call('hincrby', KEYS[2], ARGV[1], 1)
+return redis.call('del', KEYS[1])
+"""
+
+# Write-behind: record the increment as pending and apply it to the cached row
+WRITE_BEHIND_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return false
+end
+redis.call('hincrby', KEYS[2], ARGV[1], ARGV[2])
+redis.call('persist', KEYS[1])
+return redis.call('hincrby', KEYS[1], 'points', ARGV[2])
+"""
+
+# Atomically take the pending batch (resume a half-finished one first)
+# and mark a flush as in progress (odd generation)
+TAKE_BATCH_SCRIPT = """
+if redis.call('exists', KEYS[2]) == 0 then
+    if redis.call('exists', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('rename', KEYS[1], KEYS[2])
+end
+if tonumber(redis.call('get', KEYS[3]) or '0') % 2 == 0 then
+    redis.call('incr', KEYS[3])
+end
+return redis.call('hgetall', KEYS[2])
+"""
+
+# Batch is in MySQL: drop it from Redis and end the flush (even generation)
+FINISH_BATCH_SCRIPT = """
+redis.call('del', KEYS[1])
+if tonumber(redis.call('get', KEYS[2]) or '0') % 2 == 1 then
+    redis.call('incr', KEYS[2])
+end
+return 1
+"""
+
+# After a flush the row may expire again - unless new increments arrived meanwhile
+EXPIRE_IF_CLEAN_SCRIPT = """
+if redis.call('hexists', KEYS[2], ARGV[1]) == 0 then
+    redis.call('expire', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+def row_key(customer_id):
+    return f'customer:{customer_id}'
+
+
+def _from_hash(data):
+    return {'id': int(data['id']), 'name': data['name'], 'email': data['email'], 'points': int(data['points'])}
+
+
+class CustomerCache:
+    def __init__(self, redis_client, get_db, ttl=10, ids_ttl=60):
+        self.redis = redis_client
+        self.get_db = get_db
+        self.ttl = ttl
+        self.ids_ttl = ids_ttl
+        self._fill_row = redis_client.register_script(FILL_ROW_SCRIPT)
+        self._invalidate_row = redis_client.register_script(INVALIDATE_ROW_SCRIPT)
+        self._write_behind = redis_client.register_script(WRITE_BEHIND_SCRIPT)
+        self._take_batch = redis_client.register_script(TAKE_BATCH_SCRIPT)
+        self._finish_batch = redis_client.register_script(FINISH_BATCH_SCRIPT)
+        self._expire_if_clean = redis_client.register_script(EXPIRE_IF_CLEAN_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+        self.stats = {'db_updates': 0, 'pending_increments': 0, 'flushes': 0, 'rows_flushed': 0,
+                      'fills_skipped': 0}
+
+    # -- reads ---------------------------------------------------------------
+
+    def get_all(self):
+        """
+        Return (rows, ttl_remaining, rows_loaded_from_db).
+        Only rows missing from Redis are queried - one changed customer
+        costs one row, not the whole table.
+        """
+        ids = self._ids()
+        pipe = self.redis.pipeline()
+        for customer_id in ids:
+            pipe.hgetall(row_key(customer_id))
+            pipe.ttl(row_key(customer_id))
+        replies = pipe.execute()
+
+        rows, missing, ttls = {}, [], []
+        for customer_id, data, ttl in zip(ids, replies[0::2], replies[1::2]):
+            if data:
+                rows[customer_id] = _from_hash(data)
+                if ttl >= 0:
+                    ttls.append(ttl)
+            else:
+                missing.append(customer_id)
+
+        if missing:
+            for row in self._load_rows(missing):
+                rows[row['id']] = row
+            ttls.append(self.ttl)
+
+        return [rows[i] for i in sorted(rows)], min(ttls) if ttls else self.ttl, len(missing)
+
+    def _ids(self):
+        ids = self.redis.smembers(IDS_KEY)
+        if ids:
+            return sorted(int(i) for i in ids)
+        with self.get_db() as conn, conn.cursor() as cur:
+            cur.execute('SELECT id FROM customers')
+            ids = [row['id'] for row in cur.fetchall()]
+        if ids:
+            self.redis.pipeline().sadd(IDS_KEY, *ids).expire(IDS_KEY, self.ids_ttl).execute()
+        return ids
+
+    def _load_rows(self, customer_ids):
+        """Load rows from MySQL, add not-yet-flushed points, and cache them."""
+        placeholders = ','.join(['%s'] * len(customer_ids))
+        for attempt in range(FILL_ATTEMPTS):
+            pipe = self.redis.pipeline()
+            pipe.get(FLUSH_GEN_KEY)
+            pipe.hmget(FILL_GEN_KEY, customer_ids)
+            generation, versions = pipe.execute()
+            with self.get_db() as conn, conn.cursor() as cur:
+                cur.execute(f'SELECT * FROM customers WHERE id IN ({placeholders})', customer_ids)
+                rows = cur.fetchall()
+
+            # One MULTI: the pending counters and the generation they belong to
+            pipe = self.redis.pipeline()
+            pipe.hmget(PENDING_KEY, customer_ids)
+            pipe.hmget(FLUSHING_KEY, customer_ids)
+            pipe.get(FLUSH_GEN_KEY)
+            pending, flushing, generation_after = pipe.execute()
+            consistent = generation == generation_after and int(generation or 0) % 2 == 0
+            if consistent:
+                break
+            time.sleep(0.01 * (attempt + 1))
+
+        if not consistent:
+            # Kept overlapping a flush: the batch being flushed may already be in MySQL, so
+            # leave it out - this answer may miss it, never counts it twice - and don't cache
+            flushing = [None] * len(customer_ids)
+            self.stats['fills_skipped'] += 1
+        extra = {cid: int(p or 0) + int(f or 0) for cid, p, f in zip(customer_ids, pending, flushing)}
+        version = {cid: v or '0' for cid, v in zip(customer_ids, versions)}
+        for row in rows:
+            row['points'] += extra.get(row['id'], 0)
+        if not consistent:
+            return rows
+
+        pipe = self.redis.pipeline()
+        for row in rows:
+            fields = [x for field in ('id', 'name', 'email', 'points') for x in (field, row[field])]
+            self._fill_row(keys=[row_key(row['id']), FILL_GEN_KEY],
+                           args=[self.ttl, row['id'], version[row['id']]] + fields, client=pipe)
+        pipe.execute()
+        return rows
+
+    # -- writes --------------------------------------------------------------
+
+    def add_points(self, customer_id, points, strategy=WRITE_THROUGH):
+        if strategy == WRITE_BEHIND:
+            return self._add_points_behind(customer_id, points)
+        return self._add_points_through(customer_id, points)
+
+    def _add_points_through(self, customer_id, points):
+        with self.get_db() as conn, conn.cursor() as cur:
+            updated = cur.execute('UPDATE customers SET points = points + %s WHERE id = %s', (points, customer_id))
+            conn.commit()
+        if not updated:
+            return None
+        self.stats['db_updates'] += 1
+
+        # Not HINCRBY on the cached row: a fill that SELECTed before the UPDATE may land
+        # after it. Outdate those fills, then cache the row fresh (no SELECT next read)
+        self._invalidate_row(keys=[row_key(customer_id), FILL_GEN_KEY], args=[customer_id])
+        rows = self._load_rows([customer_id])
+        return self.get_row(customer_id) or (rows[0] if rows else None)
+
+    def _add_points_behind(self, customer_id, points):
+        for _ in range(2):
+            new_points = self._write_behind(keys=[row_key(customer_id), PENDING_KEY], args=[customer_id, points])
+            if new_points is not None:
+                self.stats['pending_increments'] += 1
+                return self.get_row(customer_id)
+            # Row not cached yet - load it once, then record the increment
+            if not self._load_rows([customer_id]):
+                return None
+        # Row could not be cached (fills kept overlapping a flush) - write to MySQL directly
+        return self._add_points_through(customer_id, points)
+
+    def get_row(self, customer_id):
+        data = self.redis.hgetall(row_key(customer_id))
+        return _from_hash(data) if data else None
+
+    # -- write-behind flushing -----------------------------------------------
+
+    def flush_pending(self):
+        """Write pending point increments to MySQL in one batch. Returns rows flushed."""
+        token = str(uuid.uuid4())
+        # Only one app instance flushes at a time, or a batch could be applied twice
+        if not self.redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=30):
+            return 0
+        try:
+            flat = self._take_batch(keys=[PENDING_KEY, FLUSHING_KEY, FLUSH_GEN_KEY])
+            batch = dict(zip(flat[0::2], flat[1::2]))
+            if not batch:
+                return 0
+
+            with self.get_db() as conn, conn.cursor() as cur:
+                cur.executemany('UPDATE customers SET points = points + %s WHERE id = %s',
+                                [(int(delta), int(customer_id)) for customer_id, delta in batch.items()])
+                conn.commit()
+
+            pipe = self.redis.pipeline()
+            self._finish_batch(keys=[FLUSHING_KEY, FLUSH_GEN_KEY], client=pipe)
+            for customer_id in batch:
+                self._expire_if_clean(keys=[row_key(customer_id), PENDING_KEY],
+                                      args=[customer_id, self.ttl], client=pipe)
+            pipe.execute()
+
+            self.stats['flushes'] += 1
+            self.stats['db_updates'] += 1
+            self.stats['rows_flushed'] += len(batch)
+            return len(batch)
+        finally:
+            self._release(keys=[FLUSH_LOCK_KEY], args=[token])
+
+    def pending(self):
+        return {int(k): int(v) for k, v in self.redis.hgetall(PENDING_KEY).items()}
+
+    def start_flusher(self, interval=1.0):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush_pending()
+                except Exception:
+                    log.exception('write-behind flush failed')
+        threading.Thread(target=loop, name='customer-flusher', daemon=True).start()
+
+    # -- invalidation --------------------------------------------------------
+
+    def invalidate(self, customer_id):
+        self.redis.delete(row_key(customer_id))
+
+    def clear(self):
+        """Flush pending writes first so no points are lost, then drop all rows."""
+        self.flush_pending()
+        ids = self.redis.smembers(IDS_KEY)
+        self.redis.delete(IDS_KEY, *[row_key(i) for i in ids])
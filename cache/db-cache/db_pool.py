@@ -0,0 +1,269 @@
+"""
+Bounded, thread-safe connection pool for MySQL/MariaDB.
+
+Opening a connection costs a TCP handshake + auth round trips, which on a
+cold cache can be slower than the query itself. The pool keeps a few warm
+connections around and hands them out to request threads.
+
+    pool = ConnectionPool(connect_db, size=5, max_overflow=10)
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+"""
+
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the wait timeout."""
+
+
+class _Entry:
+    """A raw connection plus the bookkeeping the pool needs."""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """
+    Thin proxy around a checked-out connection.
+    close() returns the connection to the pool instead of closing the socket,
+    so existing `conn = get_db() ... conn.close()` code keeps working.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise RuntimeError('connection already returned to the pool')
+        return getattr(self._entry.conn, name)
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    size          - connections kept open while idle
+    max_overflow  - extra connections allowed under load (closed on release)
+    timeout       - seconds to wait for a free connection before PoolTimeout
+    recycle       - close connections older than this many seconds
+    idle_timeout  - evict idle connections unused for this many seconds
+    ping_after    - health-check (ping) connections idle longer than this before reuse
+    """
+
+    def __init__(self, factory, size=5, max_overflow=10, timeout=5.0,
+                 recycle=1800, idle_timeout=300, ping_after=10):
+        self._factory = factory
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+
+        # LIFO so the most recently used (warmest) connection is reused first
+        # and surplus connections at the bottom go idle and get evicted.
+        self._idle = []
+        self._lock = threading.Lock()
+        # Signalled whenever a waiter may proceed: a connection was returned,
+        # or one was closed and there is room to open a new one
+        self._available = threading.Condition(self._lock)
+        self._total = 0
+        self._waiting = 0
+        self._metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'closed': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'waits': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+        }
+
+    # -- checkout / release -------------------------------------------------
+
+    def connection(self):
+        """Check out a connection. Use as a context manager or call close()."""
+        return PooledConnection(self, self._acquire())
+
+    def _acquire(self):
+        start = time.monotonic()
+        waited = False
+        deadline = start + self.timeout
+
+        while True:
+            with self._available:
+                while not self._idle and self._total >= self.size + self.max_overflow:
+                    # Pool is at size + max_overflow: wait for a release or a discard
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics['timeouts'] += 1
+                        raise PoolTimeout(f'no connection available within {self.timeout}s '
+                                          f'(size={self.size}, max_overflow={self.max_overflow})')
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    entry = None
+                    self._total += 1        # reserve the slot, connect outside the lock
+
+            if entry is None:
+                entry = self._create()
+            entry = self._check_health(entry)
+            if entry is not None:
+                break
+
+        entry.last_used = time.monotonic()
+        wait_ms = (entry.last_used - start) * 1000
+        with self._lock:
+            self._metrics['checkouts'] += 1
+            if waited:
+                self._metrics['waits'] += 1
+                self._metrics['wait_time_total_ms'] += wait_ms
+                self._metrics['wait_time_max_ms'] = max(self._metrics['wait_time_max_ms'], wait_ms)
+        return entry
+
+    def _release(self, entry):
+        # End whatever transaction the borrower left open (autocommit is off): with
+        # REPEATABLE READ an open read snapshot would hand stale rows to the next borrower
+        try:
+            entry.conn.rollback()
+        except Exception:
+            # Broken connection - drop it rather than handing it out again
+            self._discard(entry)
+            return
+        entry.last_used = time.monotonic()
+        with self._available:
+            # Shrink back to `size` once the burst is over (nobody is waiting). Decided
+            # under the same lock a new borrower checks, so it either waits or sees the room
+            shrink = self._total > self.size and self._waiting == 0
+            if shrink:
+                self._total -= 1
+                self._metrics['closed'] += 1
+            else:
+                self._idle.append(entry)
+                self._available.notify()
+        if shrink:
+            self._close(entry)
+
+    # -- internals ----------------------------------------------------------
+
+    def _create(self):
+        """Open a connection for a slot already counted in _total."""
+        try:
+            entry = _Entry(self._factory())
+        except Exception:
+            with self._available:
+                self._total -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self._metrics['created'] += 1
+        return entry
+
+    def _check_health(self, entry):
+        """Return a usable entry, or None if it was stale/broken and dropped."""
+        now = time.monotonic()
+        if now - entry.created_at > self.recycle:
+            self._discard(entry)
+            return None
+        if now - entry.last_used > self.ping_after:
+            try:
+                entry.conn.ping(reconnect=False)
+            except Exception:
+                with self._lock:
+                    self._metrics['health_check_failures'] += 1
+                self._discard(entry)
+                return None
+        return entry
+
+    def _discard(self, entry):
+        self._close(entry)
+        with self._available:
+            self._total -= 1
+            self._metrics['closed'] += 1
+            # Room for a new connection: a waiter can open one instead of timing out
+            self._available.notify()
+
+    @staticmethod
+    def _close(entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    # -- maintenance / metrics ---------------------------------------------
+
+    def evict_idle(self):
+        """Close idle connections above `size` and any past their idle timeout."""
+        keep, evicted = [], []
+        now = time.monotonic()
+        with self._lock:
+            # Most recently used first
+            for entry in reversed(self._idle):
+                if len(keep) >= self.size or now - entry.last_used > self.idle_timeout:
+                    evicted.append(entry)
+                else:
+                    keep.append(entry)
+            # Oldest first again so the LIFO order is preserved
+            self._idle = keep[::-1]
+        for entry in evicted:
+            self._discard(entry)
+        return len(evicted)
+
+    def start_reaper(self, interval=10):
+        """Run evict_idle() periodically in a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+        threading.Thread(target=loop, name='db-pool-reaper', daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            total = self._total
+            idle = len(self._idle)
+        waits = metrics['waits']
+        metrics['wait_time_avg_ms'] = round(metrics['wait_time_total_ms'] / waits, 3) if waits else 0.0
+        metrics['wait_time_total_ms'] = round(metrics['wait_time_total_ms'], 3)
+        metrics['wait_time_max_ms'] = round(metrics['wait_time_max_ms'], 3)
+        metrics.update({
+            'size': self.size,
+            'max_overflow': self.max_overflow,
+            'open': total,
+            'idle': idle,
+            'in_use': total - idle,
+        })
+        return metrics
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._discard(entry)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Bulk-seed the products table - millions of rows, streamed in batches.
+
+    docker compose exec app python seed.py --rows 5000000
+    docker compose exec app python seed.py --rows 5000000 --method load-data
+    docker compose exec app python seed.py --rows 1000000 --truncate
+
+Rows are generated lazily and written in batches, either with a parameterized
+`executemany` (PyMySQL turns it into multi-row INSERTs) or with
+`LOAD DATA LOCAL INFILE` from a temporary file per batch (fastest).
+The category_stats triggers are dropped during the load and the aggregates
+rebuilt once at the end - one GROUP BY instead of one trigger per row.
+"""
+
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+INSERT_SQL = 'INSERT INTO products (name, price, category, description) VALUES (%s, %s, %s, %s)'
+
+
+def wait_for_db(connect, timeout=120, initial_delay=0.5, max_delay=5.0):
+    """
+    Readiness probe: retry connect() + SELECT 1 with exponential backoff
+    until the database answers (instead of a fixed sleep).
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        conn = None
+        try:
+            conn = connect()
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            return conn
+        except Exception as e:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f'database not ready after {attempt} attempts: {e}') from e
+            print(f'Database not ready (attempt {attempt}): {e} - retrying in {delay:.1f}s')
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def generate_rows(count, start=0, categories=10):
+    """Yield (name, price, category, description) rows one at a time."""
+    for i in range(start, start + count):
+        yield (
+            f'Product {i}',
+            round(10 + (i % 100) * 0.5, 2),
+            f'Category {i % categories}',
+            f'Description for product {i}',
+        )
+
+
+def batched(rows, size):
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Progress:
+    def __init__(self, total, every=1.0):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.start = time.monotonic()
+        self._last = self.start
+
+    def add(self, rows):
+        self.done += rows
+        now = time.monotonic()
+        if now - self._last >= self.every or self.done == self.total:
+            self._last = now
+            elapsed = now - self.start
+            print(f'  {self.done:>12,} / {self.total:,} rows '
+                  f'({self.done / self.total * 100:5.1f}%)  {self.done / elapsed:>10,.0f} rows/s', flush=True)
+
+    def summary(self):
+        elapsed = time.monotonic() - self.start
+        return self.done, elapsed, self.done / elapsed if elapsed else 0
+
+
+def seed_executemany(conn, rows, batch_size=5000, progress=None):
+    with conn.cursor() as cur:
+        for batch in batched(rows, batch_size):
+            cur.executemany(INSERT_SQL, batch)
+            conn.commit()
+            if progress:
+                progress.add(len(batch))
+
+
+def seed_load_data(conn, rows, batch_size=100000, progress=None):
+    """Needs a connection opened with local_infile=True."""
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False) as f:
+        path = f.name
+    try:
+        with conn.cursor() as cur:
+            for batch in batched(rows, batch_size):
+                with open(path, 'w') as f:
+                    f.writelines(f'{name}\t{price}\t{category}\t{description}\n'
+                                 for name, price, category, description in batch)
+                cur.execute(f'''
+                    LOAD DATA LOCAL INFILE '{path}' INTO TABLE products
+                    FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                    (name, price, category, description)
+                ''')
+                conn.commit()
+                if progress:
+                    progress.add(len(batch))
+    finally:
+        os.unlink(path)
+
+
+def main():
+    from app import connect_db
+    import aggregates
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='rows per batch (default 5000 for executemany, 100000 for load-data)')
+    parser.add_argument('--method', choices=['executemany', 'load-data'], default='executemany')
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--truncate', action='store_true', help='empty products first')
+    parser.add_argument('--keep-triggers', action='store_true',
+                        help='maintain category_stats row by row instead of rebuilding at the end')
+    args = parser.parse_args()
+    batch_size = args.batch_size or (5000 if args.method == 'executemany' else 100000)
+
+    conn = wait_for_db(lambda: connect_db(local_infile=args.method == 'load-data'))
+    loaded = False
+    try:
+        with conn.cursor() as cur:
+            if args.truncate:
+                cur.execute('TRUNCATE TABLE products')
+            cur.execute('SELECT COALESCE(MAX(id), 0) as max_id FROM products')
+            start = cur.fetchone()['max_id']
+        conn.commit()
+
+        if not args.keep_triggers:
+            aggregates.drop_triggers(conn)
+
+        print(f'Seeding {args.rows:,} rows with {args.method} (batch {batch_size:,})')
+        progress = Progress(args.rows)
+        rows = generate_rows(args.rows, start=start, categories=args.categories)
+        if args.method == 'executemany':
+            seed_executemany(conn, rows, batch_size, progress)
+        else:
+            seed_load_data(conn, rows, batch_size, progress)
+        done, elapsed, rate = progress.summary()
+        print(f'Inserted {done:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+        loaded = True
+    finally:
+        try:
+            # Also after a failed or interrupted load: never leave the triggers dropped,
+            # and count the batches that did commit
+            if not args.keep_triggers or args.truncate:
+                print('Rebuilding category_stats...' if loaded else
+                      'Load did not finish - reinstalling triggers and rebuilding category_stats...')
+                # The load's connection may be broken (or mid-query after Ctrl-C)
+                restore = conn if loaded else connect_db()
+                try:
+                    aggregates.install(restore)
+                    aggregates.rebuild(restore)
+                finally:
+                    if restore is not conn:
+                        restore.close()
+        finally:
+            conn.close()
+    print('Done. Call /stats/reset to drop cached results.')
+
+
+if __name__ == '__main__':
+    main()
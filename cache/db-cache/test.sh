@@ -41,6 +41,62 @@ echo ">>> Final stats:"
 curl -s http://localhost:5000/stats | jq .
 echo ""
 
+echo "============================================"
+echo "  TEST 3: Pooled connections see new writes"
+echo "============================================"
+echo ""
+
+# Open several pooled connections (each reads once), then write through one of them
+for i in {1..5}; do curl -s http://localhost:5000/products/no-cache > /dev/null & done
+wait
+BEFORE=$(curl -s http://localhost:5000/products/no-cache | jq '[.data[] | select(.category == "Pool test") | .count] | add // 0')
+curl -s "http://localhost:5000/products/add?category=Pool%20test&price=10" > /dev/null
+
+STALE=0
+for i in {1..5}; do
+    (count=$(curl -s http://localhost:5000/products/no-cache | jq '[.data[] | select(.category == "Pool test") | .count] | add // 0')
+     [ "$count" -eq $((BEFORE + 1)) ] || echo "stale") &
+done > /tmp/pool_test.out
+wait
+STALE=$(grep -c stale /tmp/pool_test.out)
+if [ "$STALE" -eq 0 ]; then
+    echo "PASS: every pooled connection sees the new product"
+else
+    echo "FAIL: $STALE of 5 reads returned rows from before the insert"
+fi
+echo ""
+
+echo "============================================"
+echo "  TEST 4: Category aggregates follow inserts and deletes"
+echo "============================================"
+echo ""
+
+stats_for() {
+    curl -s http://localhost:5000/products/no-cache | jq -c --arg c "$1" '[.data[] | select(.category == $c)][0] // {}'
+}
+CAT="Trigger test $$"
+curl -s "http://localhost:5000/products/add?category=${CAT// /%20}&price=10" > /dev/null
+MAX_ID=$(curl -s "http://localhost:5000/products/add?category=${CAT// /%20}&price=30" | jq '.added.id')
+echo ">>> After adding 10 and 30: $(stats_for "$CAT")"
+curl -s "http://localhost:5000/products/$MAX_ID/delete" > /dev/null
+AFTER=$(stats_for "$CAT")
+echo ">>> After deleting the max:  $AFTER"
+if [ "$(echo "$AFTER" | jq '.count == 1 and .max_price == 10 and .avg_price == 10')" = "true" ]; then
+    echo "PASS: count, avg and max recomputed"
+else
+    echo "FAIL: expected count 1, avg 10, max 10"
+fi
+
+for price in abc nan -5 1e12; do
+    code=$(curl -s -o /dev/null -w '%{http_code}' "http://localhost:5000/products/add?price=$price")
+    if [ "$code" = "400" ]; then
+        echo "PASS: price=$price rejected with 400"
+    else
+        echo "FAIL: price=$price returned $code"
+    fi
+done
+echo ""
+
 echo "============================================"
 echo "  CONCLUSION"
 echo "============================================"
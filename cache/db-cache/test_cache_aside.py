@@ -0,0 +1,105 @@
+"""
+Unit tests for cache_aside.py against an in-memory Redis.
+
+    pip install pytest fakeredis lupa && python -m pytest -q
+"""
+
+import threading
+import time
+
+import pytest
+
+import cache_aside
+from cache_aside import CacheAside
+
+
+@pytest.fixture
+def cache():
+    fakeredis = pytest.importorskip('fakeredis')
+    return CacheAside(fakeredis.FakeRedis(), wait_timeout=0.1)
+
+
+def run_concurrently(n, fn):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(fn())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_miss_then_hit(cache):
+    assert cache.get_or_compute('k', 60, lambda: {'a': 1}) == ({'a': 1}, cache_aside.MISS)
+    assert cache.get_or_compute('k', 60, lambda: {'a': 2}) == ({'a': 1}, cache_aside.HIT)
+
+
+def test_concurrent_misses_compute_once(cache):
+    cache.wait_timeout = 2
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    results, errors = run_concurrently(8, lambda: cache.get_or_compute('k', 60, compute))
+    assert not errors
+    assert len(calls) == 1
+    assert {value for value, _ in results} == {'value'}
+    assert cache.stats['waits'] == sum(source == cache_aside.SHARED for _, source in results) == 7
+
+
+def test_slow_local_leader_does_not_fail_followers(cache):
+    # Followers give up on the in-process leader after wait_timeout (0.1s)
+    def compute():
+        time.sleep(0.5)
+        return 'value'
+
+    results, errors = run_concurrently(4, lambda: cache.get_or_compute('k', 60, compute))
+    assert not errors
+    assert {value for value, _ in results} == {'value'}
+
+
+def test_leader_error_is_not_raised_in_followers(cache):
+    cache.wait_timeout = 2
+    leader_started = threading.Event()
+    attempts = []
+
+    def compute():
+        attempts.append(1)
+        if len(attempts) == 1:
+            leader_started.set()
+            time.sleep(0.1)
+            raise RuntimeError('database down')
+        return 'value'
+
+    leader_error = []
+
+    def leader():
+        try:
+            cache.get_or_compute('k', 60, compute)
+        except RuntimeError as exc:
+            leader_error.append(exc)
+
+    t = threading.Thread(target=leader)
+    t.start()
+    leader_started.wait()
+    assert cache.get_or_compute('k', 60, compute) == ('value', cache_aside.MISS)
+    t.join()
+    assert leader_error     # only the caller whose compute failed sees the error
+    assert cache.stats['waits'] == 1     # waited on the leader, then recomputed: one wait
+
+
+def test_stale_value_served_while_refreshing(cache):
+    cache.get_or_compute('k', 60, lambda: 'old')
+    cache.redis.hset('k', 'exp', time.time() - 1)
+    cache.redis.set('lock:k', 'other-process')
+    assert cache.get_or_compute('k', 60, lambda: 'new') == ('old', cache_aside.STALE)
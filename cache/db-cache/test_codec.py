@@ -0,0 +1,65 @@
+"""
+Unit tests for codec.py.
+
+    pip install pytest msgpack lz4 && python -m pytest -q
+"""
+
+import decimal
+import json
+
+import pytest
+
+import codec as codec_module
+from codec import make_codec
+
+ROWS = [{'id': i, 'name': f'Product {i}', 'price': decimal.Decimal('9.99'), 'tags': ['a', 'b']} for i in range(50)]
+EXPECTED = json.loads(json.dumps(ROWS, default=float))
+
+
+def available(name, compression):
+    if name == 'msgpack' and codec_module.msgpack is None:
+        pytest.skip('msgpack not installed')
+    if compression == 'lz4' and codec_module.lz4 is None:
+        pytest.skip('lz4 not installed')
+    return make_codec(name, compression, threshold=64)
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lz4'])
+@pytest.mark.parametrize('name', ['json', 'msgpack'])
+def test_round_trip(name, compression):
+    codec = available(name, compression)
+    data = codec.encode(ROWS)
+    assert codec.decode(data) == EXPECTED
+    assert data[1:2] == (codec.compression if compression else b'-')
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lz4'])
+def test_prerendered_hit_returns_the_bytes_a_miss_returned(compression):
+    codec = available('prerendered', compression)
+    data, presented = codec.encode_and_present(ROWS)
+    assert isinstance(presented, bytes)
+    assert codec.decode(data) == presented
+    assert json.loads(presented) == EXPECTED
+
+
+def test_small_payloads_are_not_compressed():
+    codec = make_codec('json', 'zlib', threshold=1024)
+    data = codec.encode({'a': 1})
+    assert data == b'j-{"a":1}'
+
+
+@pytest.mark.parametrize('writer', ['json', 'msgpack', 'prerendered'])
+@pytest.mark.parametrize('reader', ['json', 'msgpack', 'prerendered'])
+def test_any_codec_decodes_what_another_wrote(writer, reader):
+    data = available(writer, 'zlib').encode(ROWS)
+    decoded = available(reader, None).decode(data)
+    if reader == 'prerendered':
+        decoded = json.loads(decoded)
+    assert decoded == EXPECTED
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        make_codec('pickle')
+    with pytest.raises(ValueError):
+        make_codec('json', 'brotli')
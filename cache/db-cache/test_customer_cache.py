@@ -0,0 +1,147 @@
+"""
+Unit tests for customer_cache.py against an in-memory Redis - no database needed.
+
+    pip install pytest fakeredis lupa && python -m pytest -q
+"""
+
+import contextlib
+
+import pytest
+
+import customer_cache
+from customer_cache import FLUSH_GEN_KEY, FLUSHING_KEY, WRITE_BEHIND, WRITE_THROUGH, CustomerCache
+
+
+class FakeDB:
+    """customers table as {id: points}; `on_select` runs right after a SELECT returns."""
+
+    def __init__(self, points):
+        self.points = dict(points)
+        self.on_select = None
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield FakeConn(self)
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=()):
+        if sql.startswith('SELECT id '):
+            self.rows = [{'id': cid} for cid in self.db.points]
+        elif sql.startswith('SELECT'):
+            self.rows = [{'id': cid, 'name': f'c{cid}', 'email': f'c{cid}@example.com', 'points': self.db.points[cid]}
+                         for cid in args if cid in self.db.points]
+            hook, self.db.on_select = self.db.on_select, None
+            if hook:
+                hook()
+        else:
+            points, cid = args
+            if cid not in self.db.points:
+                return 0
+            self.db.points[cid] += points
+            return 1
+
+    def executemany(self, sql, seq):
+        for args in seq:
+            self.execute(sql, args)
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def db():
+    return FakeDB({1: 100})
+
+
+@pytest.fixture
+def cache(db):
+    fakeredis = pytest.importorskip('fakeredis')
+    return CustomerCache(fakeredis.FakeRedis(decode_responses=True), db.connection)
+
+
+def test_write_behind_then_flush(cache, db):
+    assert cache.add_points(1, 5, WRITE_BEHIND)['points'] == 105
+    assert db.points[1] == 100 and cache.pending() == {1: 5}
+    assert cache.flush_pending() == 1
+    assert db.points[1] == 105 and cache.pending() == {}
+    assert cache.get_row(1)['points'] == 105
+
+
+def test_fill_racing_a_flush_does_not_cache_a_missed_batch(cache, db):
+    cache.add_points(1, 5, WRITE_BEHIND)
+    cache.invalidate(1)
+    # SELECT sees 100, then the flush commits 105 and clears the pending batch
+    db.on_select = cache.flush_pending
+    rows, _, loaded = cache.get_all()
+    assert loaded == 1
+    assert rows[0]['points'] == 105
+    assert cache.get_row(1)['points'] == 105
+
+
+def test_fill_during_an_unfinished_flush_is_not_cached(cache, db, monkeypatch):
+    monkeypatch.setattr(customer_cache.time, 'sleep', lambda s: None)
+    # Batch already committed to MySQL, FLUSHING not yet deleted
+    db.points[1] = 105
+    cache.redis.hset(FLUSHING_KEY, 1, 5)
+    cache.redis.set(FLUSH_GEN_KEY, 1)
+    assert cache._load_rows([1])[0]['points'] == 105     # the flushing 5 is not added twice
+    assert cache.get_row(1) is None
+    assert cache.stats['fills_skipped'] == 1
+
+    cache._finish_batch(keys=[FLUSHING_KEY, FLUSH_GEN_KEY])
+    assert cache._load_rows([1])[0]['points'] == 105
+    assert cache.get_row(1)['points'] == 105
+
+
+def test_update_of_unknown_customer_is_not_counted(cache):
+    assert cache.add_points(99, 5) is None
+    assert cache.stats['db_updates'] == 0
+    assert cache.add_points(1, 5)['points'] == 105
+    assert cache.stats['db_updates'] == 1
+
+
+def test_fill_that_raced_a_write_through_does_not_cache_old_points(cache, db, monkeypatch):
+    load_rows = cache._load_rows
+    writer_fills = []
+
+    def write_through():
+        # The writer's own refill is held back until after the reader's fill
+        monkeypatch.setattr(cache, '_load_rows', writer_fills.append)
+        cache.add_points(1, 5, WRITE_THROUGH)
+        monkeypatch.setattr(cache, '_load_rows', load_rows)
+
+    # A reader SELECTs 100, then the UPDATE to 105 commits before the reader fills
+    db.on_select = write_through
+    assert load_rows([1])[0]['points'] == 100
+    assert cache.get_row(1) is None
+    load_rows(*writer_fills)
+    assert cache.get_row(1)['points'] == 105
+
+
+def test_write_through_replaces_a_cached_row(cache, db):
+    cache.get_all()
+    assert cache.add_points(1, 5, WRITE_THROUGH)['points'] == 105
+    assert cache.add_points(1, -2, WRITE_THROUGH)['points'] == 103
+    assert db.points[1] == 103 and cache.get_row(1)['points'] == 103
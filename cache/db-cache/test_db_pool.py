@@ -0,0 +1,161 @@
+"""
+Unit tests for db_pool.py - no database needed.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeDB:
+    """One committed value; connections read it through REPEATABLE READ snapshots."""
+
+    def __init__(self):
+        self.value = 0
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+        self.snapshot = None        # taken at the first read of a transaction
+        self.closed = False
+        self.fail_rollback = False
+
+    def read(self):
+        if self.snapshot is None:
+            self.snapshot = self.db.value
+        return self.snapshot
+
+    def write(self, value):
+        self.db.value = value
+
+    def commit(self):
+        self.snapshot = None
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise OSError('connection lost')
+        self.snapshot = None
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    db = FakeDB()
+    return db, ConnectionPool(lambda: FakeConn(db), **kwargs)
+
+
+def test_reused_connection_sees_committed_writes():
+    db, pool = make_pool(size=2, max_overflow=0)
+    reader, writer = pool.connection(), pool.connection()
+    reused = reader._entry.conn
+
+    assert reader.read() == 0          # read-only checkout, never commits
+    writer.write(42)
+    writer.commit()
+    writer.close()
+    reader.close()                     # LIFO: the reader's connection is handed out next
+
+    with pool.connection() as conn:
+        assert conn._entry.conn is reused
+        assert conn.read() == 42       # not the snapshot from before the UPDATE
+
+
+def test_connection_that_cannot_roll_back_is_discarded():
+    _, pool = make_pool(size=1, max_overflow=0)
+    conn = pool.connection()
+    raw = conn._entry.conn
+    raw.fail_rollback = True
+    conn.close()
+
+    assert raw.closed
+    assert pool.stats()['open'] == 0
+    with pool.connection() as fresh:
+        assert fresh._entry.conn is not raw
+
+
+def test_overflow_connections_are_closed_on_release():
+    _, pool = make_pool(size=1, max_overflow=2)
+    conns = [pool.connection() for _ in range(3)]
+    assert pool.stats()['open'] == 3
+    for conn in conns:
+        conn.close()
+    stats = pool.stats()
+    assert stats['open'] == 1 and stats['idle'] == 1
+
+
+def test_checkout_times_out_when_exhausted():
+    _, pool = make_pool(size=1, max_overflow=0, timeout=0.05)
+    held = pool.connection()
+    with pytest.raises(PoolTimeout):
+        pool.connection()
+    assert pool.stats()['timeouts'] == 1
+    held.close()
+
+
+def test_waiter_gets_released_connection():
+    _, pool = make_pool(size=1, max_overflow=0, timeout=2)
+    held = pool.connection()
+    threading.Timer(0.05, held.close).start()
+    with pool.connection():
+        pass
+    assert pool.stats()['waits'] == 1
+
+
+def test_old_connections_are_recycled():
+    _, pool = make_pool(size=1, max_overflow=0, recycle=0.01)
+    conn = pool.connection()
+    first = conn._entry.conn
+    conn.close()
+    time.sleep(0.02)
+    with pool.connection() as conn:
+        assert conn._entry.conn is not first
+    assert first.closed
+
+
+def test_closed_proxy_refuses_use():
+    _, pool = make_pool()
+    conn = pool.connection()
+    conn.close()
+    with pytest.raises(RuntimeError):
+        conn.read()
+
+
+def test_waiter_opens_a_new_connection_when_the_held_one_is_discarded():
+    # DB restart: the returned connection fails its rollback and is closed
+    _, pool = make_pool(size=1, max_overflow=0, timeout=2)
+    held = pool.connection()
+    broken = held._entry.conn
+    broken.fail_rollback = True
+    threading.Timer(0.05, held.close).start()
+
+    start = time.monotonic()
+    with pool.connection() as conn:
+        assert conn._entry.conn is not broken
+    assert time.monotonic() - start < 1
+    assert pool.stats()['open'] == 1 and pool.stats()['timeouts'] == 0
+
+
+def test_waiter_is_not_starved_by_overflow_shrink():
+    _, pool = make_pool(size=1, max_overflow=1, timeout=2)
+    conns = [pool.connection(), pool.connection()]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.connection()))
+    waiter.start()
+    time.sleep(0.05)
+    conns[1].close()            # someone is waiting: handed over, not closed
+    waiter.join(1)
+    assert len(got) == 1
+    got[0].close()
+    conns[0].close()
+    assert pool.stats()['open'] == 1
+
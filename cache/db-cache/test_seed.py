@@ -0,0 +1,57 @@
+"""
+Unit tests for seed.py - no database needed.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import pytest
+
+from seed import batched, generate_rows, wait_for_db
+
+
+class FlakyConn:
+    def __init__(self, fail):
+        self.fail = fail
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if self.fail:
+            raise OSError('server is starting')
+
+    def close(self):
+        self.closed = True
+
+
+def test_wait_for_db_closes_connections_that_failed_the_probe():
+    conns = [FlakyConn(fail=True), FlakyConn(fail=True), FlakyConn(fail=False)]
+    it = iter(conns)
+    conn = wait_for_db(lambda: next(it), initial_delay=0.001)
+    assert conn is conns[2] and not conn.closed
+    assert conns[0].closed and conns[1].closed
+
+
+def test_wait_for_db_gives_up_at_the_deadline():
+    opened = []
+
+    def connect():
+        opened.append(FlakyConn(fail=True))
+        return opened[-1]
+
+    with pytest.raises(TimeoutError):
+        wait_for_db(connect, timeout=0.05, initial_delay=0.01)
+    assert opened and all(conn.closed for conn in opened)
+
+
+def test_rows_are_generated_lazily_in_batches():
+    rows = generate_rows(5, start=10, categories=2)
+    assert next(rows) == ('Product 10', 15.0, 'Category 0', 'Description for product 10')
+    assert [len(batch) for batch in batched(rows, 3)] == [3, 1]
@@ -0,0 +1,52 @@
+"""
+Unit tests for two_tier.py.
+
+    pip install pytest fakeredis && python -m pytest -q
+"""
+
+import time
+
+import pytest
+
+from two_tier import CLEAR_ALL, InvalidationBus, LocalCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LocalCache(max_entries=2, default_ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')          # a is now the most recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats['evictions'] == 1
+
+
+def test_entries_expire():
+    cache = LocalCache(default_ttl=0.02)
+    cache.set('a', 1)
+    assert cache.get_with_ttl('a')[1] <= 0.02
+    time.sleep(0.03)
+    assert cache.get('a') is None
+    assert cache.stats['expired'] == 1
+
+
+def test_zero_ttl_is_not_stored():
+    cache = LocalCache()
+    cache.set('a', 1, ttl=0)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_invalidation_message_evicts_key():
+    fakeredis = pytest.importorskip('fakeredis')
+    cache = LocalCache(default_ttl=60)
+    bus = InvalidationBus(fakeredis.FakeRedis(decode_responses=True), cache)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    bus._on_message({'data': 'a'})
+    assert cache.get('a') is None and cache.get('b') == 2
+
+    bus._on_message({'data': CLEAR_ALL})
+    assert len(cache) == 0
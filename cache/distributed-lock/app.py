@@ -1,9 +1,13 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 import redis
 import time
 import os
 import uuid
 import threading
+from striped_stock import StripedStock
+from fair_lock import FairLock
+from reservations import Reservations
+from lease_lock import LeaseLock
 
 app = Flask(__name__)
 
@@ -11,15 +15,86 @@ redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379,
 APP_NAME = os.getenv('APP_NAME', 'app')
 
 # Simulated shared resource (e.g., inventory count)
+# Every product has its own counter: product:{id}:stock (units sold via /buy/batch: product:{id}:sold)
+PRODUCTS_KEY = 'inventory:products'
 INVENTORY_KEY = 'product:1:stock'
+DEFAULT_STOCK = 100
+MAX_BATCH_ITEMS = 100
 
-def init_inventory():
-    """Initialize inventory to 100 units"""
-    redis_client.set(INVENTORY_KEY, 100)
+
+def stock_key(product_id):
+    return f'product:{product_id}:stock'
+
+
+def sold_key(product_id):
+    return f'product:{product_id}:sold'
 
 # Statistics keys in Redis (shared across all apps)
 STATS_SUCCESS_KEY = 'stats:successful_purchases'
 STATS_FAILED_KEY = 'stats:failed_purchases'
+STATS_INITIAL_KEY = 'stats:initial_stock'
+
+# Reserved-but-unconfirmed units (sorted set: hold_id -> expires_at ms)
+HOLDS_KEY = 'product:1:holds'
+HOLD_TTL = float(os.getenv('HOLD_TTL', 30))
+MAX_HOLD_TTL = 3600
+MAX_PAUSE = 60
+
+def init_inventory():
+    """Initialize inventory to 100 units"""
+    redis_client.set(INVENTORY_KEY, DEFAULT_STOCK)
+    redis_client.set(STATS_INITIAL_KEY, DEFAULT_STOCK)
+    redis_client.sadd(PRODUCTS_KEY, 1)
+
+# Lua: check stock, decrement, and count the result - all in ONE round trip.
+# Redis runs scripts atomically, so no lock is needed at all.
+ATOMIC_PURCHASE_SCRIPT = """
+local stock = tonumber(redis.call('get', KEYS[1]) or '0')
+if stock <= 0 then
+    redis.call('incr', KEYS[3])
+    return {0, stock}
+end
+redis.call('decr', KEYS[1])
+redis.call('incr', KEYS[2])
+return {1, stock}
+"""
+atomic_purchase = redis_client.register_script(ATOMIC_PURCHASE_SCRIPT)
+
+# Lua: a whole cart in ONE round trip - check every item first, then decrement
+# all of them or none. KEYS = stock_1, sold_1, ..., stock_n, sold_n, failed_key
+# ARGV = qty_1 ... qty_n. Returns {ok, stock_1, ..., stock_n} (stock before).
+BATCH_PURCHASE_SCRIPT = """
+local result = {1}
+for i = 1, #ARGV do
+    local stock = tonumber(redis.call('get', KEYS[2 * i - 1]) or '0')
+    result[i + 1] = stock
+    if stock < tonumber(ARGV[i]) then
+        result[1] = 0
+    end
+end
+if result[1] == 0 then
+    redis.call('incr', KEYS[#KEYS])
+    return result
+end
+for i = 1, #ARGV do
+    redis.call('decrby', KEYS[2 * i - 1], ARGV[i])
+    redis.call('incrby', KEYS[2 * i], ARGV[i])
+end
+return result
+"""
+batch_purchase = redis_client.register_script(BATCH_PURCHASE_SCRIPT)
+
+# Waiters queue up FIFO and are woken by the releasing holder (no sleep-polling)
+purchase_lock = FairLock(redis_client, 'purchase:product:1', ttl=10)
+
+# 1s lease renewed by a watchdog + fencing tokens checked by stock writes
+lease_lock = LeaseLock(redis_client, 'purchase:product:1', lease=float(os.getenv('LOCK_LEASE', 1)))
+
+# Reserve → pay (no lock held) → confirm; expired holds go back to stock
+reservations = Reservations(redis_client, INVENTORY_KEY, HOLDS_KEY, STATS_SUCCESS_KEY)
+
+# Same product's stock split over N bucket keys (enabled with /stock/reset?buckets=N)
+striped_stock = StripedStock(redis_client, product_id=1)
 
 
 def acquire_lock(lock_name, timeout=10):
@@ -199,42 +274,424 @@ def buy_with_lock_retry():
     }), 503
 
 
+@app.route('/buy/with-fair-lock')
+def buy_with_fair_lock():
+    """
+    Purchase with a blocking FIFO lock.
+    Instead of sleep + retry, wait in a queue and get woken up the moment
+    the previous holder releases - served in arrival order.
+    """
+    wait_start = time.time()
+    lock_id = purchase_lock.acquire(timeout=5)
+    waited_ms = round((time.time() - wait_start) * 1000, 1)
+
+    if not lock_id:
+        return jsonify({
+            'status': 'timeout',
+            'reason': 'Could not acquire lock within 5s',
+            'app': APP_NAME,
+            'waited_ms': waited_ms
+        }), 503
+
+    try:
+        stock = int(redis_client.get(INVENTORY_KEY) or 0)
+
+        if stock <= 0:
+            redis_client.incr(STATS_FAILED_KEY)
+            return jsonify({
+                'status': 'failed',
+                'reason': 'out of stock',
+                'app': APP_NAME,
+                'waited_ms': waited_ms
+            }), 400
+
+        time.sleep(0.1)  # Simulate processing
+        new_stock = stock - 1
+        redis_client.set(INVENTORY_KEY, new_stock)
+        redis_client.incr(STATS_SUCCESS_KEY)
+
+        return jsonify({
+            'status': 'success',
+            'app': APP_NAME,
+            'stock_before': stock,
+            'stock_after': new_stock,
+            'waited_ms': waited_ms
+        })
+
+    finally:
+        # Hands the lock straight to the next waiter in the queue
+        purchase_lock.release(lock_id)
+
+
+@app.route('/buy/with-lease-lock')
+def buy_with_lease_lock():
+    """
+    Purchase with a short-lease lock (renewed while we are alive) and a
+    fencing token checked by the stock write.
+    ?crash=1   - take the lock and "die" (no release, no renewal): others wait ~1 lease, not 10s
+    ?pause=2   - freeze for 2s without renewing (GC pause): the lock is lost,
+                 and the late write is rejected
+    """
+    try:
+        pause = float(request.args.get('pause', 0))
+    except ValueError:
+        pause = None
+    if pause is None or not 0 <= pause <= MAX_PAUSE:
+        return jsonify({'status': 'error', 'reason': f'pause must be a number of seconds in [0, {MAX_PAUSE}]',
+                        'app': APP_NAME}), 400
+
+    wait_start = time.time()
+    lease = lease_lock.acquire(timeout=5)
+    waited_ms = round((time.time() - wait_start) * 1000, 1)
+
+    if not lease:
+        return jsonify({
+            'status': 'timeout',
+            'reason': 'Could not acquire lock within 5s',
+            'app': APP_NAME,
+            'waited_ms': waited_ms
+        }), 503
+
+    if request.args.get('crash'):
+        lease.stop_renewing()
+        return jsonify({'status': 'crashed', 'app': APP_NAME, 'fence': lease.fence,
+                        'note': f'lock expires in {lease_lock.lease_ms}ms'}), 500
+
+    try:
+        stock = int(redis_client.get(INVENTORY_KEY) or 0)
+
+        if stock <= 0:
+            redis_client.incr(STATS_FAILED_KEY)
+            return jsonify({
+                'status': 'failed',
+                'reason': 'out of stock',
+                'app': APP_NAME,
+                'fence': lease.fence
+            }), 400
+
+        if pause:
+            lease.stop_renewing()
+            time.sleep(pause)
+        time.sleep(0.1)  # Simulate processing
+
+        new_stock = stock - 1
+        if not lease_lock.fenced_set(INVENTORY_KEY, new_stock, lease):
+            # We lost the lock (a newer holder may already have written) - our view of the stock is stale
+            redis_client.incr(STATS_FAILED_KEY)
+            return jsonify({
+                'status': 'rejected',
+                'reason': 'lock lost or stale fencing token',
+                'app': APP_NAME,
+                'fence': lease.fence,
+                'lock_lost': True
+            }), 409
+        redis_client.incr(STATS_SUCCESS_KEY)
+
+        return jsonify({
+            'status': 'success',
+            'app': APP_NAME,
+            'stock_before': stock,
+            'stock_after': new_stock,
+            'fence': lease.fence,
+            'lock_lost': lease.lost,
+            'waited_ms': waited_ms
+        })
+
+    finally:
+        lease.release()
+
+
+@app.route('/buy/atomic')
+def buy_atomic():
+    """
+    Purchase WITHOUT any lock - check + decrement + stats in one Lua script.
+    One round trip, nothing serialized except a microsecond-long script.
+    """
+    ok, stock = atomic_purchase(keys=[INVENTORY_KEY, STATS_SUCCESS_KEY, STATS_FAILED_KEY])
+
+    if not ok:
+        return jsonify({
+            'status': 'failed',
+            'reason': 'out of stock',
+            'app': APP_NAME,
+            'stock_before': stock
+        }), 400
+
+    # Simulate processing - runs in parallel, no lock is held
+    time.sleep(0.1)
+
+    return jsonify({
+        'status': 'success',
+        'app': APP_NAME,
+        'stock_before': stock,
+        'stock_after': stock - 1,
+        'lock_used': False
+    })
+
+
+def parse_cart():
+    """
+    Cart items as [(product_id, qty)], duplicates merged.
+    GET /buy/batch?items=1:2,2:1   or   POST {"items": [{"product_id": 1, "qty": 2}, ...]}
+    """
+    if request.is_json:
+        body = request.get_json()
+        items = body.get('items') if isinstance(body, dict) else None
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError('expected {"items": [{"product_id": ..., "qty": ...}, ...]}')
+        pairs = [(item['product_id'], item.get('qty', 1)) for item in items]
+    else:
+        pairs = [part.split(':') if ':' in part else (part, 1)
+                 for part in request.args.get('items', '1:1').split(',') if part]
+
+    cart = {}
+    for product_id, qty in pairs:
+        product_id, qty = int(product_id), int(qty)
+        if product_id <= 0 or qty <= 0:
+            raise ValueError(f'product_id and qty must be positive (product {product_id})')
+        cart[product_id] = cart.get(product_id, 0) + qty
+    if not cart or len(cart) > MAX_BATCH_ITEMS:
+        raise ValueError(f'cart must have 1..{MAX_BATCH_ITEMS} products')
+    return list(cart.items())
+
+
+@app.route('/buy/batch', methods=['GET', 'POST'])
+def buy_batch():
+    """
+    Buy a whole cart (many products, any quantity) all-or-nothing.
+    One Lua script checks and decrements every item - one round trip,
+    whatever the cart size. Nothing is decremented if one item is short.
+    """
+    try:
+        cart = parse_cart()
+    except (ValueError, KeyError, TypeError, OverflowError) as e:
+        return jsonify({'status': 'error', 'reason': f'bad cart: {e}', 'app': APP_NAME}), 400
+
+    if striped_stock.bucket_count() and any(product_id == 1 for product_id, _ in cart):
+        # Product 1's stock lives in the stripe buckets, not in product:1:stock
+        return jsonify({'status': 'error', 'app': APP_NAME,
+                        'reason': 'product 1 is striped - buy it with /buy/striped'}), 409
+
+    keys = []
+    for product_id, _ in cart:
+        keys += [stock_key(product_id), sold_key(product_id)]
+    ok, *stocks = batch_purchase(keys=keys + [STATS_FAILED_KEY], args=[qty for _, qty in cart])
+
+    items = []
+    for (product_id, qty), stock in zip(cart, stocks):
+        item = {'product_id': product_id, 'qty': qty, 'stock_before': stock}
+        if ok:
+            item.update(status='bought', stock_after=stock - qty)
+        else:
+            item['status'] = 'available' if stock >= qty else 'insufficient'
+        items.append(item)
+
+    # Simulate processing - runs in parallel, no lock is held
+    if ok:
+        time.sleep(0.1)
+
+    return jsonify({
+        'status': 'success' if ok else 'failed',
+        'reason': None if ok else 'insufficient stock - nothing was bought',
+        'app': APP_NAME,
+        'items': items
+    }), 200 if ok else 400
+
+
+@app.route('/buy/with-reservation')
+def buy_with_reservation():
+    """
+    Purchase with a stock reservation instead of a lock.
+    Reserve one unit atomically, do the slow work WITHOUT holding anything,
+    then confirm. ?fail=1 simulates a declined payment (unit is released).
+    """
+    hold_id, stock = reservations.reserve(ttl=HOLD_TTL)
+
+    if not hold_id:
+        redis_client.incr(STATS_FAILED_KEY)
+        return jsonify({
+            'status': 'failed',
+            'reason': 'out of stock',
+            'app': APP_NAME,
+            'stock_before': stock
+        }), 400
+
+    # Simulate payment - runs in parallel, the unit is already ours
+    time.sleep(0.1)
+
+    if request.args.get('fail'):
+        reservations.cancel(hold_id)
+        return jsonify({
+            'status': 'payment_failed',
+            'app': APP_NAME,
+            'hold_id': hold_id,
+            'released': True
+        }), 402
+
+    if not reservations.confirm(hold_id):
+        # Hold expired and the reaper gave the unit back: refund, don't oversell
+        return jsonify({
+            'status': 'expired',
+            'reason': f'hold not confirmed within {HOLD_TTL}s',
+            'app': APP_NAME,
+            'hold_id': hold_id
+        }), 409
+
+    return jsonify({
+        'status': 'success',
+        'app': APP_NAME,
+        'stock_before': stock,
+        'stock_after': stock - 1,
+        'hold_id': hold_id,
+        'lock_used': False
+    })
+
+
+@app.route('/hold')
+def create_hold():
+    """Reserve one unit and return the hold (?ttl=seconds). Confirm or cancel it later."""
+    try:
+        ttl = float(request.args.get('ttl', HOLD_TTL))
+    except ValueError:
+        ttl = None
+    if ttl is None or not 0 < ttl <= MAX_HOLD_TTL:
+        return jsonify({'status': 'error', 'reason': f'ttl must be a number of seconds in (0, {MAX_HOLD_TTL}]',
+                        'app': APP_NAME}), 400
+    hold_id, stock = reservations.reserve(ttl=ttl)
+    if not hold_id:
+        return jsonify({'status': 'failed', 'reason': 'out of stock', 'app': APP_NAME}), 400
+    return jsonify({'status': 'held', 'hold_id': hold_id, 'ttl': ttl, 'stock_before': stock, 'app': APP_NAME})
+
+
+@app.route('/hold/<hold_id>/confirm')
+def confirm_hold(hold_id):
+    """Turn a hold into a purchase"""
+    if not reservations.confirm(hold_id):
+        return jsonify({'status': 'expired', 'hold_id': hold_id, 'app': APP_NAME}), 409
+    return jsonify({'status': 'success', 'hold_id': hold_id, 'app': APP_NAME})
+
+
+@app.route('/hold/<hold_id>/cancel')
+def cancel_hold(hold_id):
+    """Release a hold - the unit goes back to stock"""
+    if not reservations.cancel(hold_id):
+        return jsonify({'status': 'not_found', 'hold_id': hold_id, 'app': APP_NAME}), 404
+    return jsonify({'status': 'cancelled', 'hold_id': hold_id, 'app': APP_NAME})
+
+
+@app.route('/buy/striped')
+def buy_striped():
+    """
+    Purchase from one of N stock buckets (no single hot key).
+    Falls back to the other buckets only when the chosen one is empty.
+    ?customer=<id> routes by hash instead of at random.
+    """
+    bucket, stock, attempts = striped_stock.purchase(request.args.get('customer'))
+
+    if bucket is None:
+        redis_client.incr(STATS_FAILED_KEY)
+        return jsonify({
+            'status': 'failed',
+            'reason': 'out of stock',
+            'app': APP_NAME,
+            'buckets_tried': attempts
+        }), 400
+
+    # Simulate processing - runs in parallel, no lock is held
+    time.sleep(0.1)
+
+    return jsonify({
+        'status': 'success',
+        'app': APP_NAME,
+        'bucket': bucket,
+        'bucket_stock_before': stock,
+        'buckets_tried': attempts,
+        'lock_used': False
+    })
+
+
+def total_stock():
+    """Product 1: main stock key + every stripe bucket, and units sold outside STATS_SUCCESS_KEY"""
+    bucket_stock, bucket_sold = striped_stock.totals()
+    stock, batch_sold = redis_client.mget(INVENTORY_KEY, sold_key(1))
+    return int(stock or 0) + bucket_stock, bucket_sold + int(batch_sold or 0)
+
+
+def product_ids():
+    return sorted(int(i) for i in redis_client.smembers(PRODUCTS_KEY))
+
+
 @app.route('/stock')
 def get_stock():
     """Get current stock level"""
-    stock = redis_client.get(INVENTORY_KEY)
+    stock, _ = total_stock()
+    others = [i for i in product_ids() if i != 1]
+    levels = redis_client.mget([stock_key(i) for i in others]) if others else []
     return jsonify({
         'product_id': 1,
-        'stock': int(stock) if stock else 0
+        'stock': stock,
+        'buckets': striped_stock.levels(),
+        'other_products': {i: int(level or 0) for i, level in zip(others, levels)}
     })
 
 
 @app.route('/stock/reset')
 def reset_stock():
-    """Reset stock to 100 and clear stats"""
-    redis_client.set(INVENTORY_KEY, 100)
-    redis_client.delete('lock:purchase:product:1')
+    """Reset stock to 100 (or ?stock=N) and clear stats. ?products=N stocks products 1..N."""
+    try:
+        stock = int(request.args.get('stock', DEFAULT_STOCK))
+        buckets = int(request.args.get('buckets', 0))
+        products = max(1, int(request.args.get('products', 1)))
+    except ValueError:
+        return jsonify({'status': 'error', 'reason': 'stock, buckets and products must be integers'}), 400
+    if stock < 0 or buckets < 0:
+        return jsonify({'status': 'error', 'reason': 'stock and buckets must be >= 0'}), 400
+
+    pipe = redis_client.pipeline()
+    for product_id in product_ids():
+        pipe.delete(stock_key(product_id), sold_key(product_id))
+    pipe.delete(PRODUCTS_KEY)
+    for product_id in range(2, products + 1):
+        pipe.set(stock_key(product_id), stock)
+    pipe.sadd(PRODUCTS_KEY, *range(1, products + 1))
+    pipe.execute()
+
+    # Striped: all stock lives in the buckets, the single key is emptied
+    striped_stock.reset(stock, buckets)
+    reservations.reset()
+    redis_client.set(INVENTORY_KEY, 0 if buckets else stock)
+    redis_client.set(STATS_INITIAL_KEY, stock)
+    redis_client.delete('lock:purchase:product:1', purchase_lock.queue_key, f'{INVENTORY_KEY}:fence')
     redis_client.set(STATS_SUCCESS_KEY, 0)
     redis_client.set(STATS_FAILED_KEY, 0)
     return jsonify({
         'status': 'reset',
-        'stock': 100
+        'stock': stock,
+        'buckets': buckets,
+        'products': products
     })
 
 
 @app.route('/stats')
 def get_stats():
     """Get purchase statistics"""
-    stock = int(redis_client.get(INVENTORY_KEY) or 0)
-    successful = int(redis_client.get(STATS_SUCCESS_KEY) or 0)
+    stock, bucket_sold = total_stock()
+    successful = int(redis_client.get(STATS_SUCCESS_KEY) or 0) + bucket_sold
     failed = int(redis_client.get(STATS_FAILED_KEY) or 0)
-    expected_stock = 100 - successful
+    initial = int(redis_client.get(STATS_INITIAL_KEY) or DEFAULT_STOCK)
+    held = reservations.held()
+    # Reserved units are out of stock but not sold (yet)
+    expected_stock = initial - successful - held
     return jsonify({
+        'initial_stock': initial,
         'current_stock': stock,
         'successful_purchases': successful,
+        'held_units': held,
         'failed_purchases': failed,
         'expected_stock': expected_stock,
-        'stock_matches_expected': stock == expected_stock
+        'stock_matches_expected': stock == expected_stock,
+        'lock_waiters': purchase_lock.waiting(),
+        'redis_commands_processed': redis_client.info('stats')['total_commands_processed']
     })
 
 
@@ -248,8 +705,15 @@ def index():
             '/buy/no-lock': 'Purchase WITHOUT lock (causes race conditions!)',
             '/buy/with-lock': 'Purchase WITH lock (safe, but may fail if busy)',
             '/buy/with-lock-retry': 'Purchase WITH lock + retry (safe + resilient)',
+            '/buy/with-fair-lock': 'Purchase WITH blocking FIFO lock (woken on release, no polling)',
+            '/buy/with-lease-lock': 'Purchase WITH 1s lease lock + watchdog + fencing token (?crash=1, ?pause=2)',
+            '/buy/atomic': 'Purchase with one atomic Lua script (safe, no lock, 1 round trip)',
+            '/buy/with-reservation': 'Reserve → pay (no lock held) → confirm (?fail=1 releases the unit)',
+            '/hold': 'Reserve one unit (?ttl=seconds), then /hold/<id>/confirm or /hold/<id>/cancel',
+            '/buy/batch': 'Buy a cart all-or-nothing in one round trip (?items=1:2,2:1 or POST JSON)',
+            '/buy/striped': 'Purchase from one of N stock buckets (needs /stock/reset?buckets=N)',
             '/stock': 'Check current stock',
-            '/stock/reset': 'Reset stock to 100',
+            '/stock/reset': 'Reset stock to 100 (or ?stock=N, ?buckets=N to stripe it, ?products=N for more products)',
             '/stats': 'View purchase statistics'
         },
         'try_this': [
@@ -258,7 +722,8 @@ def index():
             '3. Check /stats - race_conditions_detected > 0 means overselling!',
             '4. /stock/reset again',
             '5. Run concurrent requests to /buy/with-lock',
-            '6. Check /stats - no race conditions, stock is accurate'
+            '6. Check /stats - no race conditions, stock is accurate',
+            '7. python bench.py - the same comparison under load, with latency percentiles'
         ],
         'app': APP_NAME
     })
@@ -266,4 +731,6 @@ def index():
 
 if __name__ == '__main__':
     init_inventory()
+    reservations.start_reaper(interval=float(os.getenv('HOLD_REAP_INTERVAL', 1)))
+    striped_stock.start_rebalancer(interval=float(os.getenv('REBALANCE_INTERVAL', 1)))
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Async load generator: N concurrent buyers against every app instance.
+
+For each mode: reset stock through /stock/reset, let the buyers fire
+purchases (round-robin over --urls), then read /stats. Reports throughput,
+p50/p95/p99 latency, busy/timeout rates, Redis commands per successful
+purchase and the stock_matches_expected invariant - repeatable numbers
+before and after a lock change. Standard library only (asyncio streams).
+
+    python bench.py                                  # all modes, default settings
+    python bench.py --modes no-lock with-lock with-lock-retry --requests 500 --concurrency 50
+    python bench.py --modes striped --buckets 16 --requests 2000 --concurrency 100
+    python bench.py --modes batch --cart-size 20      # one cart = 20 products, 1 unit each
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+DEFAULT_URLS = ['http://localhost:5001', 'http://localhost:5002', 'http://localhost:5003']
+MODES = ['no-lock', 'with-lock', 'with-lock-retry', 'with-fair-lock', 'with-lease-lock',
+         'with-reservation', 'atomic', 'striped', 'batch']
+
+
+async def get(url, timeout=30):
+    """Minimal HTTP/1.1 GET (one connection per request). Returns (status, json body)."""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, body = raw.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, json.loads(body or b'{}')
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+async def run_mode(mode, urls, requests, concurrency, stock, buckets=8, cart_size=1):
+    products = cart_size if mode == 'batch' else 1
+    await get(f"{urls[0]}/stock/reset?stock={stock}&buckets={buckets if mode == 'striped' else 0}&products={products}")
+    path = f'/buy/{mode}'
+    if mode == 'batch':
+        path += '?items=' + ','.join(f'{i}:1' for i in range(1, cart_size + 1))
+    _, before = await get(f'{urls[0]}/stats')
+
+    statuses = Counter()
+    latencies = []
+    next_request = iter(range(requests))
+
+    async def buyer():
+        # One event loop thread: buyers share the iterator without a lock
+        for i in next_request:
+            start = time.perf_counter()
+            try:
+                _, body = await get(f'{urls[i % len(urls)]}{path}')
+                status = body.get('status', 'error')
+            except Exception:
+                status = 'error'
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(buyer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    _, stats = await get(f'{urls[0]}/stats')
+    latencies.sort()
+    # Two /stats calls are included in the delta - negligible next to the purchases
+    redis_ops = stats['redis_commands_processed'] - before['redis_commands_processed']
+    return {
+        'mode': mode,
+        'elapsed': elapsed,
+        'requests_per_sec': requests / elapsed,
+        'purchases_per_sec': statuses['success'] / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'busy_rate': statuses['busy'] / requests,
+        'timeout_rate': statuses['timeout'] / requests,
+        'redis_ops_per_purchase': redis_ops / statuses['success'] if statuses['success'] else 0,
+        'statuses': dict(statuses),
+        'stock_matches_expected': stats.get('stock_matches_expected'),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', nargs='+', default=DEFAULT_URLS)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=30, help='concurrent buyers')
+    parser.add_argument('--stock', type=int, default=None, help='initial stock (default: = requests)')
+    parser.add_argument('--buckets', type=int, default=8, help='stock buckets for the striped mode')
+    parser.add_argument('--cart-size', type=int, default=5, help='products per cart for the batch mode')
+    args = parser.parse_args()
+    stock = args.stock or args.requests
+
+    print(f'{args.requests} purchases, {args.concurrency} concurrent buyers, stock {stock}, '
+          f'{len(args.urls)} instances\n')
+    print(f"{'mode':<18} {'seconds':>8} {'req/s':>8} {'buys/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'busy':>6} {'timeout':>7} {'ops/buy':>8}  {'invariant':<10} statuses")
+    for mode in args.modes:
+        r = await run_mode(mode, args.urls, args.requests, args.concurrency, stock, args.buckets, args.cart_size)
+        invariant = 'OK' if r['stock_matches_expected'] else 'BROKEN'
+        print(f"{mode:<18} {r['elapsed']:>8.2f} {r['requests_per_sec']:>8.1f} {r['purchases_per_sec']:>8.1f} "
+              f"{r['p50_ms']:>7.0f} {r['p95_ms']:>7.0f} {r['p99_ms']:>7.0f} "
+              f"{r['busy_rate']:>6.0%} {r['timeout_rate']:>7.0%} {r['redis_ops_per_purchase']:>8.1f}  "
+              f"{invariant:<10} {r['statuses']}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
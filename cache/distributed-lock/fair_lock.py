@@ -0,0 +1,148 @@
+"""
+Blocking, fair (FIFO) distributed lock.
+
+/buy/with-lock-retry polls: SET NX → fail → sleep 150ms → SET NX → ...
+That wastes Redis ops, adds up to 150ms of dead time per loss, and whoever
+happens to retry at the right moment wins (no fairness).
+
+This lock queues waiters instead and HANDS the lock to the next one:
+
+    acquire:  lock free and nobody queued?  → take it
+              otherwise                     → RPUSH lock:<name>:queue <me>
+                                              BLPOP lock:<name>:wake:<me>   (blocks, 0 ops)
+    release:  LPOP next waiter → SET lock = next → RPUSH its wake key
+              (the waiter wakes up already owning the lock - FIFO, no race)
+
+Waiters keep a short-lived `alive` key, so a waiter that died in the queue
+is skipped. If a holder crashes, its lock expires (TTL) and the head of the
+queue claims it on its next wake-up slice.
+
+Wake/alive key names are built inside the scripts from a prefix, which is
+fine on a single Redis node (this lab) but not on Redis Cluster.
+"""
+
+import time
+import uuid
+
+ACQUIRE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 and redis.call('llen', KEYS[2]) == 0 then
+    redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+redis.call('rpush', KEYS[2], ARGV[1])
+redis.call('set', ARGV[4] .. ARGV[1], 1, 'PX', ARGV[3])
+return 0
+"""
+
+# Hand the lock straight to the next live waiter, or free it
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+while true do
+    local nxt = redis.call('lpop', KEYS[2])
+    if not nxt then
+        redis.call('del', KEYS[1])
+        return 1
+    end
+    if redis.call('exists', ARGV[4] .. nxt) == 1 then
+        redis.call('set', KEYS[1], nxt, 'PX', ARGV[2])
+        redis.call('rpush', ARGV[3] .. nxt, 1)
+        redis.call('pexpire', ARGV[3] .. nxt, ARGV[2])
+        return 2
+    end
+end
+"""
+
+# Lock expired without a handoff (holder crashed): the head of the queue takes it
+CLAIM_SCRIPT = """
+local owner = redis.call('get', KEYS[1])
+if owner then
+    if owner == ARGV[1] then
+        return 1
+    end
+    return 0
+end
+while true do
+    local head = redis.call('lindex', KEYS[2], 0)
+    if not head or head == ARGV[1] or redis.call('exists', ARGV[3] .. head) == 1 then
+        break
+    end
+    redis.call('lpop', KEYS[2])
+end
+if redis.call('lindex', KEYS[2], 0) == ARGV[1] then
+    redis.call('lpop', KEYS[2])
+    redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Give up waiting - unless the lock was handed to us at the last moment
+CANCEL_SCRIPT = """
+redis.call('lrem', KEYS[2], 0, ARGV[1])
+redis.call('del', ARGV[2] .. ARGV[1])
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return 1
+end
+return 0
+"""
+
+
+class FairLock:
+    """
+    lock = FairLock(redis_client, 'purchase:product:1')
+    token = lock.acquire(timeout=5)
+    if token:
+        try: ... critical section ...
+        finally: lock.release(token)
+    """
+
+    def __init__(self, redis_client, name, ttl=10, wake_slice=1.0):
+        self.redis = redis_client
+        self.lock_key = f'lock:{name}'
+        self.queue_key = f'lock:{name}:queue'
+        self.wake_prefix = f'lock:{name}:wake:'
+        self.alive_prefix = f'lock:{name}:alive:'
+        self.ttl_ms = int(ttl * 1000)
+        self.wake_slice = wake_slice   # how often a waiter checks for a crashed holder
+        self._acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+        self._claim = redis_client.register_script(CLAIM_SCRIPT)
+        self._cancel = redis_client.register_script(CANCEL_SCRIPT)
+
+    def acquire(self, timeout=5.0):
+        """Block until the lock is ours (FIFO). Returns a token, or None on timeout."""
+        token = str(uuid.uuid4())
+        alive_ms = int(self.wake_slice * 3000)
+        keys = [self.lock_key, self.queue_key]
+
+        if self._acquire(keys=keys, args=[token, self.ttl_ms, alive_ms, self.alive_prefix]):
+            return token
+
+        wake_key = self.wake_prefix + token
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Blocks inside Redis until the holder hands over - no polling
+            if self.redis.blpop([wake_key], timeout=min(self.wake_slice, remaining)):
+                return token
+            # Still waiting: stay alive, and take over if the holder crashed
+            self.redis.set(self.alive_prefix + token, 1, px=alive_ms)
+            if self._claim(keys=keys, args=[token, self.ttl_ms, self.alive_prefix]):
+                return token
+
+        if self._cancel(keys=keys, args=[token, self.alive_prefix]):
+            return token
+        return None
+
+    def release(self, token):
+        """Release, handing the lock to the next waiter if there is one."""
+        self.redis.delete(self.alive_prefix + token, self.wake_prefix + token)
+        return self._release(keys=[self.lock_key, self.queue_key],
+                             args=[token, self.ttl_ms, self.wake_prefix, self.alive_prefix]) > 0
+
+    def waiting(self):
+        return self.redis.llen(self.queue_key)
@@ -0,0 +1,148 @@
+"""
+Short-lease lock with a renewal watchdog and fencing tokens.
+
+`acquire_lock(..., timeout=10)` picks one expiry for two opposite cases:
+  - holder crashed   → everybody waits up to 10s for the key to expire
+  - holder is slow   → after 10s the lock silently expires under it
+
+LeaseLock uses a SHORT lease (1s) and a watchdog thread that renews it every
+lease/3 while the holder is alive. A crashed holder stops renewing, so the
+lock frees up within one lease. A holder that stalls (GC pause, slow call)
+longer than the lease loses the lock - `lease.lost` tells it so.
+
+Every acquire also gets a fencing token: INCR lock:<name>:fence, so tokens
+only go up. Writes go through `fenced_set`, which refuses a write unless the
+writer still holds the lock AND its token is the newest one issued - a stale
+holder that wakes up after losing its lock cannot write, whether or not the
+new holder has written yet.
+
+    acquire:  fence = INCR lock:<name>:fence ; SET lock:<name> <id> NX PX 1000
+    renew:    GET == <id> ? PEXPIRE 1000          (every ~330ms)
+    write:    lock:<name> == <id> and fence >= lock:<name>:fence and fence >= <key>:fence
+                  ? SET <key>, SET <key>:fence = fence : reject
+"""
+
+import threading
+import time
+import uuid
+
+ACQUIRE_SCRIPT = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Storage-side check: only the current holder, with the newest token issued
+# and not older than the last write to this key, may write.
+# KEYS = key, key:fence, lock key, lock fence counter; ARGV = value, fence, lock_id
+FENCED_SET_SCRIPT = """
+local fence = tonumber(ARGV[2])
+if redis.call('get', KEYS[3]) ~= ARGV[3] then
+    return 0
+end
+if fence < tonumber(redis.call('get', KEYS[4]) or '0') then
+    return 0
+end
+if fence < tonumber(redis.call('get', KEYS[2]) or '0') then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[1])
+redis.call('set', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+class Lease:
+    """A held lock: `fence` goes with every write, `lost` is set if renewal failed."""
+
+    def __init__(self, lock, lock_id, fence):
+        self.lock = lock
+        self.lock_id = lock_id
+        self.fence = fence
+        self.lost = False
+        self._stop = threading.Event()
+        self._watchdog = threading.Thread(target=self._renew_loop, name=f'lease-{lock.name}', daemon=True)
+        self._watchdog.start()
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.lock.renew_every):
+            try:
+                renewed = self.lock._renew(keys=[self.lock.lock_key], args=[self.lock_id, self.lock.lease_ms])
+            except Exception as e:
+                print(f'lease renewal failed: {e}')
+                renewed = 0
+            if not renewed:
+                self.lost = True
+                return
+
+    def stop_renewing(self):
+        """Stop the watchdog (what a crashed or frozen process looks like)."""
+        self._stop.set()
+
+    def release(self):
+        self.stop_renewing()
+        return self.lock._release(keys=[self.lock.lock_key], args=[self.lock_id]) == 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LeaseLock:
+    """
+    lock = LeaseLock(redis_client, 'purchase:product:1', lease=1.0)
+    lease = lock.acquire(timeout=5)
+    if lease:
+        with lease:
+            ... lock.fenced_set('product:1:stock', new_stock, lease) ...
+    """
+
+    def __init__(self, redis_client, name, lease=1.0, renew_every=None):
+        self.redis = redis_client
+        self.name = name
+        self.lock_key = f'lock:{name}'
+        self.fence_key = f'lock:{name}:fence'
+        self.lease_ms = int(lease * 1000)
+        self.renew_every = renew_every or lease / 3
+        self._acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._renew = redis_client.register_script(RENEW_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+        self._fenced_set = redis_client.register_script(FENCED_SET_SCRIPT)
+
+    def try_acquire(self):
+        lock_id = str(uuid.uuid4())
+        fence = self._acquire(keys=[self.lock_key, self.fence_key], args=[lock_id, self.lease_ms])
+        return Lease(self, lock_id, fence) if fence else None
+
+    def acquire(self, timeout=5.0, retry_delay=0.02):
+        """Retry until acquired or `timeout` seconds passed. Returns a Lease or None."""
+        deadline = time.monotonic() + timeout
+        while True:
+            lease = self.try_acquire()
+            if lease or time.monotonic() >= deadline:
+                return lease
+            time.sleep(retry_delay)
+
+    def fenced_set(self, key, value, lease):
+        """SET key only if `lease` still holds the lock and its fence is the newest."""
+        if lease.lost:
+            return False
+        return self._fenced_set(keys=[key, f'{key}:fence', self.lock_key, self.fence_key],
+                                args=[value, lease.fence, lease.lock_id]) == 1
@@ -0,0 +1,127 @@
+"""
+Stock reservations (escrow holds): reserve → slow work → confirm / cancel.
+
+With a lock, the payment call runs INSIDE the critical section, so the lock
+is held as long as the slowest downstream call. Here the critical section is
+a Lua script (microseconds):
+
+    reserve:  stock > 0 ?  DECR stock, ZADD holds <hold_id> <expires_at>
+    ... payment, validation, ... (no lock held, other buyers keep going)
+    confirm:  ZREM holds <hold_id>  → removed? INCR successful purchases
+    cancel:   ZREM holds <hold_id>  → removed? INCR stock (unit goes back)
+
+A buyer that crashes or stalls never confirms: the reaper returns every hold
+past its deadline to the stock. A late confirm then finds no hold and fails
+(refund the payment) - a unit is never sold twice.
+
+Deadlines use the Redis server clock (TIME), so app instances with skewed
+clocks agree on when a hold expires.
+"""
+
+import threading
+import time
+import uuid
+
+RESERVE_SCRIPT = """
+local stock = tonumber(redis.call('get', KEYS[1]) or '0')
+if stock <= 0 then
+    return {0, stock}
+end
+local now = redis.call('time')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+redis.call('decr', KEYS[1])
+redis.call('zadd', KEYS[2], now_ms + tonumber(ARGV[2]), ARGV[1])
+return {1, stock}
+"""
+
+CONFIRM_SCRIPT = """
+if redis.call('zrem', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('incr', KEYS[2])
+return 1
+"""
+
+CANCEL_SCRIPT = """
+if redis.call('zrem', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('incr', KEYS[1])
+return 1
+"""
+
+# Return expired holds to the stock, at most ARGV[1] per call
+REAP_SCRIPT = """
+local now = redis.call('time')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local expired = redis.call('zrangebyscore', KEYS[2], '-inf', now_ms, 'LIMIT', 0, tonumber(ARGV[1]))
+for _, hold_id in ipairs(expired) do
+    redis.call('zrem', KEYS[2], hold_id)
+end
+if #expired > 0 then
+    redis.call('incrby', KEYS[1], #expired)
+end
+return #expired
+"""
+
+
+class Reservations:
+    """
+    holds = Reservations(redis_client, 'product:1:stock', 'product:1:holds', 'stats:successful_purchases')
+    hold_id, stock = holds.reserve(ttl=30)
+    if hold_id:
+        ok = pay()
+        holds.confirm(hold_id) if ok else holds.cancel(hold_id)
+    """
+
+    def __init__(self, redis_client, stock_key, holds_key, sold_key):
+        self.redis = redis_client
+        self.stock_key = stock_key
+        self.holds_key = holds_key
+        self.sold_key = sold_key
+        self._reserve = redis_client.register_script(RESERVE_SCRIPT)
+        self._confirm = redis_client.register_script(CONFIRM_SCRIPT)
+        self._cancel = redis_client.register_script(CANCEL_SCRIPT)
+        self._reap = redis_client.register_script(REAP_SCRIPT)
+
+    def reserve(self, ttl=30):
+        """Hold one unit for `ttl` seconds. Returns (hold_id, stock_before) or (None, stock)."""
+        hold_id = str(uuid.uuid4())
+        ok, stock = self._reserve(keys=[self.stock_key, self.holds_key], args=[hold_id, int(ttl * 1000)])
+        return (hold_id if ok else None), stock
+
+    def confirm(self, hold_id):
+        """Turn the hold into a sale. False if it expired (or was cancelled) first."""
+        return self._confirm(keys=[self.holds_key, self.sold_key], args=[hold_id]) == 1
+
+    def cancel(self, hold_id):
+        """Give the unit back. False if the hold no longer exists."""
+        return self._cancel(keys=[self.stock_key, self.holds_key], args=[hold_id]) == 1
+
+    def held(self):
+        """Units currently reserved but not confirmed"""
+        return self.redis.zcard(self.holds_key)
+
+    def reap(self, batch=100):
+        """Return expired holds to the stock. Returns units returned."""
+        total = 0
+        while True:
+            n = self._reap(keys=[self.stock_key, self.holds_key], args=[batch])
+            total += n
+            if n < batch:
+                return total
+
+    def reset(self):
+        self.redis.delete(self.holds_key)
+
+    def start_reaper(self, interval=1.0):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    returned = self.reap()
+                    if returned:
+                        print(f'reaper: returned {returned} expired holds to stock')
+                except Exception as e:
+                    print(f'hold reaper failed: {e}')
+        threading.Thread(target=loop, name='hold-reaper', daemon=True).start()
@@ -0,0 +1,179 @@
+"""
+Striped (sharded) inventory counters for hot products.
+
+Even an atomic DECR on `product:1:stock` is ONE hot key on ONE Redis shard.
+Striping splits the stock into N buckets:
+
+    product:1:stock        100      →   {product:1:b0}:stock  13
+                                        {product:1:b1}:stock  13
+                                        ...
+                                        {product:1:b7}:stock  12
+
+A purchase goes to a random (or hashed) bucket and only falls back to the
+other buckets when its bucket is empty. The `{...}` hash tag keeps each
+bucket's stock and sold counter on the same cluster slot (one script),
+while different buckets spread over different shards.
+
+A background rebalancer moves stock from full buckets to (nearly) empty
+ones, so fallbacks stay rare until the product is really sold out. Each move
+is one script touching two buckets - fine on a single Redis node (this lab),
+on Redis Cluster it needs both buckets in the same slot.
+"""
+
+import random
+import threading
+import time
+import uuid
+import zlib
+
+# Take one unit from a bucket and count it as sold - one key slot, one round trip
+BUCKET_PURCHASE_SCRIPT = """
+local stock = tonumber(redis.call('get', KEYS[1]) or '0')
+if stock <= 0 then
+    return -1
+end
+redis.call('decr', KEYS[1])
+redis.call('incr', KEYS[2])
+return stock
+"""
+
+# Move up to ARGV[1] units from a donor bucket to a receiver, returns how many moved.
+# Take and give in one script: a crash can't lose units in between.
+MOVE_SCRIPT = """
+local stock = tonumber(redis.call('get', KEYS[1]) or '0')
+local n = math.min(stock, tonumber(ARGV[1]))
+if n <= 0 then
+    return 0
+end
+redis.call('decrby', KEYS[1], n)
+redis.call('incrby', KEYS[2], n)
+return n
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+class StripedStock:
+    def __init__(self, redis_client, product_id=1):
+        self.redis = redis_client
+        self.product_id = product_id
+        self.buckets_key = f'product:{product_id}:buckets'
+        self._purchase = redis_client.register_script(BUCKET_PURCHASE_SCRIPT)
+        self._move = redis_client.register_script(MOVE_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+    def stock_key(self, bucket):
+        return f'{{product:{self.product_id}:b{bucket}}}:stock'
+
+    def sold_key(self, bucket):
+        return f'{{product:{self.product_id}:b{bucket}}}:sold'
+
+    def bucket_count(self):
+        return int(self.redis.get(self.buckets_key) or 0)
+
+    def reset(self, stock, buckets):
+        """Split `stock` evenly over `buckets` buckets (0 = striping off)."""
+        old = self.bucket_count()
+        pipe = self.redis.pipeline()
+        for i in range(max(old, buckets)):
+            pipe.delete(self.stock_key(i), self.sold_key(i))
+        for i in range(buckets):
+            pipe.set(self.stock_key(i), stock // buckets + (1 if i < stock % buckets else 0))
+            pipe.set(self.sold_key(i), 0)
+        pipe.set(self.buckets_key, buckets)
+        pipe.execute()
+
+    def purchase(self, routing_key=None):
+        """
+        Try one bucket, fall back to the others if it is empty.
+        Returns (bucket, stock_before, attempts) or (None, 0, attempts) when sold out.
+        """
+        n = self.bucket_count()
+        if n == 0:
+            return None, 0, 0
+        if routing_key is not None:
+            start = zlib.crc32(str(routing_key).encode()) % n
+        else:
+            start = random.randrange(n)
+
+        for attempt in range(n):
+            bucket = (start + attempt) % n
+            stock = self._purchase(keys=[self.stock_key(bucket), self.sold_key(bucket)])
+            if stock > 0:
+                return bucket, stock, attempt + 1
+        return None, 0, n
+
+    def levels(self):
+        """Current stock per bucket"""
+        n = self.bucket_count()
+        if n == 0:
+            return []
+        pipe = self.redis.pipeline()
+        for i in range(n):
+            pipe.get(self.stock_key(i))
+        return [int(v or 0) for v in pipe.execute()]
+
+    def totals(self):
+        """(stock, sold) summed over all buckets"""
+        n = self.bucket_count()
+        if n == 0:
+            return 0, 0
+        pipe = self.redis.pipeline()
+        for i in range(n):
+            pipe.get(self.stock_key(i))
+            pipe.get(self.sold_key(i))
+        values = [int(v or 0) for v in pipe.execute()]
+        return sum(values[0::2]), sum(values[1::2])
+
+    def rebalance(self, low_water=0.5):
+        """
+        Move stock from the fullest buckets to buckets below low_water * average.
+        Only one app instance rebalances at a time. Returns units moved.
+        """
+        lock_key = f'lock:rebalance:product:{self.product_id}'
+        token = str(uuid.uuid4())
+        if not self.redis.set(lock_key, token, nx=True, ex=5):
+            return 0
+        try:
+            levels = self.levels()
+            if len(levels) < 2:
+                return 0
+            target = sum(levels) // len(levels)
+            if target == 0:
+                return 0
+
+            moved = 0
+            needy = [i for i, level in enumerate(levels) if level < target * low_water]
+            for receiver in needy:
+                want = target - levels[receiver]
+                for donor in sorted(range(len(levels)), key=lambda i: -levels[i]):
+                    surplus = levels[donor] - target
+                    if want <= 0 or surplus <= 0:
+                        break
+                    # Donor may have sold units since levels() - the script moves what is there
+                    taken = self._move(keys=[self.stock_key(donor), self.stock_key(receiver)],
+                                       args=[min(want, surplus)])
+                    if taken:
+                        levels[donor] -= taken
+                        levels[receiver] += taken
+                        want -= taken
+                        moved += taken
+            return moved
+        finally:
+            self._release(keys=[lock_key], args=[token])
+
+    def start_rebalancer(self, interval=1.0):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.rebalance()
+                except Exception as e:
+                    print(f'stock rebalance failed: {e}')
+        threading.Thread(target=loop, name='stock-rebalancer', daemon=True).start()
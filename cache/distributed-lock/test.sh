@@ -70,6 +70,169 @@ if [ "$RACE" -eq 0 ] && [ "$MATCH" == "true" ]; then
 fi
 echo ""
 
+echo "============================================"
+echo "  TEST 3: Atomic Lua purchase (no lock)"
+echo "============================================"
+echo ""
+
+echo ">>> Resetting stock to 10 units..."
+curl -s "http://localhost:5001/stock/reset?stock=10" > /dev/null
+
+echo ">>> Sending 20 concurrent purchases to 3 apps via /buy/atomic..."
+for i in {1..20}; do
+    port=$((5001 + (i % 3)))
+    curl -s http://localhost:$port/buy/atomic > /dev/null &
+done
+wait
+
+STATS=$(curl -s http://localhost:5001/stats)
+echo "$STATS" | jq '{current_stock, successful_purchases, failed_purchases, stock_matches_expected}'
+if [ "$(echo "$STATS" | jq '.successful_purchases == 10 and .current_stock == 0 and .stock_matches_expected')" = "true" ]; then
+    echo "PASS: exactly 10 sold, no overselling"
+else
+    echo "FAIL: atomic purchases oversold or lost units"
+fi
+echo ""
+
+echo "============================================"
+echo "  TEST 4: Striped stock (4 buckets)"
+echo "============================================"
+echo ""
+
+echo ">>> Resetting stock to 20 units over 4 buckets..."
+curl -s "http://localhost:5001/stock/reset?stock=20&buckets=4" > /dev/null
+
+echo ">>> Sending 30 concurrent purchases to 3 apps via /buy/striped..."
+for i in {1..30}; do
+    port=$((5001 + (i % 3)))
+    curl -s "http://localhost:$port/buy/striped?customer=$i" > /dev/null &
+done
+wait
+
+STATS=$(curl -s http://localhost:5001/stats)
+echo "$STATS" | jq '{current_stock, successful_purchases, failed_purchases, stock_matches_expected}'
+if [ "$(echo "$STATS" | jq '.successful_purchases == 20 and .current_stock == 0 and .stock_matches_expected')" = "true" ]; then
+    echo "PASS: all 20 units sold across the buckets, none oversold"
+else
+    echo "FAIL: striped purchases oversold or lost units"
+fi
+echo ""
+
+echo "============================================"
+echo "  TEST 5: Fair (FIFO) lock"
+echo "============================================"
+echo ""
+
+echo ">>> Resetting stock to 100 units..."
+curl -s http://localhost:5001/stock/reset > /dev/null
+
+echo ">>> Sending 15 concurrent purchases to 3 apps via /buy/with-fair-lock..."
+for i in {1..15}; do
+    port=$((5001 + (i % 3)))
+    curl -s -o /dev/null -w '%{http_code}\n' http://localhost:$port/buy/with-fair-lock &
+done > /tmp/fair_lock.out
+wait
+
+STATS=$(curl -s http://localhost:5001/stats)
+echo "$STATS" | jq '{current_stock, successful_purchases, lock_waiters, stock_matches_expected}'
+OK=$(grep -c '^200$' /tmp/fair_lock.out)
+if [ "$OK" -eq 15 ] && [ "$(echo "$STATS" | jq '.successful_purchases == 15 and .lock_waiters == 0 and .stock_matches_expected')" = "true" ]; then
+    echo "PASS: all 15 waited their turn, no busy errors, stock is accurate"
+else
+    echo "FAIL: $OK of 15 purchases succeeded"
+fi
+echo ""
+
+echo "============================================"
+echo "  TEST 6: Holds (reserve / confirm / cancel)"
+echo "============================================"
+echo ""
+
+echo ">>> Resetting stock to 100 units..."
+curl -s http://localhost:5001/stock/reset > /dev/null
+
+CONFIRM_ID=$(curl -s "http://localhost:5001/hold?ttl=30" | jq -r '.hold_id')
+CANCEL_ID=$(curl -s "http://localhost:5002/hold?ttl=30" | jq -r '.hold_id')
+curl -s "http://localhost:5003/hold?ttl=1" > /dev/null     # never confirmed - the reaper returns it
+curl -s "http://localhost:5002/hold/$CONFIRM_ID/confirm" > /dev/null
+curl -s "http://localhost:5003/hold/$CANCEL_ID/cancel" > /dev/null
+sleep 3
+
+STATS=$(curl -s http://localhost:5001/stats)
+echo "$STATS" | jq '{current_stock, successful_purchases, held_units, stock_matches_expected}'
+if [ "$(echo "$STATS" | jq '.current_stock == 99 and .successful_purchases == 1 and .held_units == 0')" = "true" ]; then
+    echo "PASS: confirmed unit sold, cancelled and expired units back in stock"
+else
+    echo "FAIL: holds did not settle to 99 in stock / 1 sold"
+fi
+
+for ttl in abc -1 0 1e9; do
+    code=$(curl -s -o /dev/null -w '%{http_code}' "http://localhost:5001/hold?ttl=$ttl")
+    if [ "$code" = "400" ]; then
+        echo "PASS: ttl=$ttl rejected with 400"
+    else
+        echo "FAIL: ttl=$ttl returned $code"
+    fi
+done
+echo ""
+
+echo "============================================"
+echo "  TEST 7: Batch checkout (all-or-nothing)"
+echo "============================================"
+echo ""
+
+echo ">>> Resetting 3 products to 5 units each..."
+curl -s "http://localhost:5001/stock/reset?stock=5&products=3" > /dev/null
+
+echo ">>> 10 concurrent carts of 1x product 1 + 2x product 2 (only 2 can succeed)..."
+for i in {1..10}; do
+    port=$((5001 + (i % 3)))
+    curl -s -X POST -H 'Content-Type: application/json' \
+        -d '{"items": [{"product_id": 1, "qty": 1}, {"product_id": 2, "qty": 2}]}' \
+        http://localhost:$port/buy/batch > /dev/null &
+done
+wait
+
+STOCK=$(curl -s http://localhost:5001/stock)
+echo "$STOCK" | jq '{stock, other_products}'
+if [ "$(echo "$STOCK" | jq '.stock == 3 and .other_products["2"] == 1 and .other_products["3"] == 5')" = "true" ]; then
+    echo "PASS: 2 carts bought, the rest left every product untouched"
+else
+    echo "FAIL: partial carts were bought or stock oversold"
+fi
+
+code=$(curl -s -o /dev/null -w '%{http_code}' -X POST -H 'Content-Type: application/json' \
+    -d '{"items": ["1:2"]}' http://localhost:5001/buy/batch)
+if [ "$code" = "400" ]; then
+    echo "PASS: malformed cart rejected with 400"
+else
+    echo "FAIL: malformed cart returned $code"
+fi
+echo ""
+
+echo "============================================"
+echo "  TEST 8: Lease lock with fencing tokens"
+echo "============================================"
+echo ""
+
+echo ">>> Resetting stock to 100 units..."
+curl -s http://localhost:5001/stock/reset > /dev/null
+
+echo ">>> app1 freezes for 2s holding the lock, app2 buys meanwhile..."
+curl -s "http://localhost:5001/buy/with-lease-lock?pause=2" > /tmp/lease_paused.out &
+sleep 1.2
+curl -s http://localhost:5002/buy/with-lease-lock | jq -c '{status, fence}'
+wait
+jq -c '{status, reason, fence}' /tmp/lease_paused.out
+
+STATS=$(curl -s http://localhost:5001/stats)
+if [ "$(jq -r '.status' /tmp/lease_paused.out)" = "rejected" ] && [ "$(echo "$STATS" | jq '.current_stock == 99 and .stock_matches_expected')" = "true" ]; then
+    echo "PASS: the stale holder's write was fenced off"
+else
+    echo "FAIL: stale holder wrote after losing its lease"
+fi
+echo ""
+
 echo "============================================"
 echo "  CONCLUSION"
 echo "============================================"
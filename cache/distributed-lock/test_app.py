@@ -0,0 +1,156 @@
+"""
+Endpoint tests for app.py against an in-memory Redis - no Docker needed.
+
+    pip install pytest flask redis fakeredis lupa && python -m pytest -q
+"""
+
+import importlib
+import sys
+import threading
+from unittest import mock
+
+import pytest
+
+
+@pytest.fixture
+def app_module():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+
+    class FakeRedis(fakeredis.FakeRedis):
+        def info(self, section=None, *args, **kwargs):
+            return {'total_commands_processed': 0}     # INFO is not emulated
+
+    with mock.patch('redis.Redis', lambda **kwargs: FakeRedis(server=server, **kwargs)):
+        sys.modules.pop('app', None)
+        module = importlib.import_module('app')
+    module.init_inventory()
+    yield module
+    sys.modules.pop('app', None)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def hammer(app_module, url, n):
+    """n concurrent GETs, one test client per thread; returns the status codes."""
+    codes = []
+
+    def call():
+        codes.append(app_module.app.test_client().get(url).status_code)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return codes
+
+
+def test_atomic_purchase_never_oversells(app_module, client):
+    client.get('/stock/reset?stock=5')
+    codes = hammer(app_module, '/buy/atomic', 12)
+    assert codes.count(200) == 5 and codes.count(400) == 7
+
+    stats = client.get('/stats').get_json()
+    assert stats['current_stock'] == 0
+    assert stats['successful_purchases'] == 5 and stats['failed_purchases'] == 7
+    assert stats['stock_matches_expected']
+
+
+def test_fair_lock_serializes_purchases(app_module, client):
+    client.get('/stock/reset?stock=10')
+    codes = hammer(app_module, '/buy/with-fair-lock', 6)
+    assert codes == [200] * 6
+
+    stats = client.get('/stats').get_json()
+    assert stats['current_stock'] == 4 and stats['successful_purchases'] == 6
+    assert stats['lock_waiters'] == 0
+
+
+@pytest.mark.parametrize('ttl', ['abc', 'nan', '-1', '0', 'inf', '1e9'])
+def test_hold_rejects_bad_ttl(client, ttl):
+    response = client.get(f'/hold?ttl={ttl}')
+    assert response.status_code == 400
+    assert client.get('/stats').get_json()['held_units'] == 0
+
+
+def test_hold_confirm_and_cancel(client):
+    client.get('/stock/reset?stock=2')
+    first = client.get('/hold?ttl=30').get_json()['hold_id']
+    second = client.get('/hold?ttl=30').get_json()['hold_id']
+    assert client.get('/hold').status_code == 400          # both units are held
+
+    assert client.get(f'/hold/{first}/confirm').status_code == 200
+    assert client.get(f'/hold/{second}/cancel').status_code == 200
+    assert client.get(f'/hold/{second}/confirm').status_code == 409
+
+    stats = client.get('/stats').get_json()
+    assert stats['current_stock'] == 1 and stats['successful_purchases'] == 1
+    assert stats['held_units'] == 0 and stats['stock_matches_expected']
+
+
+def test_batch_is_all_or_nothing(client):
+    client.get('/stock/reset?stock=3&products=2')
+    assert client.get('/buy/batch?items=1:2,2:3').status_code == 200
+    failed = client.post('/buy/batch', json={'items': [{'product_id': 1, 'qty': 1}, {'product_id': 2, 'qty': 1}]})
+    assert failed.status_code == 400
+    assert [item['status'] for item in failed.get_json()['items']] == ['available', 'insufficient']
+
+    stock = client.get('/stock').get_json()
+    assert stock['stock'] == 1 and stock['other_products'] == {'2': 0}
+
+
+@pytest.mark.parametrize('body', [
+    {'items': ['1:2']},
+    {'items': [5]},
+    {'items': {'product_id': 1}},
+    ['items'],
+    {'items': [{'product_id': 1, 'qty': 0}]},
+    {'items': [{'qty': 1}]},
+])
+def test_batch_rejects_malformed_carts(client, body):
+    response = client.post('/buy/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_batch_rejects_infinite_qty(client):
+    response = client.post('/buy/batch', data='{"items": [{"product_id": 1, "qty": 1e999}]}',
+                           content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_batch_refuses_striped_product(client):
+    client.get('/stock/reset?stock=10&buckets=2&products=2')
+    response = client.get('/buy/batch?items=1:1,2:1')
+    assert response.status_code == 409
+    assert client.get('/buy/batch?items=2:1').status_code == 200
+    assert client.get('/stats').get_json()['stock_matches_expected']
+
+
+def test_paused_lease_holder_write_is_rejected(app_module, client):
+    app_module.lease_lock.lease_ms = 200
+    app_module.lease_lock.renew_every = 0.05
+    client.get('/stock/reset?stock=10')
+    response = client.get('/buy/with-lease-lock?pause=0.4')
+    assert response.status_code == 409
+    assert client.get('/stats').get_json()['current_stock'] == 10
+
+
+@pytest.mark.parametrize('query', ['stock=abc', 'buckets=x', 'products=1.5', 'stock=-1', 'buckets=-4'])
+def test_reset_rejects_bad_parameters(client, query):
+    client.get('/stock/reset?stock=7')
+    assert client.get(f'/stock/reset?{query}').status_code == 400
+    assert client.get('/stock').get_json()['stock'] == 7
+
+
+@pytest.mark.parametrize('pause', ['abc', 'nan', '-1', 'inf', '1e9'])
+def test_lease_lock_rejects_bad_pause(client, pause):
+    client.get('/stock/reset?stock=10')
+    assert client.get(f'/buy/with-lease-lock?pause={pause}').status_code == 400
+    assert client.get('/stats').get_json()['current_stock'] == 10
+    # Rejected before taking the lock: the next buyer doesn't wait for it
+    assert client.get('/buy/with-lease-lock').get_json()['waited_ms'] < 100
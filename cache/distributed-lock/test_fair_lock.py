@@ -0,0 +1,63 @@
+"""
+Unit tests for fair_lock.py against an in-memory Redis.
+
+    pip install pytest fakeredis lupa && python -m pytest -q
+"""
+
+import threading
+import time
+
+import pytest
+
+from fair_lock import FairLock
+
+
+@pytest.fixture
+def lock():
+    fakeredis = pytest.importorskip('fakeredis')
+    return FairLock(fakeredis.FakeRedis(decode_responses=True), 'test', ttl=5, wake_slice=0.1)
+
+
+def test_release_hands_the_lock_to_waiters_in_order(lock):
+    holder = lock.acquire(timeout=1)
+    order = []
+
+    def wait(n):
+        token = lock.acquire(timeout=3)
+        order.append(n)
+        lock.release(token)
+
+    threads = []
+    for n in range(3):
+        threads.append(threading.Thread(target=wait, args=(n,)))
+        threads[-1].start()
+        while lock.waiting() < n + 1:      # queue up in a known order
+            time.sleep(0.005)
+    lock.release(holder)
+    for t in threads:
+        t.join()
+
+    assert order == [0, 1, 2]
+    assert lock.waiting() == 0
+    assert lock.redis.get(lock.lock_key) is None
+
+
+def test_acquire_times_out_and_leaves_the_queue(lock):
+    holder = lock.acquire(timeout=1)
+    assert lock.acquire(timeout=0.2) is None
+    assert lock.waiting() == 0
+    assert lock.release(holder)
+
+
+def test_waiter_takes_over_from_a_crashed_holder(lock):
+    lock.ttl_ms = 200
+    assert lock.acquire(timeout=1)     # never released
+    start = time.monotonic()
+    assert lock.acquire(timeout=2)
+    assert time.monotonic() - start < 1
+
+
+def test_release_by_non_owner_is_ignored(lock):
+    holder = lock.acquire(timeout=1)
+    assert not lock.release('someone-else')
+    assert lock.redis.get(lock.lock_key) == holder
@@ -0,0 +1,61 @@
+"""
+Unit tests for lease_lock.py against an in-memory Redis.
+
+    pip install pytest fakeredis lupa && python -m pytest -q
+"""
+
+import time
+
+import pytest
+
+from lease_lock import LeaseLock
+
+
+@pytest.fixture
+def lock():
+    fakeredis = pytest.importorskip('fakeredis')
+    return LeaseLock(fakeredis.FakeRedis(decode_responses=True), 'test', lease=0.2)
+
+
+def test_watchdog_keeps_the_lease_alive(lock):
+    lease = lock.acquire(timeout=1)
+    time.sleep(0.5)                        # 2.5 leases
+    assert not lease.lost
+    assert lock.try_acquire() is None
+    assert lock.fenced_set('stock', 9, lease)
+    assert lease.release()
+
+
+def test_crashed_holder_frees_the_lock_within_a_lease(lock):
+    lease = lock.acquire(timeout=1)
+    lease.stop_renewing()
+    newer = lock.acquire(timeout=1)
+    assert newer is not None and newer.fence > lease.fence
+    newer.release()
+
+
+def test_stale_holder_cannot_write_before_the_new_holder(lock):
+    stale = lock.acquire(timeout=1)
+    stale.stop_renewing()
+    time.sleep(0.25)
+    newer = lock.acquire(timeout=1)
+    # The new holder hasn't written yet - the stale write must still be refused
+    assert not lock.fenced_set('stock', 1, stale)
+    assert lock.fenced_set('stock', 2, newer)
+    assert lock.redis.get('stock') == '2'
+    newer.release()
+
+
+def test_expired_lock_rejects_write_even_without_a_new_holder(lock):
+    lease = lock.acquire(timeout=1)
+    lease.stop_renewing()
+    time.sleep(0.25)
+    assert not lock.fenced_set('stock', 1, lease)
+    assert lock.redis.get('stock') is None
+
+
+def test_lost_lease_is_checked_before_writing(lock):
+    lease = lock.acquire(timeout=1)
+    lease.lost = True
+    assert not lock.fenced_set('stock', 1, lease)
+    lease.release()
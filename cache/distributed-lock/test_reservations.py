@@ -0,0 +1,42 @@
+"""
+Unit tests for reservations.py against an in-memory Redis.
+
+    pip install pytest fakeredis lupa && python -m pytest -q
+"""
+
+import time
+
+import pytest
+
+from reservations import Reservations
+
+
+@pytest.fixture
+def holds():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    r.set('stock', 2)
+    return Reservations(r, 'stock', 'holds', 'sold')
+
+
+def test_reserve_takes_stock_until_sold_out(holds):
+    assert holds.reserve()[0] is not None
+    assert holds.reserve()[0] is not None
+    assert holds.reserve() == (None, 0)
+    assert holds.held() == 2
+
+
+def test_expired_hold_goes_back_and_cannot_be_confirmed(holds):
+    hold_id, _ = holds.reserve(ttl=0.01)
+    time.sleep(0.02)
+    assert holds.reap() == 1
+    assert holds.redis.get('stock') == '2'
+    assert not holds.confirm(hold_id)
+    assert holds.redis.get('sold') is None
+
+
+def test_cancel_returns_the_unit_once(holds):
+    hold_id, _ = holds.reserve()
+    assert holds.cancel(hold_id)
+    assert not holds.cancel(hold_id)
+    assert holds.redis.get('stock') == '2'
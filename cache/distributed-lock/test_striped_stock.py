@@ -0,0 +1,58 @@
+"""
+Unit tests for striped_stock.py against an in-memory Redis.
+
+    pip install pytest fakeredis lupa && python -m pytest -q
+"""
+
+import pytest
+
+from striped_stock import StripedStock
+
+
+@pytest.fixture
+def stock():
+    fakeredis = pytest.importorskip('fakeredis')
+    return StripedStock(fakeredis.FakeRedis(decode_responses=True), product_id=1)
+
+
+def test_reset_splits_stock_evenly(stock):
+    stock.reset(10, 4)
+    assert stock.levels() == [3, 3, 2, 2]
+    assert stock.totals() == (10, 0)
+
+
+def test_purchase_falls_back_to_other_buckets(stock):
+    stock.reset(2, 2)
+    stock.redis.set(stock.stock_key(0), 0)
+    stock.redis.set(stock.stock_key(1), 2)
+    bucket, before, attempts = stock.purchase()
+    assert bucket == 1 and before == 2 and attempts in (1, 2)
+
+
+def test_sold_out_after_exactly_the_stock(stock):
+    stock.reset(5, 3)
+    sold = [stock.purchase(routing_key=i) for i in range(8)]
+    assert sum(1 for bucket, _, _ in sold if bucket is not None) == 5
+    assert stock.totals() == (0, 5)
+    assert stock.purchase() == (None, 0, 3)
+
+
+def test_rebalance_moves_stock_without_losing_units(stock):
+    stock.reset(40, 4)
+    stock.redis.set(stock.stock_key(0), 0)
+    stock.redis.set(stock.stock_key(1), 1)
+    stock.redis.set(stock.stock_key(2), 10)
+    stock.redis.set(stock.stock_key(3), 29)
+
+    moved = stock.rebalance()
+    assert moved > 0
+    assert sum(stock.levels()) == 40
+    assert min(stock.levels()) >= 5
+
+
+def test_move_never_takes_more_than_the_donor_has(stock):
+    stock.reset(4, 2)
+    stock.redis.set(stock.stock_key(0), 1)
+    assert stock._move(keys=[stock.stock_key(0), stock.stock_key(1)], args=[5]) == 1
+    assert stock.levels() == [0, 3]
+    assert stock._move(keys=[stock.stock_key(0), stock.stock_key(1)], args=[5]) == 0
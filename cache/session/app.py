@@ -1,19 +1,94 @@
 from flask import Flask, jsonify, request
-import redis
 import time
 import os
-import json
+import secrets
+from session_cache import SessionCache
+from session_store import ShardedSessionStore
 
 app = Flask(__name__)
 
-redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, decode_responses=True)
 APP_NAME = os.getenv('APP_NAME', 'app')
 
+# Sessions spread over N Redis nodes on a consistent-hash ring
+SESSION_REDIS_NODES = os.getenv('SESSION_REDIS_NODES', f"{os.getenv('REDIS_HOST', 'localhost')}:6379").split(',')
+session_store = ShardedSessionStore(SESSION_REDIS_NODES, vnodes=int(os.getenv('SESSION_VNODES', 160)))
+
+# Hot sessions served from memory; Redis pushes invalidations to every instance
+session_cache = SessionCache(
+    max_entries=int(os.getenv('SESSION_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('SESSION_CACHE_TTL', 60)),
+    mode=os.getenv('SESSION_CACHE_MODE', 'auto')
+)
+
+# Sessions are hashes: session:<id> → {user, login_app, logged_in, touched_at, pref:*}
+SESSION_TTL = 3600
+# Sliding expiry: push the TTL back at most once per interval, not on every request
+SESSION_TOUCH_INTERVAL = int(os.getenv('SESSION_TOUCH_INTERVAL', 300))
+PROFILE_FIELDS = ('user', 'login_app', 'touched_at', 'pref:theme')
+
+# HSET only on a live session - never recreate an expired one without a TTL
+SET_FIELD_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+set_field = session_store.client(session_store.config_node).register_script(SET_FIELD_SCRIPT)
+
+# Sliding expiry, same guard: a session deleted since it was read stays deleted
+TOUCH_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('expire', KEYS[1], ARGV[1])
+redis.call('hset', KEYS[1], 'touched_at', ARGV[2])
+return 1
+"""
+touch_session = session_store.client(session_store.config_node).register_script(TOUCH_SCRIPT)
+
+
+def new_session_id():
+    # 192 random bits: no collisions between logins in the same second, not guessable
+    return f'sess_{secrets.token_urlsafe(24)}'
+
+
+def read_fields(key, fields):
+    """HMGET only the fields a request needs. None if the session does not exist."""
+    def hmget(r):
+        values = r.hmget(key, fields)
+        return dict(zip(fields, values)) if any(v is not None for v in values) else None
+    return session_store.read(key, hmget)
+
+
+def touch(key, data):
+    """Refresh the TTL if the last refresh is older than SESSION_TOUCH_INTERVAL."""
+    now = int(time.time())
+    if now - int(data.get('touched_at') or 0) < SESSION_TOUCH_INTERVAL:
+        return False
+
+    touched = session_store.write(key, lambda r: touch_session(keys=[key], args=[SESSION_TTL, now], client=r))
+    session_cache.invalidate(key)
+    return bool(touched)
+
 @app.route('/login/<username>')
 def login(username):
-    session_id = request.cookies.get('session_id') or f"sess_{int(time.time())}"
-    session_data = {'user': username, 'logged_in': True, 'login_app': APP_NAME}
-    redis_client.setex(f'session:{session_id}', 3600, json.dumps(session_data))
+    # Always a fresh id on login (an old cookie's session is dropped - no session fixation)
+    old_session_id = request.cookies.get('session_id')
+    if old_session_id:
+        session_store.delete(f'session:{old_session_id}')
+        session_cache.invalidate(f'session:{old_session_id}')
+
+    session_id = new_session_id()
+    session_data = {'user': username, 'logged_in': 1, 'login_app': APP_NAME, 'touched_at': int(time.time())}
+    key = f'session:{session_id}'
+
+    def create(r):
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(key, mapping=session_data)
+        pipe.expire(key, SESSION_TTL)
+        pipe.execute()
+    session_store.write(key, create)
 
     response = jsonify({'status': 'logged in', 'user': username, 'session_id': session_id, 'app': APP_NAME})
     response.set_cookie('session_id', session_id)
@@ -25,24 +100,89 @@ def profile():
     if not session_id:
         return jsonify({'error': 'not logged in', 'app': APP_NAME}), 401
 
-    session_data = redis_client.get(f'session:{session_id}')
-    if not session_data:
+    key = f'session:{session_id}'
+    data = session_cache.get(key, lambda: read_fields(key, PROFILE_FIELDS))
+    if not data:
         return jsonify({'error': 'session expired', 'app': APP_NAME}), 401
+    touch(key, data)
 
-    data = json.loads(session_data)
     return jsonify({
         'user': data['user'],
         'login_app': data['login_app'],
+        'theme': data['pref:theme'] or 'light',
         'current_app': APP_NAME,
         'message': f"Session from {data['login_app']}, accessed on {APP_NAME}"
     })
 
+@app.route('/preferences/<name>/<value>')
+def set_preference(name, value):
+    """Change ONE session field (HSET) - the rest of the session is not rewritten"""
+    session_id = request.cookies.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'not logged in', 'app': APP_NAME}), 401
+
+    key = f'session:{session_id}'
+    if not session_store.write(key, lambda r: set_field(keys=[key], args=[f'pref:{name}', value], client=r)):
+        return jsonify({'error': 'session expired', 'app': APP_NAME}), 401
+    session_cache.invalidate(key)
+    return jsonify({'status': 'saved', name: value, 'app': APP_NAME})
+
 @app.route('/logout')
 def logout():
     session_id = request.cookies.get('session_id')
     if session_id:
-        redis_client.delete(f'session:{session_id}')
+        session_store.delete(f'session:{session_id}')
+        # Other instances are notified by Redis; don't wait for our own message
+        session_cache.invalidate(f'session:{session_id}')
     return jsonify({'status': 'logged out', 'app': APP_NAME})
 
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'app': APP_NAME,
+        'session_cache': session_cache.info(),
+        'session_ring': {
+            'nodes': session_store.nodes(),
+            'migrating': session_store.migrating(),
+            **session_store.stats
+        }
+    })
+
+@app.route('/admin/nodes')
+def list_nodes():
+    """Ring members and how many sessions each node holds"""
+    return jsonify({
+        'nodes': session_store.nodes(),
+        'migrating': session_store.migrating(),
+        'sessions_per_node': session_store.key_counts(),
+        'ring_version': session_store.version
+    })
+
+@app.route('/admin/nodes/add')
+def add_node():
+    """?node=host:port - join the ring, ~1/N of the sessions move to it in the background"""
+    node = request.args['node']
+    if node in session_store.nodes():
+        return jsonify({'status': 'exists', 'nodes': session_store.nodes()}), 400
+    if not session_store.change_nodes(session_store.nodes() + [node]):
+        return jsonify({'status': 'busy', 'reason': 'migration in progress'}), 409
+    return jsonify({'status': 'migrating', 'nodes': session_store.nodes()})
+
+@app.route('/admin/nodes/remove')
+def remove_node():
+    """?node=host:port - leave the ring, its sessions move to the remaining nodes"""
+    node = request.args['node']
+    nodes = [n for n in session_store.nodes() if n != node]
+    if len(nodes) == len(session_store.nodes()) or not nodes:
+        return jsonify({'status': 'error', 'reason': 'unknown or last node', 'nodes': session_store.nodes()}), 400
+    if not session_store.change_nodes(nodes):
+        return jsonify({'status': 'busy', 'reason': 'migration in progress'}), 409
+    return jsonify({'status': 'migrating', 'nodes': session_store.nodes()})
+
 if __name__ == '__main__':
+    # One invalidation listener per Redis node, including nodes added later
+    session_store.on_new_node.append(lambda node, client: session_cache.watch(client, node))
+    for node in session_store.known_nodes():
+        session_cache.watch(session_store.client(node), node)
+    session_store.start_refresher()
     app.run(host='0.0.0.0', port=5000)
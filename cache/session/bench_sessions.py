@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Session ops/sec vs number of Redis nodes on the hash ring.
+
+Each worker process logs sessions in (HSET + EXPIRE) and reads them back (HMGET) in a
+tight loop, routing every key through the same HashRing the app uses.
+Run it with 1, 2, ... N nodes to see throughput grow with the ring.
+
+    docker compose exec app1 python bench_sessions.py \\
+        --nodes redis:6379 redis2:6379 redis3:6379 --processes 8 --seconds 5
+
+Pass --pipeline 10 to send 10 commands per round trip (less client-bound).
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+
+from session_store import HashRing, connect_node
+
+
+def worker(nodes, seconds, keys, pipeline, result):
+    ring = HashRing(nodes)
+    clients = {node: connect_node(node) for node in nodes}
+    ops = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pipes = {}
+        for _ in range(pipeline):
+            key = f'session:bench_{random.randrange(keys)}'
+            node = ring.node_for(key)
+            pipe = pipes.get(node) or pipes.setdefault(node, clients[node].pipeline(transaction=False))
+            if random.random() < 0.2:
+                pipe.hset(key, mapping={'user': 'bench', 'logged_in': 1, 'login_app': 'bench'})
+                pipe.expire(key, 300)
+            else:
+                pipe.hmget(key, ('user', 'login_app'))
+        for pipe in pipes.values():
+            pipe.execute()
+        ops += pipeline
+    result.put(ops)
+
+
+def run(nodes, processes, seconds, keys, pipeline):
+    result = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(nodes, seconds, keys, pipeline, result))
+             for _ in range(processes)]
+    for p in procs:
+        p.start()
+    total = sum(result.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', nargs='+', default=['localhost:6379', 'localhost:6380', 'localhost:6381'])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--keys', type=int, default=100000, help='distinct session ids')
+    parser.add_argument('--pipeline', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f'{args.processes} processes, {args.seconds}s per run, 80% HMGET / 20% HSET+EXPIRE\n')
+    print(f"{'nodes':>5} {'ops/sec':>12} {'vs 1 node':>10}")
+    base = None
+    for n in range(1, len(args.nodes) + 1):
+        rate = run(args.nodes[:n], args.processes, args.seconds, args.keys, args.pipeline)
+        base = base or rate
+        print(f'{n:>5} {rate:>12,.0f} {rate / base:>9.2f}x')
+
+    for node in args.nodes:
+        client = connect_node(node)
+        for start in range(0, args.keys, 1000):
+            client.delete(*[f'session:bench_{i}' for i in range(start, min(start + 1000, args.keys))])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Per-instance session cache kept coherent by Redis.
+
+Without it every /profile is a network round trip + json.loads, even if the
+same instance read that session a few milliseconds ago. With it:
+
+    /profile  → local dict hit?  → done (no network)
+              → miss             → GET from Redis, decode, remember locally
+
+Redis tells every instance when a cached session changes or disappears:
+
+    tracking  (Redis 6+, server-assisted client-side caching)
+              CLIENT TRACKING ON REDIRECT <listener> BCAST PREFIX session:
+              → any write/delete/expire of session:* is pushed to the
+                listener connection on __redis__:invalidate
+    keyspace  (fallback) PSUBSCRIBE __keyspace@<db>__:session:*
+              (needs notify-keyspace-events with K, g, $, h, x and e -
+               sessions are hashes, so HSET/HDEL need the h flag)
+
+So /logout on app2 evicts the session from app1 and app3 as well. With
+sharded sessions there is one listener per Redis node (watch()). If any
+invalidation connection drops, the local cache is cleared and bypassed
+until it is back - a stale session is never served from memory.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+TRACKING = 'tracking'
+KEYSPACE = 'keyspace'
+AUTO = 'auto'
+
+
+class SessionCache:
+    def __init__(self, prefix='session:', max_entries=10000, ttl=60, mode=AUTO):
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.ttl = ttl               # upper bound on staleness if a message is ever lost
+        self.mode = mode
+        self._data = OrderedDict()   # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._inflight = {}          # key -> [fetchers, invalidated]
+        self._watched = {}           # node name -> invalidation mode in use
+        self._down = set()           # nodes whose invalidation connection is not (yet) up
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'bypassed': 0}
+
+    # ---- reads -------------------------------------------------------------
+
+    def get(self, key, load):
+        """
+        Return the cached value for `key`, or call load() (Redis GET + decode)
+        and cache the result. load() returning None is not cached.
+        """
+        if not self._healthy():
+            self.stats['bypassed'] += 1
+            return load()
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            self.stats['misses'] += 1
+            flight = self._inflight.setdefault(key, [0, False])
+            flight[0] += 1
+
+        value = None
+        try:
+            value = load()
+        finally:
+            # Also when load() raised: otherwise the in-flight entry (and its
+            # invalidated flag) would stay behind and block caching the key
+            with self._lock:
+                flight = self._inflight[key]
+                flight[0] -= 1
+                # An invalidation that arrived while we were reading means `value` may be stale
+                if value is not None and not flight[1] and self._healthy():
+                    self._data[key] = (value, time.monotonic() + self.ttl)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.max_entries:
+                        self._data.popitem(last=False)
+                if flight[0] == 0:
+                    del self._inflight[key]
+        return value
+
+    # ---- invalidation ------------------------------------------------------
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            if key in self._inflight:
+                self._inflight[key][1] = True
+            self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            for flight in self._inflight.values():
+                flight[1] = True
+
+    def _healthy(self):
+        return bool(self._watched) and not self._down
+
+    def watch(self, redis_client, name='default', wait=2.0):
+        """Start listening for invalidations from one Redis node."""
+        with self._lock:
+            if name in self._watched:
+                return
+            self._watched[name] = self.mode
+            self._down.add(name)
+        threading.Thread(target=self._listen_forever, args=(redis_client, name),
+                         name=f'session-invalidation-{name}', daemon=True).start()
+        deadline = time.monotonic() + wait
+        while name in self._down and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _listen_forever(self, redis_client, name):
+        while True:
+            try:
+                self._listen(redis_client, name)
+            except Exception as e:
+                print(f'session cache invalidation connection to {name} lost: {e}')
+            # Unknown what changed while disconnected: drop everything, bypass until back
+            self._down.add(name)
+            self.clear()
+            time.sleep(1)
+
+    def _connection(self, redis_client):
+        kwargs = dict(redis_client.connection_pool.connection_kwargs)
+        kwargs.pop('connection_pool', None)
+        return redis.Redis(single_connection_client=True, **kwargs)
+
+    def _listen(self, redis_client, name):
+        mode = self._watched[name]
+        listener = self._connection(redis_client)
+        tracker = None
+        try:
+            if mode in (TRACKING, AUTO):
+                try:
+                    tracker = self._connection(redis_client)
+                    # BCAST: notified for every session:* key, whether or not this instance read it
+                    tracker.execute_command('CLIENT', 'TRACKING', 'ON', 'REDIRECT', listener.client_id(),
+                                            'BCAST', 'PREFIX', self.prefix)
+                    mode = TRACKING
+                except redis.ResponseError as e:
+                    if mode == TRACKING:
+                        raise
+                    print(f'CLIENT TRACKING unavailable on {name} ({e}), using keyspace notifications')
+                    tracker.close()
+                    tracker = None
+                    mode = KEYSPACE
+                self._watched[name] = mode
+
+            if mode == TRACKING:
+                listener.execute_command('SUBSCRIBE', '__redis__:invalidate')
+            else:
+                self._enable_keyspace_events(listener)
+                db = redis_client.connection_pool.connection_kwargs.get('db', 0)
+                listener.execute_command('PSUBSCRIBE', f'__keyspace@{db}__:{self.prefix}*')
+
+            self._down.discard(name)
+            conn = listener.connection
+            while True:
+                message = conn.read_response()
+                if message[0] == 'message':
+                    keys = message[2]
+                    if keys is None:        # FLUSHALL / FLUSHDB
+                        self.clear()
+                    else:
+                        for key in keys if isinstance(keys, list) else [keys]:
+                            self.invalidate(key)
+                elif message[0] == 'pmessage':
+                    self.invalidate(message[2].split(':', 1)[1])
+        finally:
+            if tracker is not None:
+                tracker.close()
+            listener.close()
+
+    def _enable_keyspace_events(self, client):
+        """Add the flags we need to notify-keyspace-events (managed Redis may refuse CONFIG)."""
+        try:
+            flags = client.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+            missing = ''.join(f for f in 'Kg$hxe' if f not in flags and not (f in 'g$hxe' and 'A' in flags))
+            if missing:
+                client.config_set('notify-keyspace-events', flags + missing)
+        except redis.ResponseError as e:
+            print(f'could not enable keyspace notifications ({e}) - set notify-keyspace-events Kg$hxe')
+
+    def info(self):
+        with self._lock:
+            size = len(self._data)
+        return dict(self.stats, modes=dict(self._watched), size=size, max_entries=self.max_entries,
+                    connected=self._healthy())
@@ -0,0 +1,318 @@
+"""
+Sessions spread over N Redis nodes with a consistent-hash ring.
+
+One Redis caps session capacity and ops/sec. Here every session key is
+owned by one node of a hash ring:
+
+    ring:  each node is placed at 160 points (virtual nodes), md5(node#i)
+    key:   owner = first point clockwise from md5(key)
+
+Adding a 4th node to 3 only moves ~1/4 of the keys (those whose point now
+falls on the new node) instead of nearly all of them with `hash % N`.
+
+Membership lives in `ring:sessions` on the first configured node (the config
+node), so every app instance uses the same ring; instances re-read it every
+second (and on a miss). A node change keeps the previous ring until the
+migration is done:
+
+    read:    owner has it?            → done
+             else previous owner has it → move it to the owner (read-through), read again
+                                          (or read it where it is if the move lost a race)
+    write:   move from previous owner first (partial updates stay correct), then write
+    delete:  owner and previous owner
+    migrate: background SCAN of every node, keys owned by another node are moved
+             with DUMP / RESTORE (TTL kept). The previous ring is dropped only
+             after a pass that left no key behind; otherwise it is kept (readers
+             still find those keys) and the migration is retried later.
+
+A move only deletes the source copy if it is still byte-for-byte what was
+dumped - a write that lands on the old owner mid-move is never lost.
+
+Starting with more nodes than the stored ring (e.g. SESSION_REDIS_NODES grew
+from 1 to 2) adds them like /admin/nodes/add does, so existing sessions migrate.
+"""
+
+import bisect
+import hashlib
+import json
+import threading
+import time
+
+import redis
+
+RING_KEY = 'ring:sessions'
+MIGRATE_LOCK_KEY = 'lock:ring:sessions:migrate'
+MOVE_ATTEMPTS = 3
+MIGRATE_PASSES = 3
+MIGRATE_RETRY_INTERVAL = 30
+
+# Delete a key only if it still holds exactly the dumped value
+DELETE_IF_UNCHANGED_SCRIPT = """
+if redis.call('dump', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    def __init__(self, nodes, vnodes=160):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key):
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+
+def connect_node(node, decode_responses=True):
+    host, _, port = node.partition(':')
+    return redis.Redis(host=host, port=int(port or 6379), decode_responses=decode_responses)
+
+
+class ShardedSessionStore:
+    """
+    store = ShardedSessionStore(['redis:6379', 'redis2:6379'])
+    store.write(key, lambda r: r.setex(key, 3600, value))
+    value = store.read(key, lambda r: r.get(key))
+    """
+
+    def __init__(self, nodes, vnodes=160, prefix='session:', connect=connect_node, refresh_interval=1.0):
+        self.config_node = nodes[0]
+        self.vnodes = vnodes
+        self.prefix = prefix
+        self.connect = connect
+        self.refresh_interval = refresh_interval
+        self.on_new_node = []        # callbacks(node, client), e.g. start cache invalidation
+        self._clients = {}
+        self._raw_clients = {}       # binary clients for DUMP / RESTORE
+        self._delete_if_unchanged = {}
+        self._lock = threading.Lock()
+        self.stats = {'read_through_moves': 0, 'migrated': 0, 'move_conflicts': 0, 'migration_leftovers': 0}
+        # Also resumes a migration whose instance died halfway
+        self._migrate_retry_at = time.monotonic() + MIGRATE_RETRY_INTERVAL
+
+        # First instance to start writes the initial membership, the others adopt it.
+        # Sessions from before sharding live on the config node alone - start
+        # from there, so the nodes below are added with a migration.
+        config = self.client(self.config_node)
+        config.hsetnx(RING_KEY, 'nodes', json.dumps([self.config_node]))
+        config.hsetnx(RING_KEY, 'version', 0)
+        self.version = None
+        self.refresh()
+        added = set(nodes) - set(self.ring.nodes)
+        if added and not self.change_nodes(self.ring.nodes + sorted(added)):
+            self.refresh()          # another instance may have just added them
+            if set(nodes) - set(self.ring.nodes):
+                print(f'session ring: {sorted(added)} not added, a migration is in progress - retry later')
+
+    # ---- membership --------------------------------------------------------
+
+    def client(self, node):
+        with self._lock:
+            if node not in self._clients:
+                self._clients[node] = self.connect(node)
+                self._raw_clients[node] = self.connect(node, decode_responses=False)
+                self._delete_if_unchanged[node] = self._raw_clients[node].register_script(
+                    DELETE_IF_UNCHANGED_SCRIPT)
+                created = True
+            else:
+                created = False
+        if created:
+            for callback in self.on_new_node:
+                callback(node, self._clients[node])
+        return self._clients[node]
+
+    def refresh(self):
+        """Re-read the ring from the config node. True if its version changed."""
+        config = self.client(self.config_node).hgetall(RING_KEY)
+        version = int(config.get('version', 0))
+        if version == self.version:
+            return False
+        nodes = json.loads(config['nodes'])
+        previous = json.loads(config['previous']) if config.get('previous') else None
+        for node in nodes + (previous or []):
+            self.client(node)
+        # previous first: a reader never sees the new ring without its fallback
+        self.previous = HashRing(previous, self.vnodes) if previous else None
+        self.ring = HashRing(nodes, self.vnodes)
+        self.version = version
+        return True
+
+    def start_refresher(self):
+        def loop():
+            while True:
+                time.sleep(self.refresh_interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f'session ring refresh failed: {e}')
+                if self.previous is not None and time.monotonic() >= self._migrate_retry_at:
+                    # Unfinished migration: try again (the lock keeps it to one instance)
+                    self._migrate_retry_at = time.monotonic() + MIGRATE_RETRY_INTERVAL
+                    threading.Thread(target=self.migrate, name='session-migration', daemon=True).start()
+        threading.Thread(target=loop, name='session-ring-refresh', daemon=True).start()
+
+    def change_nodes(self, nodes):
+        """
+        Switch to a new node list and migrate in the background.
+        Refused (returns False) while a previous migration is still running.
+        """
+        config = self.client(self.config_node)
+        current = config.hgetall(RING_KEY)
+        if current.get('previous'):
+            return False
+        pipe = config.pipeline()
+        pipe.hset(RING_KEY, mapping={'nodes': json.dumps(sorted(nodes)), 'previous': current['nodes']})
+        pipe.hincrby(RING_KEY, 'version', 1)
+        pipe.execute()
+        self.refresh()
+        threading.Thread(target=self.migrate, name='session-migration', daemon=True).start()
+        return True
+
+    def nodes(self):
+        return self.ring.nodes
+
+    def known_nodes(self):
+        with self._lock:
+            return list(self._clients)
+
+    def migrating(self):
+        return self.previous is not None
+
+    # ---- key access --------------------------------------------------------
+
+    def _move(self, key, src, dst):
+        """
+        Move one key between nodes, TTL included. A newer copy on dst wins.
+        False if there was nothing to move, or src kept changing under us
+        (then the key stays on src and readers fall back to it).
+        """
+        for _ in range(MOVE_ATTEMPTS):
+            pipe = self._raw_clients[src].pipeline()
+            pipe.dump(key)
+            pipe.pttl(key)
+            payload, pttl = pipe.execute()
+            if payload is None or pttl == -2:
+                return False
+            restored = True
+            try:
+                self._raw_clients[dst].restore(key, max(pttl, 0), payload)
+            except redis.ResponseError as e:
+                if 'BUSYKEY' not in str(e):
+                    raise
+                restored = False
+            if self._delete_if_unchanged[src](keys=[key], args=[payload]):
+                return True
+            # src was written after the DUMP: take back our now-stale copy and retry
+            if restored:
+                self._delete_if_unchanged[dst](keys=[key], args=[payload])
+            self.stats['move_conflicts'] += 1
+        return False
+
+    def _pull(self, key):
+        """
+        During a migration: bring `key` to its new owner if it still sits on the old one.
+        Returns the previous owner if the key could not be moved off it, else None.
+        """
+        if self.previous is None:
+            return None
+        src, dst = self.previous.node_for(key), self.ring.node_for(key)
+        if src == dst:
+            return None
+        if self._move(key, src, dst):
+            self.stats['read_through_moves'] += 1
+            return None
+        # Nothing moved: either someone else moved it already, or src keeps changing
+        return src if self._raw_clients[src].exists(key) else None
+
+    def read(self, key, fn):
+        """fn(client) on the owner; falls back to the previous owner while migrating."""
+        value = fn(self.client(self.ring.node_for(key)))
+        if value:
+            return value
+        if self.previous is None and not self.refresh():
+            return value
+        # Ring changed (or is changing): the key may still be on its previous owner
+        stuck_on = self._pull(key)
+        return fn(self.client(stuck_on or self.ring.node_for(key)))
+
+    def write(self, key, fn):
+        # Write where the whole session is: a partial update must not land on an empty owner
+        stuck_on = self._pull(key)
+        return fn(self.client(stuck_on or self.ring.node_for(key)))
+
+    def delete(self, key):
+        nodes = {self.ring.node_for(key)}
+        if self.previous is not None:
+            nodes.add(self.previous.node_for(key))
+        return sum(self.client(node).delete(key) for node in nodes)
+
+    # ---- background migration -------------------------------------------------
+
+    def migrate(self, batch=500, settle=None):
+        """
+        Move every misplaced session to its owner, then drop the previous ring.
+        Waits `settle` seconds first so every instance has picked up the new ring.
+        Keys that could not be moved (src kept changing) are retried for up to
+        MIGRATE_PASSES passes; if any are left, the previous ring stays.
+        """
+        config = self.client(self.config_node)
+        token = str(time.time())
+        if not config.set(MIGRATE_LOCK_KEY, token, nx=True, ex=3600):
+            return 0
+        try:
+            time.sleep(self.refresh_interval * 2 if settle is None else settle)
+            moved = 0
+            for attempt in range(MIGRATE_PASSES):
+                if attempt:
+                    time.sleep(self.refresh_interval)
+                pass_moved, leftovers = self._migrate_pass(batch)
+                moved += pass_moved
+                if not leftovers:
+                    break
+            self.stats['migrated'] += moved
+            self.stats['migration_leftovers'] = leftovers
+            if leftovers:
+                # Dropping the previous ring now would strand these keys on a non-owner
+                self._migrate_retry_at = time.monotonic() + MIGRATE_RETRY_INTERVAL
+                print(f'session migration: {moved} keys moved, {leftovers} left behind - '
+                      f'keeping the previous ring, retry in {MIGRATE_RETRY_INTERVAL}s')
+                return moved
+            pipe = config.pipeline()
+            pipe.hdel(RING_KEY, 'previous')
+            pipe.hincrby(RING_KEY, 'version', 1)
+            pipe.execute()
+            self.refresh()
+            print(f'session migration done: {moved} keys moved')
+            return moved
+        finally:
+            if config.get(MIGRATE_LOCK_KEY) == token:
+                config.delete(MIGRATE_LOCK_KEY)
+
+    def _migrate_pass(self, batch):
+        """One SCAN of every node. Returns (moved, left on a node that doesn't own them)."""
+        moved = leftovers = 0
+        for node in set(self.ring.nodes) | set(self.previous.nodes if self.previous else []):
+            for raw_key in self._raw_clients[node].scan_iter(match=f'{self.prefix}*', count=batch):
+                key = raw_key.decode()
+                owner = self.ring.node_for(key)
+                if owner == node:
+                    continue
+                if self._move(key, node, owner):
+                    moved += 1
+                elif self._raw_clients[node].exists(key):
+                    leftovers += 1
+        return moved, leftovers
+
+    def key_counts(self):
+        counts = {}
+        for node in set(self.ring.nodes) | set(self.previous.nodes if self.previous else []):
+            counts[node] = sum(1 for _ in self.client(node).scan_iter(match=f'{self.prefix}*', count=1000))
+        return counts
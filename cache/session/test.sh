@@ -19,4 +19,31 @@ echo "4. Access SAME session from app3 (port 5003):"
 curl -s -b "session_id=$COOKIE" http://localhost:5003/profile | jq .
 echo ""
 
+echo "5. Change a preference on app2, read it back from app1 (its cached copy must be invalidated):"
+curl -s -b "session_id=$COOKIE" http://localhost:5001/profile > /dev/null      # now cached on app1
+curl -s -b "session_id=$COOKIE" http://localhost:5002/preferences/theme/dark | jq -c .
+sleep 0.2
+THEME=$(curl -s -b "session_id=$COOKIE" http://localhost:5001/profile | jq -r '.theme')
+if [ "$THEME" = "dark" ]; then
+    echo "PASS: app1 sees the new theme"
+else
+    echo "FAIL: app1 served a stale session (theme=$THEME)"
+fi
+echo ""
+
+echo "6. Add redis3 to the ring - the session stays readable during and after the migration:"
+curl -s "http://localhost:5001/admin/nodes/add?node=redis3:6379" | jq -c .
+for attempt in 1 2; do
+    USER=$(curl -s -b "session_id=$COOKIE" http://localhost:5002/profile | jq -r '.user')
+    if [ "$USER" = "john" ]; then
+        echo "PASS: profile readable (attempt $attempt)"
+    else
+        echo "FAIL: session lost while resharding (got '$USER')"
+    fi
+    sleep 4
+done
+curl -s http://localhost:5001/admin/nodes | jq -c '{nodes, migrating, sessions_per_node}'
+curl -s "http://localhost:5001/admin/nodes/remove?node=redis3:6379" > /dev/null
+echo ""
+
 echo "=== Session is shared across all apps! ==="
@@ -0,0 +1,68 @@
+"""
+Endpoint tests for app.py against an in-memory Redis - no Docker needed.
+
+    pip install pytest flask redis fakeredis lupa && python -m pytest -q
+"""
+
+import importlib
+import sys
+import time
+from unittest import mock
+
+import pytest
+
+
+@pytest.fixture
+def app_module():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    with mock.patch('redis.Redis', lambda **kwargs: fakeredis.FakeRedis(server=server, **kwargs)):
+        sys.modules.pop('app', None)
+        module = importlib.import_module('app')
+        yield module
+    sys.modules.pop('app', None)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def login(client, user='alice'):
+    session_id = client.get(f'/login/{user}').get_json()['session_id']
+    return f'session:{session_id}'
+
+
+def redis_for(app_module, key):
+    return app_module.session_store.client(app_module.session_store.ring.node_for(key))
+
+
+def test_profile_touches_an_old_session(app_module, client):
+    key = login(client)
+    r = redis_for(app_module, key)
+    r.hset(key, 'touched_at', 0)
+    r.expire(key, 10)
+
+    assert client.get('/profile').get_json()['user'] == 'alice'
+    assert int(r.hget(key, 'touched_at')) >= int(time.time()) - 5
+    assert r.ttl(key) > 10
+
+
+def test_touch_does_not_bring_back_a_deleted_session(app_module, client):
+    key = login(client)
+    r = redis_for(app_module, key)
+    data = {'user': 'alice', 'touched_at': '0'}     # read before the logout
+    r.delete(key)
+
+    assert app_module.touch(key, data) is False
+    assert not r.exists(key)
+    app_module.session_cache.invalidate(key)
+    assert client.get('/profile').status_code == 401
+
+
+def test_preference_on_a_deleted_session_is_refused(app_module, client):
+    key = login(client)
+    client.get('/logout')
+    client.set_cookie('session_id', key[len('session:'):])
+    assert client.get('/preferences/theme/dark').status_code == 401
+    assert not redis_for(app_module, key).exists(key)
@@ -0,0 +1,80 @@
+"""
+Unit tests for session_cache.py - no Redis needed (invalidations are fed in directly).
+
+    pip install pytest redis && python -m pytest -q
+"""
+
+import pytest
+
+from session_cache import SessionCache
+
+
+@pytest.fixture
+def cache():
+    cache = SessionCache(max_entries=2, ttl=60)
+    cache._watched['node'] = 'tracking'        # as if the invalidation listener were up
+    return cache
+
+
+def test_second_read_is_a_local_hit(cache):
+    loads = []
+    assert cache.get('k', lambda: loads.append(1) or 'v') == 'v'
+    assert cache.get('k', lambda: loads.append(1) or 'other') == 'v'
+    assert len(loads) == 1
+
+
+def test_invalidation_during_load_is_not_cached(cache):
+    def load():
+        cache.invalidate('k')              # session changed while we were reading it
+        return 'old'
+
+    assert cache.get('k', load) == 'old'
+    assert cache.get('k', lambda: 'new') == 'new'
+
+
+def test_failed_load_leaves_no_inflight_entry(cache):
+    def load():
+        cache.invalidate('k')
+        raise ConnectionError('redis down')
+
+    with pytest.raises(ConnectionError):
+        cache.get('k', load)
+    assert cache._inflight == {}
+    cache.get('k', lambda: 'v')
+    assert cache.get('k', lambda: 'other') == 'v'
+
+
+def test_lru_limit(cache):
+    for key in 'abc':
+        cache.get(key, lambda: key)
+    assert cache.info()['size'] == 2
+    assert cache.get('a', lambda: 'reloaded') == 'reloaded'
+
+
+def test_bypassed_while_invalidations_are_down(cache):
+    cache._down.add('node')
+    cache.get('k', lambda: 'v')
+    assert cache.get('k', lambda: 'fresh') == 'fresh'
+    assert cache.stats['bypassed'] == 2
+
+
+class ConfigClient:
+    def __init__(self, flags):
+        self.flags = flags
+
+    def config_get(self, name):
+        return {name: self.flags}
+
+    def config_set(self, name, value):
+        self.flags = value
+
+
+@pytest.mark.parametrize('flags, expected', [
+    ('', 'Kg$hxe'),
+    ('Kx', 'Kxg$he'),
+    ('AK', 'AK'),
+])
+def test_keyspace_events_include_hash_commands(flags, expected):
+    client = ConfigClient(flags)
+    SessionCache()._enable_keyspace_events(client)
+    assert client.flags == expected
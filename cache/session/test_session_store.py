@@ -0,0 +1,154 @@
+"""
+Unit tests for session_store.py against in-memory Redis nodes.
+
+    pip install pytest redis fakeredis lupa && python -m pytest -q
+"""
+
+import collections
+
+import pytest
+
+import session_store
+from session_store import RING_KEY, HashRing, ShardedSessionStore
+
+
+def test_ring_is_deterministic_and_balanced():
+    ring = HashRing(['a:6379', 'b:6379', 'c:6379'])
+    keys = [f'session:{i}' for i in range(3000)]
+    owners = collections.Counter(ring.node_for(k) for k in keys)
+    assert set(owners) == {'a:6379', 'b:6379', 'c:6379'}
+    assert min(owners.values()) > 600
+    shuffled = HashRing(['c:6379', 'a:6379', 'b:6379'])
+    assert all(ring.node_for(k) == shuffled.node_for(k) for k in keys)
+
+
+def test_adding_a_node_moves_only_its_share():
+    keys = [f'session:{i}' for i in range(3000)]
+    before = HashRing(['a', 'b', 'c'])
+    after = HashRing(['a', 'b', 'c', 'd'])
+    moved = [k for k in keys if before.node_for(k) != after.node_for(k)]
+    assert all(after.node_for(k) == 'd' for k in moved)
+    assert 500 < len(moved) < 1000
+
+
+@pytest.fixture(autouse=True)
+def no_background_migration(monkeypatch):
+    """Tests run migrate() themselves, at the point they choose."""
+    class Thread:
+        def __init__(self, target, *args, **kwargs):
+            pass
+
+        def start(self):
+            pass
+    monkeypatch.setattr(session_store.threading, 'Thread', Thread)
+
+
+@pytest.fixture
+def servers():
+    fakeredis = pytest.importorskip('fakeredis')
+    return collections.defaultdict(fakeredis.FakeServer)
+
+
+@pytest.fixture
+def connect(servers):
+    fakeredis = pytest.importorskip('fakeredis')
+
+    def connect(node, decode_responses=True):
+        return fakeredis.FakeRedis(server=servers[node], decode_responses=decode_responses)
+    return connect
+
+
+def make_store(connect, nodes):
+    return ShardedSessionStore(nodes, connect=connect, refresh_interval=0.01)
+
+
+def keys_owned_by(ring, node, n=20):
+    return [k for k in (f'session:{i}' for i in range(1000)) if ring.node_for(k) == node][:n]
+
+
+def test_growing_from_one_node_migrates_existing_sessions(connect):
+    old = connect('a')
+    for i in range(50):
+        old.hset(f'session:{i}', mapping={'user': f'u{i}'})
+        old.expire(f'session:{i}', 3600)
+
+    store = make_store(connect, ['a', 'b'])
+    assert store.nodes() == ['a', 'b']
+    assert store.migrating()
+    # Before the background pass: sessions owned by b are still readable
+    for i in range(50):
+        assert store.read(f'session:{i}', lambda r, k=f'session:{i}': r.hget(k, 'user')) == f'u{i}'
+
+    store.migrate(settle=0)
+    assert not store.migrating()
+    counts = store.key_counts()
+    assert sum(counts.values()) == 50 and counts['b'] > 0
+    assert all(0 < connect(store.ring.node_for(f'session:{i}')).ttl(f'session:{i}') <= 3600 for i in range(50))
+
+
+def test_instance_with_a_stale_ring_still_finds_moved_sessions(connect):
+    store = make_store(connect, ['a'])
+    other = make_store(connect, ['a'])
+    key = keys_owned_by(HashRing(['a', 'b']), 'b', 1)[0]
+    store.write(key, lambda r: r.hset(key, 'user', 'x'))
+
+    store.change_nodes(['a', 'b'])
+    assert store.read(key, lambda r: r.hget(key, 'user')) == 'x'     # read-through moved it to b
+    assert other.previous is None and other.ring.nodes == ['a']      # hasn't refreshed yet
+    assert other.read(key, lambda r: r.hget(key, 'user')) == 'x'
+
+
+def test_move_keeps_a_write_that_lands_mid_move(connect):
+    store = make_store(connect, ['a'])
+    key = keys_owned_by(HashRing(['a', 'b']), 'b', 1)[0]
+    src = connect('a')
+    src.hset(key, 'user', 'x')
+    store.change_nodes(['a', 'b'])
+
+    # A writer still on the old ring updates the source between DUMP and delete
+    real = store._delete_if_unchanged['a']
+    calls = []
+
+    def racing_delete(keys, args):
+        if not calls:
+            src.hset(key, 'pref:theme', 'dark')
+        calls.append(1)
+        return real(keys=keys, args=args)
+
+    store._delete_if_unchanged['a'] = racing_delete
+    assert store._move(key, 'a', 'b')
+    assert connect('b').hgetall(key) == {'user': 'x', 'pref:theme': 'dark'}
+    assert not src.exists(key)
+    assert store.stats['move_conflicts'] == 1
+
+
+def test_existing_ring_is_not_shrunk_by_a_restart(connect):
+    store = make_store(connect, ['a', 'b'])
+    store.migrate(settle=0)
+    store.change_nodes(['a', 'b', 'c'])
+    store.migrate(settle=0)
+    restarted = make_store(connect, ['a', 'b'])
+    assert restarted.nodes() == ['a', 'b', 'c']
+    assert not connect('a').hget(RING_KEY, 'previous')
+
+
+def test_previous_ring_is_kept_while_a_key_cannot_be_moved(connect, monkeypatch):
+    store = make_store(connect, ['a'])
+    keys = keys_owned_by(HashRing(['a', 'b']), 'b', 3)
+    for key in keys:
+        connect('a').hset(key, 'user', 'x')
+    store.change_nodes(['a', 'b'])
+
+    # One key keeps changing on its old owner: every move of it gives up
+    real_move = store._move
+    monkeypatch.setattr(store, '_move', lambda key, src, dst: key != keys[0] and real_move(key, src, dst))
+    assert store.migrate(settle=0) == 2
+    assert store.stats['migration_leftovers'] == 1
+    assert store.migrating() and connect('a').hget(RING_KEY, 'previous')
+    # Still readable through the previous ring
+    assert store.read(keys[0], lambda r: r.hget(keys[0], 'user')) == 'x'
+
+    monkeypatch.setattr(store, '_move', real_move)
+    assert store.migrate(settle=0) == 1
+    assert not store.migrating() and not connect('a').hget(RING_KEY, 'previous')
+    assert all(connect('b').exists(key) for key in keys)
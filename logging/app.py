@@ -7,107 +7,126 @@ This app demonstrates:
 2. Different log levels (INFO, WARNING, ERROR)
 3. Request logging with metadata
 4. Error logging with stack traces
+5. Non-blocking logging: records are queued, written by a background thread
+6. Request context: request_id / user_id / timing added to every log call
+7. Tail-based buffering: full logs only for failed, slow or sampled requests
+8. Metrics derived from the log records, on /metrics for Prometheus
 """
 
 import os
 import json
 import logging
 import random
+import signal
+import sys
 import time
-import traceback
 from datetime import datetime
-from flask import Flask, request
+from flask import Flask, Response, g, request
+from log_pipeline import LogPipeline
+from json_formatter import JSONFormatter
+from rotating_log import RotatingCompressedFileHandler
+from log_metrics import UNMATCHED, MetricsFilter
+import request_context
+from tail_buffer import TailBuffer
 
 app = Flask(__name__)
 APP_NAME = os.environ.get('APP_NAME', 'app')
 
-# Configure JSON structured logging
-class JSONFormatter(logging.Formatter):
-    """Format log messages as JSON for easy parsing by Filebeat."""
-
-    def format(self, record):
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "level": record.levelname,
-            "app": APP_NAME,
-            "message": record.getMessage(),
-            "logger": record.name,
-        }
-
-        # Add extra fields if present
-        if hasattr(record, 'request_id'):
-            log_entry['request_id'] = record.request_id
-        if hasattr(record, 'method'):
-            log_entry['method'] = record.method
-        if hasattr(record, 'path'):
-            log_entry['path'] = record.path
-        if hasattr(record, 'status_code'):
-            log_entry['status_code'] = record.status_code
-        if hasattr(record, 'duration_ms'):
-            log_entry['duration_ms'] = record.duration_ms
-        if hasattr(record, 'user_id'):
-            log_entry['user_id'] = record.user_id
-
-        # Add exception info if present
-        if record.exc_info:
-            log_entry['exception'] = traceback.format_exception(*record.exc_info)
-
-        return json.dumps(log_entry)
-
-
-# Setup file handler with JSON formatting
+# Setup file handler with JSON formatting (see json_formatter.py)
 log_dir = '/var/log/app'
 os.makedirs(log_dir, exist_ok=True)
 
-file_handler = logging.FileHandler(f'{log_dir}/{APP_NAME}.log')
-file_handler.setFormatter(JSONFormatter())
+# Rotates on size or age, gzips closed segments, flushes + fsyncs once per LOG_SYNC_INTERVAL
+file_handler = RotatingCompressedFileHandler(
+    f'{log_dir}/{APP_NAME}.log',
+    max_bytes=int(os.environ.get('LOG_MAX_BYTES', 50 * 1024 * 1024)),
+    rotate_interval=float(os.environ.get('LOG_ROTATE_INTERVAL', 3600)),
+    backup_count=int(os.environ.get('LOG_BACKUP_COUNT', 10)),
+    sync_interval=float(os.environ.get('LOG_SYNC_INTERVAL', 1.0)),
+    compress_delay=float(os.environ.get('LOG_COMPRESS_DELAY', 10))
+)
+file_handler.setFormatter(JSONFormatter(APP_NAME))
 
 # Also log to console for debugging
 console_handler = logging.StreamHandler()
-console_handler.setFormatter(JSONFormatter())
+console_handler.setFormatter(JSONFormatter(APP_NAME))
+
+# Request threads only put records on a bounded queue; a background thread
+# formats them and writes them in batches (LOG_OVERFLOW: drop-oldest | sample | block)
+log_pipeline = LogPipeline(
+    [file_handler, console_handler],
+    maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+    overflow=os.environ.get('LOG_OVERFLOW', 'drop-oldest'),
+    sample_rate=int(os.environ.get('LOG_SAMPLE_RATE', 10)),
+    batch_size=int(os.environ.get('LOG_BATCH_SIZE', 256)),
+    flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL', 0.2))
+)
+log_pipeline.start()
 
 # Configure root logger
 logger = logging.getLogger(APP_NAME)
 logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+logger.addHandler(log_pipeline.handler)
+# Runs on the request thread: copies request_id / user_id / elapsed_ms onto every record
+logger.addFilter(request_context.RequestContextFilter())
+# Counts records by level and requests by route/status - ahead of the tail buffer and the
+# queue, so records they drop are still counted
+log_metrics = MetricsFilter(APP_NAME)
+logger.addFilter(log_metrics)
+
+# Hold each request's records until it ends; write them only if it failed, was slow or was
+# sampled - otherwise just the summary line (LOG_TAIL=0 writes everything, as before)
+tail_buffer = None
+if os.environ.get('LOG_TAIL', '1') == '1':
+    tail_buffer = TailBuffer(
+        logger,
+        slow_ms=float(os.environ.get('LOG_TAIL_SLOW_MS', 1000)),
+        sample_rate=float(os.environ.get('LOG_TAIL_SAMPLE_RATE', 0.01)),
+        flush_level=logging.getLevelName(os.environ.get('LOG_TAIL_FLUSH_LEVEL', 'ERROR')),
+        max_records=int(os.environ.get('LOG_TAIL_MAX_RECORDS', 1000))
+    )
+    logger.addFilter(tail_buffer)
+
+new_request_id = request_context.RequestIdGenerator(APP_NAME)
 
 
 @app.before_request
 def before_request():
-    """Log incoming request."""
-    request.start_time = time.time()
-    request.request_id = f"{APP_NAME}-{int(time.time() * 1000)}"
+    """Start the request context (reuse the caller's X-Request-ID if it sent one)."""
+    request_id = request.headers.get('X-Request-ID', '')[:64] or new_request_id()
+    g.request_context_token = request_context.start(request_id)
+    if tail_buffer:
+        g.tail_buffer_token = tail_buffer.start()
 
 
 @app.after_request
 def after_request(response):
     """Log completed request with timing."""
-    duration_ms = (time.time() - request.start_time) * 1000
-
+    ctx = request_context.current()
+    duration_ms = ctx.elapsed_ms()
     extra = {
-        'request_id': request.request_id,
         'method': request.method,
         'path': request.path,
+        'route': request.url_rule.rule if request.url_rule else UNMATCHED,
         'status_code': response.status_code,
-        'duration_ms': round(duration_ms, 2)
+        'duration_ms': duration_ms
     }
+    if tail_buffer:
+        reason, extra['log_records'] = tail_buffer.finish(response.status_code, duration_ms)
+        if reason:
+            extra['log_reason'] = reason
+    logger.info(f"{request.method} {request.path} - {response.status_code}", extra=extra)
+    response.headers['X-Request-ID'] = ctx.fields['request_id']
+    return response
 
-    log_record = logging.LogRecord(
-        name=APP_NAME,
-        level=logging.INFO,
-        pathname='',
-        lineno=0,
-        msg=f"{request.method} {request.path} - {response.status_code}",
-        args=(),
-        exc_info=None
-    )
 
-    for key, value in extra.items():
-        setattr(log_record, key, value)
-
-    logger.handle(log_record)
-    return response
+@app.teardown_request
+def teardown_request(exc):
+    if tail_buffer and 'tail_buffer_token' in g:
+        tail_buffer.end(g.pop('tail_buffer_token'))
+    token = g.pop('request_context_token', None)
+    if token is not None:
+        request_context.end(token)
 
 
 @app.route('/')
@@ -127,22 +146,34 @@ def health():
     return json.dumps({"status": "healthy", "app": APP_NAME})
 
 
+@app.route('/log-stats')
+def log_stats():
+    """Logging pipeline counters: queued, dropped, sampled out, written, batches, fsyncs, rotations."""
+    return json.dumps({"app": APP_NAME, "log_pipeline": log_pipeline.info(),
+                       "log_file": file_handler.info(),
+                       "tail_buffer": tail_buffer.stats if tail_buffer else None})
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics derived from the log records, plus the log pipeline's own state."""
+    stats = log_pipeline.info()
+    pipeline = (
+        "# HELP app_log_queue_depth Records waiting for the log writer\n"
+        "# TYPE app_log_queue_depth gauge\n"
+        f'app_log_queue_depth{{app="{APP_NAME}"}} {stats["queued"]}\n'
+        "# HELP app_log_records_dropped_total Records lost to the queue overflow policy\n"
+        "# TYPE app_log_records_dropped_total counter\n"
+        f'app_log_records_dropped_total{{app="{APP_NAME}"}} {stats["dropped"] + stats["sampled_out"]}\n'
+    )
+    return Response(log_metrics.render() + pipeline, mimetype='text/plain')
+
+
 @app.route('/user/<user_id>')
 def get_user(user_id):
     """Simulate user lookup with logging."""
-    extra = {'user_id': user_id}
-
-    log_record = logging.LogRecord(
-        name=APP_NAME,
-        level=logging.INFO,
-        pathname='',
-        lineno=0,
-        msg=f"User lookup: {user_id}",
-        args=(),
-        exc_info=None
-    )
-    log_record.user_id = user_id
-    logger.handle(log_record)
+    request_context.bind(user_id=user_id)
+    logger.info(f"User lookup: {user_id}")
 
     return json.dumps({"user_id": user_id, "name": f"User {user_id}"})
 
@@ -201,5 +232,7 @@ def generate_logs():
 
 
 if __name__ == '__main__':
+    # docker stop sends SIGTERM: exit normally so atexit drains the log queue
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     logger.info(f"Starting {APP_NAME}...")
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: records/second of the old dict + json.dumps JSONFormatter
+vs the one in json_formatter.py, plus a byte-for-byte equality check.
+
+    python bench_formatter.py
+    python bench_formatter.py --records 500000
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+import traceback
+from datetime import datetime, timezone
+
+from json_formatter import JSONFormatter
+
+APP_NAME = 'app1'
+
+
+class OldJSONFormatter(logging.Formatter):
+    """The previous formatter (timestamp taken from record.created, like the new one)."""
+
+    def format(self, record):
+        log_entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat() + "Z",
+            "level": record.levelname,
+            "app": APP_NAME,
+            "message": record.getMessage(),
+            "logger": record.name,
+        }
+
+        if hasattr(record, 'request_id'):
+            log_entry['request_id'] = record.request_id
+        if hasattr(record, 'method'):
+            log_entry['method'] = record.method
+        if hasattr(record, 'path'):
+            log_entry['path'] = record.path
+        if hasattr(record, 'status_code'):
+            log_entry['status_code'] = record.status_code
+        if hasattr(record, 'duration_ms'):
+            log_entry['duration_ms'] = record.duration_ms
+        if hasattr(record, 'user_id'):
+            log_entry['user_id'] = record.user_id
+
+        if record.exc_info:
+            log_entry['exception'] = traceback.format_exception(*record.exc_info)
+
+        return json.dumps(log_entry)
+
+
+def make_records(n):
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        exc_info = sys.exc_info()
+
+    records = []
+    for i in range(n):
+        kind = i % 4
+        record = logging.LogRecord(APP_NAME, logging.INFO, '', 0, 'GET /user/%s - 200', (i,), None)
+        record.created = 1700000000 + random.random() * 1000
+        if kind == 0:       # request log
+            record.request_id = f'{APP_NAME}-{i}'
+            record.method = 'GET'
+            record.path = f'/user/{i}'
+            record.status_code = 200
+            record.duration_ms = round(random.random() * 100, 2)
+        elif kind == 1:     # user log
+            record.user_id = str(i)
+            record.msg = 'User lookup: "café" \\ %s'
+        elif kind == 2:     # plain message
+            record.msg, record.args = 'Generated log %d', (i,)
+            record.levelname = 'WARNING'
+        elif i % 40 == 3:   # error with traceback
+            record.exc_info = exc_info
+            record.levelname = 'ERROR'
+        records.append(record)
+
+    # Edge cases of the timestamp: whole second, rounding up into the next second
+    for created in (1700000000.0, 1700000000.9999996, 1700000000.0000004, 0.5):
+        record = logging.LogRecord(APP_NAME, logging.INFO, '', 0, 'edge', (), None)
+        record.created = created
+        records.append(record)
+    return records
+
+
+def bench(formatter, records, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for record in records:
+            formatter.format(record)
+        best = min(best, time.perf_counter() - start)
+    return len(records) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    old, new = OldJSONFormatter(), JSONFormatter(APP_NAME)
+
+    mismatches = [r for r in records if old.format(r) != new.format(r)]
+    for record in mismatches[:3]:
+        print(f'MISMATCH\n  old: {old.format(record)}\n  new: {new.format(record)}')
+
+    old_rate, new_rate = bench(old, records), bench(new, records)
+    print(f'{len(records):,} records, {len(records) - len(mismatches):,} byte-identical\n')
+    print(f"{'formatter':<12} {'records/s':>12}")
+    print(f"{'old':<12} {old_rate:>12,.0f}")
+    print(f"{'new':<12} {new_rate:>12,.0f}   ({new_rate / old_rate:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
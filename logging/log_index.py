@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Search the JSON log files without the ELK stack.
+
+Indexes /var/log/app/*.log into a SQLite file, incrementally: the byte
+offset reached in each file is remembered (by device + inode, so a file
+renamed by rotation is finished, not re-read), and a re-run only parses new
+lines. A fingerprint of each file's first bytes catches a truncated file or
+a reused inode - those are read again from the start. A line longer than the
+read chunk (4MB) is skipped, not retried forever.
+
+Percentiles and counts are computed inside SQLite, on indexes by
+(route, ts), (level, ts) and (status_code, ts).
+
+    python log_index.py index                      # new lines only
+    python log_index.py latency --since 1h         # p50/p95/p99 duration_ms by path
+    python log_index.py request app1-3f9a1c2e-1b7  # every line of one request
+    python log_index.py levels --since 15m         # lines by level / status_code
+
+Queries update the index first (--no-update to skip). Inside the stack:
+
+    docker compose exec app1 python log_index.py latency --since 1h
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+# Bump when the tables change: an older index is dropped and rebuilt from the logs
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    head_len INTEGER NOT NULL,
+    head_hash TEXT NOT NULL,
+    PRIMARY KEY (dev, inode)
+);
+CREATE TABLE IF NOT EXISTS lines (
+    ts TEXT NOT NULL,
+    app TEXT,
+    level TEXT,
+    request_id TEXT,
+    path TEXT,
+    route TEXT,
+    status_code INTEGER,
+    duration_ms REAL,
+    message TEXT,
+    file TEXT,
+    offset INTEGER
+);
+CREATE INDEX IF NOT EXISTS lines_request ON lines (request_id) WHERE request_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS lines_ts ON lines (ts);
+CREATE INDEX IF NOT EXISTS lines_route_ts ON lines (route, ts, duration_ms) WHERE duration_ms IS NOT NULL;
+CREATE INDEX IF NOT EXISTS lines_level_ts ON lines (level, ts);
+CREATE INDEX IF NOT EXISTS lines_status_ts ON lines (status_code, ts);
+"""
+
+READ_CHUNK = 4 * 1024 * 1024
+HEAD_BYTES = 1024       # fingerprint: hash of (up to) the first KB of each file
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def connect(db_path):
+    db = sqlite3.connect(db_path)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    if db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        db.executescript('DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS lines;')
+        db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    db.executescript(SCHEMA)
+    return db
+
+
+def route(path):
+    # /user/42 and /user/43 are the same route
+    return ID_SEGMENT.sub('/:id', path) if path else None
+
+
+def log_files(log_dir):
+    """Active segments plus rotated ones not yet compressed."""
+    paths = glob.glob(os.path.join(log_dir, '*.log')) + glob.glob(os.path.join(log_dir, '*.log.*'))
+    return sorted(p for p in paths if not p.endswith(('.gz', '.tmp')))
+
+
+def parse(line):
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or 'timestamp' not in entry:
+        return None
+    path = entry.get('path')
+    return (entry['timestamp'], entry.get('app'), entry.get('level'), entry.get('request_id'),
+            path, route(path), entry.get('status_code'), entry.get('duration_ms'), entry.get('message'))
+
+
+def head_hash(f, length):
+    f.seek(0)
+    return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def skip_line(f, offset):
+    """Offset just past the line starting at `offset` (or EOF if it has no end yet)."""
+    f.seek(offset)
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            return offset
+        newline = chunk.find(b'\n')
+        if newline >= 0:
+            return offset + newline + 1
+        offset += len(chunk)
+
+
+def index_file(db, path):
+    """Parse whatever was appended since the last run. Returns the number of lines added."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return 0
+
+    added = 0
+    name = os.path.basename(path)
+    with f:
+        st = os.fstat(f.fileno())
+        row = db.execute('SELECT offset, head_len, head_hash FROM files WHERE dev = ? AND inode = ?',
+                         (st.st_dev, st.st_ino)).fetchone()
+        offset = 0
+        if row:
+            offset, head_len, old_hash = row
+            # Shorter than before, or different first bytes: truncated, or a new file on a reused inode
+            if offset > st.st_size or head_hash(f, head_len) != old_hash:
+                offset = 0
+        f.seek(offset)
+        while True:
+            chunk = f.read(READ_CHUNK)
+            end = chunk.rfind(b'\n') + 1
+            if not end:
+                if len(chunk) < READ_CHUNK:
+                    break       # only a partial line left: pick it up next time
+                # One line bigger than a whole chunk: skip it instead of stalling here forever
+                offset = skip_line(f, offset)
+                print(f'{name}: skipped a line over {READ_CHUNK} bytes', file=sys.stderr)
+                f.seek(offset)
+                continue
+            rows = []
+            pos = offset
+            for raw in chunk[:end].splitlines(keepends=True):
+                fields = parse(raw)
+                if fields:
+                    rows.append(fields + (name, pos))
+                pos += len(raw)
+            db.executemany('INSERT INTO lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            added += len(rows)
+            offset += end
+            f.seek(offset)
+        head_len = min(offset, HEAD_BYTES)
+        db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                   (st.st_dev, st.st_ino, path, offset, head_len, head_hash(f, head_len)))
+    db.commit()
+    return added
+
+
+def update(db, log_dir):
+    return sum(index_file(db, path) for path in log_files(log_dir))
+
+
+def since_ts(since):
+    """'90s', '15m', '1h', '2d' → ISO timestamp to compare against the indexed ones."""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    seconds = float(since[:-1]) * units[since[-1]] if since[-1] in units else float(since)
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(time.time() - seconds))
+
+
+# Nearest-rank percentiles per route: the i-th smallest duration, i = floor(n * p / 100)
+LATENCY_QUERY = """
+WITH ranked AS (
+    SELECT route, duration_ms,
+           ROW_NUMBER() OVER (PARTITION BY route ORDER BY duration_ms) - 1 AS i,
+           COUNT(*) OVER (PARTITION BY route) AS n
+    FROM lines
+    WHERE duration_ms IS NOT NULL AND ts >= ?
+)
+SELECT COALESCE(route, '-'), n,
+       MAX(CASE WHEN i = MIN(n - 1, n * 50 / 100) THEN duration_ms END),
+       MAX(CASE WHEN i = MIN(n - 1, n * 95 / 100) THEN duration_ms END),
+       MAX(CASE WHEN i = MIN(n - 1, n * 99 / 100) THEN duration_ms END) AS p99,
+       MAX(duration_ms)
+FROM ranked
+GROUP BY route
+ORDER BY p99 DESC
+LIMIT ?
+"""
+
+
+def latency(db, since, limit=20):
+    """[(route, count, p50, p95, p99, max)], slowest p99 first."""
+    return db.execute(LATENCY_QUERY, (since_ts(since), limit)).fetchall()
+
+
+def cmd_latency(db, args):
+    print(f"{'path':<30} {'count':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for path, count, p50, p95, p99, slowest in latency(db, args.since, args.limit):
+        print(f'{path:<30} {count:>8} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {slowest:>9.1f}')
+
+
+def cmd_request(db, args):
+    rows = db.execute('SELECT ts, app, level, message, status_code, duration_ms, file, offset '
+                      'FROM lines WHERE request_id = ? ORDER BY ts', (args.request_id,)).fetchall()
+    for ts, app, level, message, status, duration, name, offset in rows:
+        timing = f'  [{status} {duration}ms]' if duration is not None else ''
+        print(f'{ts} {app} {level:<8} {message}{timing}  ({name}:{offset})')
+    if not rows:
+        print(f'no lines for request {args.request_id}')
+        sys.exit(1)
+
+
+def cmd_levels(db, args):
+    rows = db.execute('SELECT level, status_code, COUNT(*) FROM lines WHERE ts >= ? '
+                      'GROUP BY level, status_code ORDER BY 3 DESC', (since_ts(args.since),))
+    print(f"{'level':<10} {'status':>6} {'lines':>10}")
+    for level, status, count in rows:
+        print(f"{level or '-':<10} {status or '-':>6} {count:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', default='/var/log/app', help='directory with the *.log files')
+    parser.add_argument('--db', default=None, help='index file (default: <logs>/log_index.sqlite)')
+    parser.add_argument('--no-update', action='store_true', help='query the index as it is')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('index')
+    latency = sub.add_parser('latency')
+    latency.add_argument('--since', default='1h')
+    latency.add_argument('--limit', type=int, default=20, help='slowest paths to show')
+    request = sub.add_parser('request')
+    request.add_argument('request_id')
+    levels = sub.add_parser('levels')
+    levels.add_argument('--since', default='1h')
+    args = parser.parse_args()
+
+    db = connect(args.db or os.path.join(args.logs, 'log_index.sqlite'))
+    if args.command == 'index' or not args.no_update:
+        start = time.perf_counter()
+        added = update(db, args.logs)
+        if args.command == 'index':
+            print(f'indexed {added:,} new lines in {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    commands = {'latency': cmd_latency, 'request': cmd_request, 'levels': cmd_levels}
+    if args.command in commands:
+        commands[args.command](db, args)
+        print(f'\n({(time.perf_counter() - start) * 1000:.1f} ms)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
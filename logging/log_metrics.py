@@ -0,0 +1,95 @@
+"""
+Metrics derived from log records, served in the Prometheus text format.
+
+MetricsFilter is a logger filter added ahead of the tail buffer, so it runs
+on the request thread and sees every record logged - including the ones the
+tail buffer later drops and the ones lost to the queue overflow policy.
+Counters are dicts under one lock; /metrics renders a copy.
+
+From every record:
+    app_log_records_total{level}
+From the request summary lines after_request logs (they carry status_code + duration_ms):
+    app_http_requests_total{method, path, status_code}
+    app_http_request_duration_seconds{path}        histogram
+
+The path label is the record's `route` (the Flask url_rule, /user/<user_id>),
+never the raw URL path, so a scan of random URLs can't grow the label set.
+Records without one are counted under UNMATCHED.
+"""
+
+import bisect
+import logging
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED = '<unmatched>'
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsFilter(logging.Filter):
+    def __init__(self, app_name, buckets=DEFAULT_BUCKETS):
+        super().__init__()
+        self.app_name = app_name
+        self.buckets = tuple(sorted(buckets))
+        self.levels = {}          # level → count
+        self.requests = {}        # (method, path, status_code) → count
+        self.durations = {}       # path → [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        # Only counts - never drops a record
+        fields = record.__dict__
+        if 'status_code' not in fields or 'duration_ms' not in fields:
+            with self._lock:
+                self.levels[record.levelname] = self.levels.get(record.levelname, 0) + 1
+            return True
+
+        path = fields.get('route') or UNMATCHED
+        key = (fields.get('method', ''), path, fields['status_code'])
+        seconds = fields['duration_ms'] / 1000
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.levels[record.levelname] = self.levels.get(record.levelname, 0) + 1
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.durations.get(path)
+            if hist is None:
+                hist = self.durations[path] = [0] * (len(self.buckets) + 1) + [0.0]
+            hist[bucket] += 1
+            hist[-1] += seconds
+        return True
+
+    def render(self):
+        app = self.app_name
+        with self._lock:
+            levels = list(self.levels.items())
+            requests = list(self.requests.items())
+            durations = [(path, list(hist)) for path, hist in self.durations.items()]
+
+        out = ['# HELP app_log_records_total Log records logged, by level',
+               '# TYPE app_log_records_total counter']
+        for level, count in sorted(levels):
+            out.append(f'app_log_records_total{_labels(app=app, level=level)} {count}')
+
+        out += ['# HELP app_http_requests_total Requests, from the request log lines',
+                '# TYPE app_http_requests_total counter']
+        for (method, path, status), count in sorted(requests):
+            out.append(f'app_http_requests_total'
+                       f'{_labels(app=app, method=method, path=path, status_code=status)} {count}')
+
+        out += ['# HELP app_http_request_duration_seconds Request duration, from the request log lines',
+                '# TYPE app_http_request_duration_seconds histogram']
+        for path, hist in sorted(durations):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), hist):
+                cumulative += count
+                out.append(f'app_http_request_duration_seconds_bucket{_labels(app=app, path=path, le=bound)} {cumulative}')
+            out.append(f'app_http_request_duration_seconds_sum{_labels(app=app, path=path)} {hist[-1]:.6f}')
+            out.append(f'app_http_request_duration_seconds_count{_labels(app=app, path=path)} {cumulative}')
+        return '\n'.join(out) + '\n'
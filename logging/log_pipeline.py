@@ -0,0 +1,173 @@
+"""
+Non-blocking logging pipeline: QueueHandler on the request thread,
+formatting + I/O on one background thread.
+
+    request thread                     background thread
+    logger.info(...) ─► bounded queue ─► take up to 256 records
+                        (microseconds)   format them
+                                         one write() + flush per handler
+
+When the queue is full (disk stall, log storm) the overflow policy decides:
+
+    block        wait for room - nothing is lost, requests slow down
+    drop-oldest  throw away the oldest queued record - newest logs win
+    sample       once the queue is 80% full, keep only 1 in N records below
+                 WARNING; WARNING and above always get in (blocking)
+
+stop() (registered with atexit) drains the queue and flushes every handler.
+"""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import threading
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+SAMPLE = 'sample'
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue, overflow=BLOCK, sample_rate=10, high_water=0.8):
+        super().__init__(log_queue)
+        if overflow not in (BLOCK, DROP_OLDEST, SAMPLE):
+            raise ValueError(f'unknown overflow policy: {overflow}')
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.high_water = int(log_queue.maxsize * high_water)
+        self.stats = {'enqueued': 0, 'dropped': 0, 'sampled_out': 0}
+        self._seen = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread, but the message is merged
+        # here: args are live objects the caller may change before that runs
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == SAMPLE and record.levelno < logging.WARNING \
+                and self.queue.qsize() >= self.high_water:
+            self._seen += 1
+            if self._seen % self.sample_rate:
+                self.stats['sampled_out'] += 1
+                return
+
+        if self.overflow == DROP_OLDEST:
+            while True:
+                try:
+                    self.queue.put_nowait(record)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.stats['dropped'] += 1
+                    except queue.Empty:
+                        pass
+        else:
+            self.queue.put(record)
+        self.stats['enqueued'] += 1
+
+
+class BatchingQueueListener:
+    """Drains the queue in batches; one write + flush per handler per batch."""
+
+    _STOP = object()
+
+    def __init__(self, log_queue, handlers, batch_size=256, flush_interval=0.2):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {'written': 0, 'batches': 0}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Write everything still queued, then flush."""
+        if self._thread is None:
+            return
+        self.queue.put(self._STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Give a burst a moment to pile up, then take what is there
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get(timeout=self.flush_interval if len(batch) == 1 else 0))
+            except queue.Empty:
+                pass
+
+            stop = any(record is self._STOP for record in batch)
+            self._write([record for record in batch if record is not self._STOP])
+            if stop:
+                # Drain what arrived after the stop marker
+                rest = []
+                while True:
+                    try:
+                        rest.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write([record for record in rest if record is not self._STOP])
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        for handler in self.handlers:
+            try:
+                accepted = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+                write_batch = getattr(handler, 'write_batch', None)
+                if write_batch is not None:
+                    # Handler groups its own flushes (rotating_log.py)
+                    write_batch(''.join(handler.format(r) + handler.terminator for r in accepted))
+                    continue
+                stream = getattr(handler, 'stream', None)
+                if stream is None:
+                    for record in accepted:
+                        handler.handle(record)
+                    continue
+                text = ''.join(handler.format(r) + handler.terminator for r in accepted)
+                with handler.lock:
+                    stream.write(text)
+                    handler.flush()
+            except Exception:
+                handler.handleError(records[0])
+        self.stats['written'] += len(records)
+        self.stats['batches'] += 1
+
+
+class LogPipeline:
+    """
+    pipeline = LogPipeline([file_handler, console_handler], maxsize=10000, overflow='drop-oldest')
+    logger.addHandler(pipeline.handler)
+    pipeline.start()
+    """
+
+    def __init__(self, handlers, maxsize=10000, overflow=BLOCK, sample_rate=10,
+                 batch_size=256, flush_interval=0.2):
+        self.queue = queue.Queue(maxsize)
+        self.handler = BoundedQueueHandler(self.queue, overflow, sample_rate)
+        self.listener = BatchingQueueListener(self.queue, handlers, batch_size, flush_interval)
+
+    def start(self):
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.flush()
+
+    def info(self):
+        return dict(self.handler.stats, **self.listener.stats, queued=self.queue.qsize(),
+                    maxsize=self.queue.maxsize, overflow=self.handler.overflow)
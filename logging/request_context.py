@@ -0,0 +1,84 @@
+"""
+Request context for logs, carried in a contextvar.
+
+Instead of building LogRecords by hand to attach request_id / user_id,
+the request's fields live in a ContextVar and a logger filter copies them
+onto every record logged while that request runs:
+
+    before_request:  start(request_id)       → {request_id}, start time
+    in a view:       bind(user_id='123')     → {request_id, user_id}
+    logger.info()    → the record gets request_id, user_id and elapsed_ms
+    teardown:        end(token)
+
+Each thread (or asyncio task) sees its own context, so concurrent
+requests never mix up fields. The filter sits on the logger, i.e. it runs
+on the request thread - not on the background writer thread.
+
+Request IDs: <app>-<random per process>-<counter>, e.g. app1-3f9a1c2e-1b7.
+Unique across concurrent requests, instances and restarts, and cheaper
+than a uuid4 (no syscall, no 128-bit formatting per request).
+"""
+
+import contextvars
+import itertools
+import logging
+import os
+import time
+
+_current = contextvars.ContextVar('request_context', default=None)
+
+
+class RequestContext:
+    __slots__ = ('fields', 'start')
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.start = time.perf_counter()
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+
+class RequestIdGenerator:
+    def __init__(self, app_name):
+        self.prefix = f'{app_name}-{os.urandom(4).hex()}-'
+        self._counter = itertools.count(1)    # next() is atomic under the GIL
+
+    def __call__(self):
+        return f'{self.prefix}{next(self._counter):x}'
+
+
+def start(request_id, **fields):
+    """Begin a request context. Returns a token for end()."""
+    return _current.set(RequestContext(dict(fields, request_id=request_id)))
+
+
+def end(token):
+    _current.reset(token)
+
+
+def bind(**fields):
+    """Add fields (user_id, ...) to every log line of the current request."""
+    ctx = _current.get()
+    if ctx is not None:
+        ctx.fields.update(fields)
+
+
+def current():
+    return _current.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Copy the current request's fields onto each record (explicit `extra` wins)."""
+
+    def filter(self, record):
+        ctx = _current.get()
+        if ctx is not None:
+            fields = record.__dict__
+            for name, value in ctx.fields.items():
+                if name not in fields:
+                    fields[name] = value
+            # The request summary line already carries the total as duration_ms
+            if 'elapsed_ms' not in fields and 'duration_ms' not in fields:
+                fields['elapsed_ms'] = ctx.elapsed_ms()
+        return True
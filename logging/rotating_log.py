@@ -0,0 +1,179 @@
+"""
+Rotating log file: size/time rotation, gzip in the background, grouped flush + fsync.
+
+    /var/log/app/app1.log                      active segment (what Filebeat's *.log glob reads)
+    /var/log/app/app1.log.20240115-103045      just rotated, Filebeat finishes reading it
+    /var/log/app/app1.log.20240115-103045.gz   compressed LOG_COMPRESS_DELAY seconds later
+
+Writes go to a large in-process buffer. A background thread (log-sync)
+pushes it to the OS and fsyncs every sync_interval seconds, so a burst
+of batches costs one write() + one fsync() instead of one flush per batch.
+The same thread gzips closed segments and deletes the oldest beyond
+backup_count; a segment that fails to compress (disk full) stays queued and
+is retried compress_delay later, counted in stats['compress_errors'].
+flush() / close() still write and fsync everything at once.
+"""
+
+import glob
+import gzip
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+
+
+class RotatingCompressedFileHandler(logging.FileHandler):
+    def __init__(self, filename, max_bytes=50 * 1024 * 1024, rotate_interval=3600,
+                 backup_count=10, sync_interval=1.0, compress_delay=10.0, buffer_size=256 * 1024):
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.sync_interval = sync_interval
+        self.compress_delay = compress_delay
+        self.buffer_size = buffer_size
+        self.stats = {'syncs': 0, 'rotations': 0, 'compressed': 0, 'deleted': 0, 'compress_errors': 0}
+        self._dirty = False
+        self._pending = []          # (due, path) segments waiting to be compressed
+        self._stopping = threading.Event()
+        super().__init__(filename, delay=False)
+
+        # Segments left uncompressed by a previous run
+        for path in sorted(glob.glob(glob.escape(self.baseFilename) + '.*')):
+            if path.endswith('.gz.tmp'):
+                os.remove(path)     # interrupted compression; the segment itself is still there
+            elif not path.endswith('.gz'):
+                self._pending.append((0, path))
+
+        self._thread = threading.Thread(target=self._run, name='log-sync', daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                      encoding=self.encoding, errors=self.errors)
+        self._size = os.fstat(stream.fileno()).st_size
+        self._rollover_at = time.time() + self.rotate_interval if self.rotate_interval else None
+        return stream
+
+    def emit(self, record):
+        try:
+            self.write_batch(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def write_batch(self, text):
+        """Append already formatted lines; rotates first if the segment is full or old."""
+        if not text:
+            return
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            if self._size and (self._size + len(text) > self.max_bytes
+                               or (self._rollover_at and time.time() >= self._rollover_at)):
+                self._rotate()
+            self.stream.write(text)
+            self._size += len(text)     # JSON lines are ASCII: characters == bytes
+            self._dirty = True
+
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(5)
+        with self.lock:
+            self._sync()
+        super().close()
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, segment_bytes=self._size if self.stream else 0,
+                        pending_compression=len(self._pending))
+
+    def _sync(self):
+        # caller holds self.lock
+        if self.stream is None or not self._dirty:
+            return
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self._dirty = False
+        self.stats['syncs'] += 1
+
+    def _rotate(self):
+        # caller holds self.lock
+        self._sync()
+        self.stream.close()
+        self.stream = None
+        target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + '.gz'):
+            target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}-{n}"
+            n += 1
+        os.rename(self.baseFilename, target)
+        self.stream = self._open()
+        self._pending.append((time.monotonic() + self.compress_delay, target))
+        self.stats['rotations'] += 1
+
+    def _run(self):
+        while not self._stopping.wait(self.sync_interval):
+            try:
+                with self.lock:
+                    self._sync()
+            except Exception as e:
+                self._report('sync', e)
+            self._housekeeping()
+
+    def _housekeeping(self):
+        with self.lock:
+            now = time.monotonic()
+            due = [entry for entry in self._pending if entry[0] <= now]
+        # Compress outside the lock: writers keep going. A segment leaves the queue
+        # only once its .gz exists; a failed one is retried compress_delay later
+        for entry in due:
+            try:
+                self._compress(entry[1])
+            except Exception as e:
+                self.stats['compress_errors'] += 1
+                self._report(f'compressing {entry[1]}', e)
+                retry = (time.monotonic() + max(self.compress_delay, self.sync_interval), entry[1])
+            else:
+                retry = None
+            with self.lock:
+                self._pending.remove(entry)
+                if retry:
+                    self._pending.append(retry)
+        if due:
+            try:
+                self._delete_old()
+            except Exception as e:
+                self._report('deleting old segments', e)
+
+    def _report(self, what, error):
+        # Can't log through ourselves: stderr, like logging.Handler.handleError
+        sys.stderr.write(f'{type(self).__name__}: {what} failed: {error!r}\n')
+
+    def _compress(self, path):
+        if not os.path.exists(path):
+            return
+        tmp = path + '.gz.tmp'
+        try:
+            with open(path, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.rename(tmp, path + '.gz')
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        os.remove(path)
+        self.stats['compressed'] += 1
+
+    def _delete_old(self):
+        archives = sorted(glob.glob(glob.escape(self.baseFilename) + '.*.gz'), key=os.path.getmtime)
+        for path in archives[:max(0, len(archives) - self.backup_count)]:
+            os.remove(path)
+            self.stats['deleted'] += 1
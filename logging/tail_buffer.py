@@ -0,0 +1,103 @@
+"""
+Tail-based log buffering: decide what to keep once the request is over.
+
+While a request runs its log records are held in memory instead of being
+queued for writing. When it ends:
+
+    status >= 500, or a record at flush_level or above   → write them all (error)
+    took longer than slow_ms                            → write them all (slow)
+    random() < sample_rate                              → write them all (sampled)
+    otherwise                                           → drop them
+
+and the request summary line ("GET /path - 200", with the number of
+records buffered and why they were kept) is always written.
+Records logged outside a request are not touched.
+
+    tail = TailBuffer(logger, slow_ms=1000, sample_rate=0.01)
+    logger.addFilter(tail)            # after RequestContextFilter
+    token = tail.start()              # before_request
+    reason, count = tail.finish(status_code, duration_ms)   # after_request, then log the summary
+    tail.end(token)                   # teardown_request
+"""
+
+import collections
+import contextvars
+import logging
+import random
+
+_buffer = contextvars.ContextVar('tail_buffer', default=None)
+
+
+class _RequestBuffer:
+    __slots__ = ('records', 'count', 'max_level')
+
+    def __init__(self, max_records):
+        self.records = collections.deque(maxlen=max_records)   # oldest dropped past the cap
+        self.count = 0
+        self.max_level = 0
+
+
+class TailBuffer(logging.Filter):
+    def __init__(self, logger, slow_ms=1000, sample_rate=0.01, flush_level=logging.ERROR,
+                 max_records=1000):
+        super().__init__()
+        self.logger = logger
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.flush_level = flush_level
+        self.max_records = max_records
+        self.stats = {'requests': 0, 'kept': 0, 'summarized': 0,
+                      'records_written': 0, 'records_dropped': 0}
+
+    def filter(self, record):
+        buf = _buffer.get()
+        if buf is None:
+            return True
+        buf.records.append(record)
+        buf.count += 1
+        if record.levelno > buf.max_level:
+            buf.max_level = record.levelno
+        return False
+
+    def start(self):
+        return _buffer.set(_RequestBuffer(self.max_records))
+
+    def finish(self, status_code, duration_ms):
+        """Stop buffering; write the records if the request is worth keeping.
+        Returns (reason or None, number of records buffered)."""
+        buf = _buffer.get()
+        if buf is None:
+            return None, 0
+        _buffer.set(None)
+
+        if status_code >= 500 or buf.max_level >= self.flush_level:
+            reason = 'error'
+        elif duration_ms >= self.slow_ms:
+            reason = 'slow'
+        elif self.sample_rate and random.random() < self.sample_rate:
+            reason = 'sampled'
+        else:
+            reason = None
+
+        self.stats['requests'] += 1
+        if reason:
+            self._write(buf)
+            self.stats['kept'] += 1
+        else:
+            self.stats['records_dropped'] += buf.count
+            self.stats['summarized'] += 1
+        return reason, buf.count
+
+    def end(self, token):
+        # finish() never ran (request aborted early): keep what was buffered
+        buf = _buffer.get()
+        if buf is not None:
+            self._write(buf)
+        _buffer.reset(token)
+
+    def _write(self, buf):
+        # Filters already ran when the records were logged - go straight to the handlers
+        for record in buf.records:
+            self.logger.callHandlers(record)
+        self.stats['records_written'] += len(buf.records)
+        self.stats['records_dropped'] += buf.count - len(buf.records)
@@ -46,7 +46,32 @@ curl -s "http://localhost:5000/generate?count=20" > /dev/null
 echo "     Done: 20 random logs"
 
 echo ""
-echo -e "${YELLOW}3. Checking indices in Elasticsearch...${NC}"
+echo -e "${YELLOW}3. Checking /metrics...${NC}"
+curl -s http://localhost:5000/no/such/page/123 > /dev/null
+metrics=$(curl -s http://localhost:5000/metrics)
+if echo "$metrics" | grep -q 'app_http_requests_total{.*path="/user/<user_id>",status_code="200"}'; then
+    echo "   PASS: user lookups counted under their route"
+else
+    echo "   FAIL: no app_http_requests_total for /user/<user_id>"
+fi
+if echo "$metrics" | grep -q 'path="<unmatched>",status_code="404"'; then
+    echo "   PASS: unknown URL counted as <unmatched>"
+else
+    echo "   FAIL: unknown URL not counted as <unmatched>"
+fi
+if echo "$metrics" | grep -q 'path="/\(user/[0-9]\|no/such\)'; then
+    echo "   FAIL: raw URL paths used as labels"
+else
+    echo "   PASS: no raw URL paths in labels"
+fi
+if echo "$metrics" | grep -q 'app_log_records_total{.*level="INFO"}'; then
+    echo "   PASS: INFO records counted (including ones tail buffering dropped)"
+else
+    echo "   FAIL: no app_log_records_total for INFO"
+fi
+
+echo ""
+echo -e "${YELLOW}4. Checking indices in Elasticsearch...${NC}"
 sleep 5  # Wait for Filebeat to ship logs
 curl -s http://localhost:9200/_cat/indices?v 2>/dev/null | head -10 || echo "Could not fetch indices"
 
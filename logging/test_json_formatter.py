@@ -0,0 +1,104 @@
+"""
+Unit tests for json_formatter.py: output must be byte-identical to json.dumps(log_entry).
+
+    pip install pytest && python -m pytest -q
+"""
+
+import json
+import logging
+import sys
+import traceback
+from datetime import datetime, timezone
+
+import pytest
+
+from bench_formatter import OldJSONFormatter, make_records
+from json_formatter import EXTRA_FIELDS, JSONFormatter
+
+APP_NAME = 'app1'
+
+
+def baseline(record):
+    """The dict + json.dumps formatter, for every field the new one knows."""
+    log_entry = {
+        'timestamp': datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat() + 'Z',
+        'level': record.levelname,
+        'app': APP_NAME,
+        'message': record.getMessage(),
+        'logger': record.name,
+    }
+    for name in EXTRA_FIELDS:
+        if hasattr(record, name):
+            log_entry[name] = getattr(record, name)
+    if record.exc_info:
+        log_entry['exception'] = traceback.format_exception(*record.exc_info)
+    return json.dumps(log_entry)
+
+
+def make_record(msg='hello', args=(), created=1700000000.5, level=logging.INFO, exc_info=None, **extra):
+    record = logging.LogRecord('app1', level, __file__, 1, msg, args, exc_info)
+    record.created = created
+    record.__dict__.update(extra)
+    return record
+
+
+def test_matches_the_old_formatter_on_the_benchmark_records():
+    new, old = JSONFormatter(APP_NAME), OldJSONFormatter()
+    for record in make_records(2000):
+        assert new.format(record) == old.format(record)
+
+
+@pytest.mark.parametrize('extra', [
+    {},
+    {'request_id': 'app1-3f9a-1', 'method': 'GET', 'path': '/user/42', 'status_code': 200,
+     'duration_ms': 12.25, 'log_reason': 'slow', 'log_records': 3},
+    {'user_id': '42', 'elapsed_ms': 0.0},
+    {'duration_ms': 1e-7, 'status_code': True, 'log_records': None},     # odd types go through json.dumps
+    {'duration_ms': float('nan')},
+    {'user_id': {'nested': [1, 'two']}},
+])
+def test_extra_fields(extra):
+    record = make_record('GET %s - %d', ('/user/42', 200), **extra)
+    assert JSONFormatter(APP_NAME).format(record) == baseline(record)
+
+
+def test_non_ascii_and_escapes():
+    record = make_record('User lookup: "café" \\ %s\n\t\x00 ☃ 𝄞', ('ünïcode',), user_id='Zoë')
+    text = JSONFormatter(APP_NAME).format(record)
+    assert text == baseline(record)
+    assert text.isascii()
+    assert json.loads(text)['message'].endswith('☃ 𝄞')
+
+
+def test_exception_is_formatted_once_and_shared():
+    try:
+        raise ValueError('bad "value" é')
+    except ValueError:
+        record = make_record('failed', level=logging.ERROR, exc_info=sys.exc_info(), request_id='r1')
+    first, second = JSONFormatter(APP_NAME), JSONFormatter(APP_NAME)
+    assert first.format(record) == baseline(record)
+    # A second handler reuses the text built by the first
+    assert second.format(record) == baseline(record)
+    assert record.exception_json == json.dumps(traceback.format_exception(*record.exc_info))
+
+
+@pytest.mark.parametrize('created', [
+    1700000000.0,               # no fraction: isoformat() drops it
+    1700000000.000001,
+    1700000000.9999994,
+    1700000000.9999996,         # rounds up into the next second
+    1700000059.9999999,         # ... and the next minute
+    946684799.9999999,          # ... and the next year
+])
+def test_timestamps_at_second_boundaries(created):
+    record = make_record(created=created)
+    assert JSONFormatter(APP_NAME).format(record) == baseline(record)
+
+
+def test_cached_second_is_replaced_when_the_second_changes():
+    formatter = JSONFormatter(APP_NAME)
+    # Same formatter, out of order and across boundaries: the per-second cache must follow
+    for created in (1700000000.25, 1700000000.75, 1700000001.5, 1700000000.9999996, 1699999999.5,
+                    1700000001.0, 1700000000.5):
+        record = make_record(created=created)
+        assert formatter.format(record) == baseline(record)
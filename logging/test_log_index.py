@@ -0,0 +1,111 @@
+"""
+Unit tests for log_index.py (incremental tailing and the SQL aggregates).
+
+    pip install pytest && python -m pytest -q
+"""
+
+import json
+import os
+
+import pytest
+
+import log_index
+
+
+def line(i, path='/user/1', duration=1.0, ts='2030-01-01T00:00:00'):
+    return json.dumps({'timestamp': ts, 'app': 'app1', 'level': 'INFO', 'request_id': f'r{i}',
+                       'path': path, 'status_code': 200, 'duration_ms': duration, 'message': f'm{i}'}) + '\n'
+
+
+@pytest.fixture
+def db(tmp_path):
+    return log_index.connect(str(tmp_path / 'index.sqlite'))
+
+
+def count(db):
+    return db.execute('SELECT COUNT(*) FROM lines').fetchone()[0]
+
+
+def test_only_new_complete_lines_are_indexed(db, tmp_path):
+    log = tmp_path / 'app.log'
+    log.write_text(line(1) + line(2) + '{"timestamp": "2030')
+    assert log_index.update(db, str(tmp_path)) == 2
+    assert log_index.update(db, str(tmp_path)) == 0
+
+    with open(log, 'a') as f:
+        f.write('-01-01T00:00:00", "message": "finished"}\n' + line(3))
+    assert log_index.update(db, str(tmp_path)) == 2
+    assert count(db) == 4
+
+
+def test_rotated_segment_is_finished_not_reread(db, tmp_path):
+    log = tmp_path / 'app.log'
+    log.write_text(line(1))
+    log_index.update(db, str(tmp_path))
+    with open(log, 'a') as f:
+        f.write(line(2))
+    os.rename(log, tmp_path / 'app.log.1')
+    log.write_text(line(3))
+    assert log_index.update(db, str(tmp_path)) == 2
+    assert count(db) == 3
+
+
+def test_truncated_and_regrown_file_is_read_from_the_start(db, tmp_path):
+    log = tmp_path / 'app.log'
+    log.write_text(line(1, ts='2030-01-01T00:00:01'))
+    log_index.update(db, str(tmp_path))
+    # Same inode, new content that is already longer than the old offset
+    log.write_text(line(2, ts='2030-01-01T00:00:02') + line(3) + line(4))
+    assert log_index.update(db, str(tmp_path)) == 3
+    assert count(db) == 4
+
+
+def test_reused_inode_is_detected_by_the_head_fingerprint(db, tmp_path):
+    log = tmp_path / 'app.log'
+    log.write_text(line(1) + line(2))
+    log_index.update(db, str(tmp_path))
+    log.unlink()
+    log.write_text(line(3, path='/other') + line(4) + line(5))
+    # Worst case: the new file got the old file's inode (the filesystem may hand out another)
+    st = os.stat(log)
+    db.execute('UPDATE files SET dev = ?, inode = ?', (st.st_dev, st.st_ino))
+    assert log_index.update(db, str(tmp_path)) == 3
+
+
+def test_oversized_line_is_skipped(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(log_index, 'READ_CHUNK', 512)
+    log = tmp_path / 'app.log'
+    log.write_text('x' * 2000 + '\n' + line(1))
+    assert log_index.update(db, str(tmp_path)) == 1
+    with open(log, 'a') as f:
+        f.write(line(2))
+    assert log_index.update(db, str(tmp_path)) == 1
+
+
+def test_old_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    old = log_index.sqlite3.connect(path)
+    old.execute('CREATE TABLE files (inode INTEGER PRIMARY KEY, path TEXT NOT NULL, offset INTEGER NOT NULL)')
+    old.commit()
+    old.close()
+    db = log_index.connect(path)
+    columns = [row[1] for row in db.execute('PRAGMA table_info(files)')]
+    assert 'dev' in columns and 'head_hash' in columns
+
+
+def test_latency_percentiles_in_sql(db, tmp_path):
+    durations = list(range(1, 101))
+    (tmp_path / 'app.log').write_text(
+        ''.join(line(i, path=f'/user/{i}', duration=d) for i, d in enumerate(durations))
+        + line(999, path='/', duration=5.0))
+    log_index.update(db, str(tmp_path))
+
+    rows = log_index.latency(db, since='3650000d')
+    assert rows[0] == ('/user/:id', 100, 51.0, 96.0, 100.0, 100.0)
+    assert rows[1] == ('/', 1, 5.0, 5.0, 5.0, 5.0)
+
+
+def test_level_counts_use_an_index(db):
+    plan = ' '.join(str(row) for row in db.execute('EXPLAIN QUERY PLAN SELECT level, COUNT(*) FROM lines '
+                                                   'WHERE level = ? AND ts >= ? GROUP BY level', ('INFO', '')))
+    assert 'lines_level_ts' in plan
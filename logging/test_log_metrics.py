@@ -0,0 +1,108 @@
+"""
+Unit tests for log_metrics.py.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import logging
+
+import pytest
+
+from log_metrics import UNMATCHED, MetricsFilter
+from tail_buffer import TailBuffer
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger(f'test.metrics.{request.node.name}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [ListHandler()]
+    logger.filters = []
+    return logger
+
+
+def summary(logger, route='/user/<user_id>', path='/user/42', status=200, duration_ms=3.0):
+    extra = {'method': 'GET', 'path': path, 'status_code': status, 'duration_ms': duration_ms}
+    if route is not None:
+        extra['route'] = route
+    logger.info(f'GET {path} - {status}', extra=extra)
+
+
+def test_render_counts_and_histogram(logger):
+    metrics = MetricsFilter('app1', buckets=(0.01, 0.1))
+    logger.addFilter(metrics)
+    logger.error('boom')
+    summary(logger, duration_ms=5)
+    summary(logger, duration_ms=50)
+    summary(logger, status=500, duration_ms=500)
+
+    lines = metrics.render().splitlines()
+    assert 'app_log_records_total{app="app1",level="ERROR"} 1' in lines
+    assert 'app_log_records_total{app="app1",level="INFO"} 3' in lines
+    assert ('app_http_requests_total{app="app1",method="GET",path="/user/<user_id>",status_code="200"} 2'
+            in lines)
+    assert ('app_http_requests_total{app="app1",method="GET",path="/user/<user_id>",status_code="500"} 1'
+            in lines)
+    # Buckets are cumulative and end with +Inf == count
+    buckets = [line for line in lines if line.startswith('app_http_request_duration_seconds_bucket')]
+    assert [line.rsplit(' ', 1)[1] for line in buckets] == ['1', '2', '3']
+    assert buckets[-1].startswith('app_http_request_duration_seconds_bucket{app="app1",'
+                                  'path="/user/<user_id>",le="+Inf"}')
+    assert 'app_http_request_duration_seconds_sum{app="app1",path="/user/<user_id>"} 0.555000' in lines
+    assert 'app_http_request_duration_seconds_count{app="app1",path="/user/<user_id>"} 3' in lines
+    assert lines.count('# TYPE app_http_request_duration_seconds histogram') == 1
+
+
+def test_label_is_the_route_never_the_raw_path(logger):
+    metrics = MetricsFilter('app1')
+    logger.addFilter(metrics)
+    for i in range(50):
+        summary(logger, route=None, path=f'/scan/{i}/x', status=404)
+    summary(logger, path='/user/1')
+    summary(logger, path='/user/2')
+
+    assert set(metrics.durations) == {UNMATCHED, '/user/<user_id>'}
+    assert metrics.requests[('GET', UNMATCHED, 404)] == 50
+    assert '/scan/' not in metrics.render()
+
+
+def test_label_values_are_escaped(logger):
+    metrics = MetricsFilter('app"1')
+    logger.addFilter(metrics)
+    summary(logger, route='/a\\b"c')
+    assert 'app="app\\"1",method="GET",path="/a\\\\b\\"c"' in metrics.render()
+
+
+def test_records_dropped_by_the_tail_buffer_are_counted(logger):
+    metrics = MetricsFilter('app1')
+    tail = TailBuffer(logger, slow_ms=1000, sample_rate=0)
+    logger.addFilter(metrics)
+    logger.addFilter(tail)
+
+    token = tail.start()
+    logger.warning('slow upstream')
+    logger.info('cache miss')
+    tail.finish(200, 5)
+    summary(logger)
+    tail.end(token)
+
+    assert logger.handlers[0].messages == ['GET /user/42 - 200']
+    assert metrics.levels == {'WARNING': 1, 'INFO': 2}
+    assert metrics.requests == {('GET', '/user/<user_id>', 200): 1}
+
+
+def test_filter_never_drops_records(logger):
+    logger.addFilter(MetricsFilter('app1'))
+    logger.info('kept')
+    summary(logger)
+    assert logger.handlers[0].messages == ['kept', 'GET /user/42 - 200']
@@ -0,0 +1,71 @@
+"""
+Unit tests for log_pipeline.py.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import io
+import logging
+import queue
+
+import pytest
+
+from log_pipeline import DROP_OLDEST, SAMPLE, BoundedQueueHandler, LogPipeline
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def test_message_is_rendered_when_logged_not_when_written():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    pipeline = LogPipeline([handler], flush_interval=0.01)
+    logger = make_logger('test.pipeline.args', pipeline.handler)
+
+    cart = ['apple']
+    logger.info('cart=%s', cart)
+    cart.append('pear')                 # caller reuses the object before the writer runs
+    pipeline.start()
+    pipeline.stop()
+    assert stream.getvalue() == "cart=['apple']\n"
+
+
+def test_prepared_record_has_no_args():
+    handler = BoundedQueueHandler(queue.Queue(10))
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, 'a=%d b=%s', (1, 'two'), None)
+    prepared = handler.prepare(record)
+    assert prepared.msg == 'a=1 b=two' and prepared.args is None
+    assert record.args == (1, 'two')    # the caller's record is untouched
+
+
+def test_drop_oldest_keeps_newest_records():
+    log_queue = queue.Queue(3)
+    handler = BoundedQueueHandler(log_queue, overflow=DROP_OLDEST)
+    logger = make_logger('test.pipeline.drop', handler)
+    for i in range(5):
+        logger.info('record %d', i)
+    assert [log_queue.get_nowait().msg for _ in range(3)] == ['record 2', 'record 3', 'record 4']
+    assert handler.stats['dropped'] == 2
+
+
+def test_sample_always_keeps_warnings():
+    log_queue = queue.Queue(10)
+    handler = BoundedQueueHandler(log_queue, overflow=SAMPLE, sample_rate=2, high_water=0.5)
+    logger = make_logger('test.pipeline.sample', handler)
+    for i in range(5):
+        logger.info('fill %d', i)           # up to the high-water mark
+    for i in range(4):
+        logger.info('sampled %d', i)
+    logger.warning('kept')
+    assert handler.stats['sampled_out'] == 2
+    assert log_queue.qsize() == 8
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(1), overflow='spill')
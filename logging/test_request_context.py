@@ -0,0 +1,109 @@
+"""
+Unit tests for request_context.py.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import logging
+import threading
+
+import pytest
+
+import request_context
+from request_context import RequestContextFilter, RequestIdGenerator
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger(f'test.context.{request.node.name}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [ListHandler()]
+    logger.filters = [RequestContextFilter()]
+    return logger
+
+
+def test_request_ids_are_unique_across_threads():
+    new_id = RequestIdGenerator('app1')
+    ids = []
+
+    def worker():
+        ids.extend(new_id() for _ in range(2000))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == len(ids) == 16000
+    assert all(i.startswith(new_id.prefix) for i in ids)
+
+
+def test_request_ids_carry_the_app_and_differ_per_process():
+    first, second = RequestIdGenerator('app1'), RequestIdGenerator('app1')
+    app, process, counter = first().split('-')
+    assert app == 'app1' and len(process) == 8 and counter == '1'
+    assert first.prefix != second.prefix
+    assert RequestIdGenerator('app2')().startswith('app2-')
+
+
+def test_fields_are_stamped_inside_a_request(logger):
+    token = request_context.start('app1-abc-1')
+    try:
+        logger.info('before bind')
+        request_context.bind(user_id='42')
+        logger.info('after bind')
+        logger.info('explicit', extra={'user_id': 'override'})
+        logger.info('summary', extra={'duration_ms': 12.5})
+    finally:
+        request_context.end(token)
+
+    before, after, explicit, summary = logger.handlers[0].records
+    assert before.request_id == 'app1-abc-1' and not hasattr(before, 'user_id')
+    assert after.request_id == 'app1-abc-1' and after.user_id == '42'
+    assert isinstance(after.elapsed_ms, float) and after.elapsed_ms >= 0
+    assert explicit.user_id == 'override'
+    # The summary line carries the total as duration_ms, not elapsed_ms
+    assert summary.duration_ms == 12.5 and not hasattr(summary, 'elapsed_ms')
+
+
+def test_records_outside_a_request_stay_clean(logger):
+    token = request_context.start('app1-abc-2', user_id='7')
+    request_context.end(token)
+    request_context.bind(user_id='ignored')      # no request: a no-op
+    logger.info('startup')
+
+    [record] = logger.handlers[0].records
+    assert request_context.current() is None
+    for name in ('request_id', 'user_id', 'elapsed_ms'):
+        assert not hasattr(record, name)
+
+
+def test_each_thread_sees_its_own_request(logger):
+    barrier = threading.Barrier(2)
+
+    def handle(request_id, user_id):
+        token = request_context.start(request_id)
+        try:
+            request_context.bind(user_id=user_id)
+            barrier.wait()                       # both requests are open at once
+            logger.info(request_id)
+        finally:
+            request_context.end(token)
+
+    threads = [threading.Thread(target=handle, args=(f'app1-abc-{n}', str(n))) for n in (1, 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert {(r.getMessage(), r.request_id, r.user_id) for r in logger.handlers[0].records} == {
+        ('app1-abc-1', 'app1-abc-1', '1'), ('app1-abc-2', 'app1-abc-2', '2')}
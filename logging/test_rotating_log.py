@@ -0,0 +1,112 @@
+"""
+Unit tests for rotating_log.py.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import glob
+import gzip
+import os
+import time
+
+import pytest
+
+import rotating_log
+from rotating_log import RotatingCompressedFileHandler
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    handlers = []
+
+    def make(**kwargs):
+        # sync_interval: the background thread stays out of the way, tests run housekeeping
+        kwargs = dict(dict(max_bytes=100, rotate_interval=0, backup_count=10, sync_interval=3600,
+                           compress_delay=0), **kwargs)
+        handler = RotatingCompressedFileHandler(str(tmp_path / 'app.log'), **kwargs)
+        handlers.append(handler)
+        return handler
+    yield make
+    for handler in handlers:
+        handler.close()
+
+
+def segments(tmp_path, pattern='app.log.*'):
+    return sorted(glob.glob(str(tmp_path / pattern)))
+
+
+def test_rotates_when_the_segment_is_full(tmp_path, make_handler):
+    handler = make_handler(max_bytes=100)
+    line = 'x' * 39 + '\n'
+    for _ in range(5):
+        handler.write_batch(line)
+    handler.flush()
+
+    rotated = segments(tmp_path)
+    assert handler.stats['rotations'] == 2 and len(rotated) == 2
+    assert all(os.path.getsize(path) == 80 for path in rotated)
+    assert os.path.getsize(tmp_path / 'app.log') == 40
+
+
+def test_rotates_when_the_segment_is_old(tmp_path, make_handler):
+    handler = make_handler(max_bytes=10 ** 6, rotate_interval=0.05)
+    handler.write_batch('first\n')
+    time.sleep(0.06)
+    handler.write_batch('second\n')
+    handler.flush()
+
+    [rotated] = segments(tmp_path)
+    assert open(rotated).read() == 'first\n'
+    assert open(tmp_path / 'app.log').read() == 'second\n'
+
+
+def test_compresses_and_keeps_backup_count(tmp_path, make_handler):
+    handler = make_handler(max_bytes=10, backup_count=2)
+    for i in range(5):
+        handler.write_batch(f'line {i:04d}\n')     # 10 bytes: one segment each
+    handler._housekeeping()
+
+    archives = segments(tmp_path, 'app.log.*.gz')
+    assert handler.stats['rotations'] == 4 and handler.stats['compressed'] == 4
+    assert len(archives) == 2 and handler.stats['deleted'] == 2
+    # The newest survive, and no uncompressed segment or .tmp is left
+    assert sorted(gzip.open(path, 'rt').read() for path in archives) == ['line 0002\n', 'line 0003\n']
+    assert segments(tmp_path) == archives
+    assert handler.info()['pending_compression'] == 0
+
+
+def test_failed_compression_is_retried(tmp_path, make_handler, monkeypatch, capsys):
+    handler = make_handler(max_bytes=10)
+    handler.write_batch('line 0000\n')
+    handler.write_batch('line 0001\n')
+    handler.write_batch('line 0002\n')
+
+    def disk_full(src, dst, length=0):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(rotating_log.shutil, 'copyfileobj', disk_full)
+    handler._housekeeping()
+
+    # Both segments still queued and on disk, no .gz.tmp left behind
+    assert handler.stats['compress_errors'] == 2 and handler.stats['compressed'] == 0
+    assert handler.info()['pending_compression'] == 2
+    assert len(segments(tmp_path)) == 2 and not segments(tmp_path, '*.tmp')
+    assert 'No space left on device' in capsys.readouterr().err
+
+    # Not retried on the next tick...
+    monkeypatch.undo()
+    handler._housekeeping()
+    assert handler.stats['compressed'] == 0
+    # ...then compressed once the disk has room
+    handler._pending = [(0, path) for _, path in handler._pending]
+    handler._housekeeping()
+    assert handler.stats['compressed'] == 2
+    archives = segments(tmp_path, 'app.log.*.gz')
+    assert sorted(gzip.open(path, 'rt').read() for path in archives) == ['line 0000\n', 'line 0001\n']
+
+
+def test_leftovers_of_a_previous_run_are_compressed(tmp_path, make_handler):
+    (tmp_path / 'app.log.20240115-103045').write_text('old\n')
+    (tmp_path / 'app.log.20240115-103045.gz.tmp').write_text('half')
+    handler = make_handler()
+    handler._housekeeping()
+    assert segments(tmp_path) == [str(tmp_path / 'app.log.20240115-103045.gz')]
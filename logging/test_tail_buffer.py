@@ -0,0 +1,87 @@
+"""
+Unit tests for tail_buffer.py.
+
+    pip install pytest && python -m pytest -q
+"""
+
+import logging
+
+import pytest
+
+from tail_buffer import TailBuffer
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def setup(request):
+    logger = logging.getLogger(f'test.tail.{request.node.name}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = ListHandler()
+    logger.handlers = [handler]
+    tail = TailBuffer(logger, slow_ms=100, sample_rate=0, max_records=3)
+    logger.filters = [tail]
+    return logger, handler, tail
+
+
+def run_request(logger, tail, status=200, duration_ms=5, messages=('a', 'b'), level=logging.INFO):
+    token = tail.start()
+    for message in messages:
+        logger.log(level, message)
+    result = tail.finish(status, duration_ms)
+    logger.info('summary')
+    tail.end(token)
+    return result
+
+
+def test_fast_successful_request_keeps_only_the_summary(setup):
+    logger, handler, tail = setup
+    assert run_request(logger, tail) == (None, 2)
+    assert handler.messages == ['summary']
+    assert tail.stats['records_dropped'] == 2 and tail.stats['summarized'] == 1
+
+
+@pytest.mark.parametrize('kwargs, reason', [
+    ({'status': 503}, 'error'),
+    ({'level': logging.ERROR}, 'error'),
+    ({'duration_ms': 150}, 'slow'),
+])
+def test_interesting_requests_keep_every_record(setup, kwargs, reason):
+    logger, handler, tail = setup
+    assert run_request(logger, tail, **kwargs) == (reason, 2)
+    assert handler.messages == ['a', 'b', 'summary']
+
+
+def test_sampled_requests_are_kept(setup):
+    logger, handler, tail = setup
+    tail.sample_rate = 1.0
+    assert run_request(logger, tail)[0] == 'sampled'
+
+
+def test_buffer_is_capped_oldest_first(setup):
+    logger, handler, tail = setup
+    assert run_request(logger, tail, status=500, messages='abcde') == ('error', 5)
+    assert handler.messages == ['c', 'd', 'e', 'summary']
+    assert tail.stats['records_written'] == 3 and tail.stats['records_dropped'] == 2
+
+
+def test_aborted_request_writes_what_it_buffered(setup):
+    logger, handler, tail = setup
+    token = tail.start()
+    logger.info('before the crash')
+    tail.end(token)                     # finish() never ran
+    assert handler.messages == ['before the crash']
+
+
+def test_records_outside_a_request_pass_through(setup):
+    logger, handler, tail = setup
+    logger.info('startup')
+    assert handler.messages == ['startup']
@@ -1,19 +1,68 @@
-from flask import Flask, jsonify, Response
+from flask import Flask, jsonify, Response, g, request
 import os
 import time
 
+from metrics import DEFAULT_BUCKETS, ProcessCollector, Registry
+
 app = Flask(__name__)
 SERVER_NAME = os.getenv('SERVER_NAME', 'unknown')
-REQUEST_COUNT = 0
 START_TIME = time.time()
 
+# Under gunicorn every worker writes its metrics to this directory and /metrics merges them
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+BUCKETS = tuple(float(b) for b in os.getenv('LATENCY_BUCKETS', '').split(',') if b) or DEFAULT_BUCKETS
+
+registry = Registry(const_labels={'server': SERVER_NAME}, multiprocess_dir=MULTIPROC_DIR)
+REQUEST_COUNT = registry.counter(
+    'app_requests_total', 'Total requests handled', ('route', 'method', 'status'))
+REQUEST_LATENCY = registry.histogram(
+    'app_request_duration_seconds', 'Request latency', ('route', 'method', 'status'), buckets=BUCKETS)
+IN_FLIGHT = registry.gauge('app_requests_in_flight', 'Requests being handled right now, this scrape included')
+WORKERS = registry.gauge('app_worker_processes', 'Worker processes serving requests')
+UP = registry.gauge('app_up', 'Server is up', multiprocess_mode='max')
+UPTIME = registry.gauge('app_uptime_seconds', 'Server uptime in seconds', multiprocess_mode='max')
+WORKERS.set(1)      # summed over live workers in multiprocess mode
+ProcessCollector(registry)
+registry.add_collector(lambda: (UP.set(1), UPTIME.set(round(time.time() - START_TIME, 2))))
+
+
+def route_label():
+    # The URL rule, not the raw path: bounded label values
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+@app.before_request
+def start_timer():
+    # Count the scrape too: it needs a free worker, so without it in-flight / workers
+    # could never reach 1 - with it, 1 means every other worker was busy
+    IN_FLIGHT.inc()
+    g.in_flight = True
+    if request.path != '/metrics':
+        g.start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    if 'start' in g:
+        labels = {'route': route_label(), 'method': request.method, 'status': response.status_code}
+        REQUEST_LATENCY.observe(time.perf_counter() - g.start, **labels)
+        REQUEST_COUNT.inc(**labels)
+    return response
+
+
+@app.teardown_request
+def end_request(exc):
+    # Runs even when the view raised, so the gauge can't leak
+    if g.pop('in_flight', False):
+        IN_FLIGHT.dec()
+
+
 @app.route('/')
 def home():
-    global REQUEST_COUNT
-    REQUEST_COUNT += 1
     return jsonify({
         'server': SERVER_NAME,
-        'request_count': REQUEST_COUNT,
+        # this worker's count, including this request (after_request hasn't counted it yet)
+        'request_count': REQUEST_COUNT.value(route='/', method='GET', status=200) + 1,
         'message': f'Handled by {SERVER_NAME}'
     })
 
@@ -34,20 +83,7 @@ def health():
 @app.route('/metrics')
 def metrics():
     """Prometheus metrics endpoint"""
-    uptime = time.time() - START_TIME
-    metrics_output = f"""# HELP app_requests_total Total requests handled
-# TYPE app_requests_total counter
-app_requests_total{{server="{SERVER_NAME}"}} {REQUEST_COUNT}
-
-# HELP app_up Server is up
-# TYPE app_up gauge
-app_up{{server="{SERVER_NAME}"}} 1
-
-# HELP app_uptime_seconds Server uptime in seconds
-# TYPE app_uptime_seconds gauge
-app_uptime_seconds{{server="{SERVER_NAME}"}} {uptime:.2f}
-"""
-    return Response(metrics_output, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain')
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
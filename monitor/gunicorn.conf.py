@@ -0,0 +1,14 @@
+# gunicorn -c gunicorn.conf.py app:app
+import os
+import shutil
+
+bind = '0.0.0.0:5000'
+workers = int(os.getenv('WORKERS', 2))
+
+
+def on_starting(server):
+    # Metrics files of a previous run would be added to this run's totals
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
@@ -0,0 +1,305 @@
+"""
+Prometheus metrics without a client library: counters, gauges and histograms
+with labels, safe to update from many threads, rendered in the text format.
+
+    registry = Registry(const_labels={'server': 'backend1'})
+    requests = registry.counter('app_requests_total', 'Requests', ('route', 'method', 'status'))
+    requests.inc(route='/', method='GET', status='200')
+    latency = registry.histogram('app_request_duration_seconds', 'Latency', ('route',), buckets=(0.1, 1))
+    latency.observe(0.042, route='/')
+    registry.render()
+
+Multiprocess mode (gunicorn): each worker has its own memory, so a scrape
+that lands on one worker would only see that worker's numbers. With
+multiprocess_dir set, every worker dumps its values to <dir>/metrics_<pid>.json
+once per flush_interval (and at exit), and render() merges all files:
+
+    counters, histograms   summed over every file, dead workers too -
+                           a restarted worker must not make totals go down
+    gauges                 summed over live workers (multiprocess_mode='livesum'),
+                           or the largest live value ('max': uptime, up)
+
+The scraped worker uses its own live values, the others are at most
+flush_interval old. Clear the directory when the server starts (gunicorn.conf.py).
+"""
+
+import atexit
+import bisect
+import json
+import math
+import os
+import resource
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + ','.join(pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('counters only go up')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """For collectors that mirror a counter the OS keeps (CPU seconds)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self, values):
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), multiprocess_mode='livesum'):
+        super().__init__(name, help_text, labelnames)
+        if multiprocess_mode not in ('livesum', 'max'):
+            raise ValueError(f'unknown multiprocess_mode: {multiprocess_mode}')
+        self.multiprocess_mode = multiprocess_mode
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self.set_total(value, **labels)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # one count per bucket, one for +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+    def samples(self, values):
+        bounds = tuple(_format_value(b) for b in self.buckets + (math.inf,))
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield self.name + '_bucket', key + (bound,), cumulative
+            yield self.name + '_sum', key, counts[-1]
+            yield self.name + '_count', key, cumulative
+
+
+class Registry:
+    def __init__(self, const_labels=None, multiprocess_dir=None, flush_interval=1.0):
+        self.const_labels = dict(const_labels or {})
+        self.metrics = []
+        self.collectors = []
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        if multiprocess_dir:
+            os.makedirs(multiprocess_dir, exist_ok=True)
+            self._start_writer()
+            # gunicorn --preload forks after import: each worker needs its own writer thread
+            os.register_at_fork(after_in_child=self._start_writer)
+            atexit.register(self._dump)
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), multiprocess_mode='livesum'):
+        return self._add(Gauge(name, help_text, labelnames, multiprocess_mode))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """collect() runs before every render / dump, to refresh metrics it owns."""
+        self.collectors.append(collect)
+
+    def snapshot(self):
+        for collect in self.collectors:
+            collect()
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self):
+        values = self.snapshot()
+        if self.multiprocess_dir:
+            values = self._merge(values)
+
+        const_names = tuple(self.const_labels)
+        const_values = tuple(self.const_labels.values())
+        out = []
+        for metric in self.metrics:
+            out.append(f'# HELP {metric.name} {metric.help}')
+            out.append(f'# TYPE {metric.name} {metric.type}')
+            names = const_names + metric.labelnames
+            for sample_name, key, value in metric.samples(values[metric.name]):
+                sample_names = names + ('le',) if len(key) > len(metric.labelnames) else names
+                out.append(f'{sample_name}{_format_labels(sample_names, const_values + key)} '
+                           f'{_format_value(value)}')
+        return '\n'.join(out) + '\n'
+
+    # --- multiprocess mode ---
+
+    def _path(self, pid):
+        return os.path.join(self.multiprocess_dir, f'metrics_{pid}.json')
+
+    def _start_writer(self):
+        thread = threading.Thread(target=self._write_loop, name='metrics-writer', daemon=True)
+        thread.start()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self._dump()
+            except OSError:
+                pass    # disk trouble: try again next tick
+
+    def _dump(self):
+        data = {name: [[list(key), value] for key, value in values.items()]
+                for name, values in self.snapshot().items()}
+        path = self._path(os.getpid())
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _merge(self, own):
+        merged = {name: {} for name in own}
+        metrics = {metric.name: metric for metric in self.metrics}
+        me = os.getpid()
+        for entry in os.listdir(self.multiprocess_dir):
+            if not (entry.startswith('metrics_') and entry.endswith('.json')):
+                continue
+            pid = int(entry[len('metrics_'):-len('.json')])
+            if pid == me:
+                continue
+            live = _alive(pid)
+            try:
+                with open(os.path.join(self.multiprocess_dir, entry)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue    # worker is replacing its file right now
+            for name, samples in data.items():
+                if name not in merged or (metrics[name].type == 'gauge' and not live):
+                    continue
+                for key, value in samples:
+                    _accumulate(merged[name], tuple(key), value, metrics[name])
+        for name, values in own.items():
+            for key, value in values.items():
+                _accumulate(merged[name], key, value, metrics[name])
+        return merged
+
+
+def _accumulate(values, key, value, metric):
+    current = values.get(key)
+    if current is None:
+        values[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        values[key] = [a + b for a, b in zip(current, value)]
+    elif getattr(metric, 'multiprocess_mode', None) == 'max':
+        values[key] = max(current, value)
+    else:
+        values[key] = current + value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ProcessCollector:
+    """process_cpu_seconds_total, process_resident_memory_bytes, process_open_fds (summed over workers)."""
+
+    def __init__(self, registry):
+        self.cpu = registry.counter('process_cpu_seconds_total', 'User + system CPU time of the process')
+        self.rss = registry.gauge('process_resident_memory_bytes', 'Resident memory size')
+        self.fds = registry.gauge('process_open_fds', 'Open file descriptors')
+        registry.add_collector(self.collect)
+        self._page_size = resource.getpagesize()
+
+    def collect(self):
+        times = os.times()
+        self.cpu.set_total(times.user + times.system)
+        try:
+            with open('/proc/self/statm') as f:
+                self.rss.set(int(f.read().split()[1]) * self._page_size)
+            self.fds.set(len(os.listdir('/proc/self/fd')))
+        except OSError:
+            # Not Linux: peak RSS is the closest thing available
+            self.rss.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
@@ -12,6 +12,29 @@ for i in {1..6}; do
 done
 echo ""
 
+echo ">>> Checking backend /metrics..."
+metrics=$(curl -s http://localhost:80/metrics)
+for name in app_requests_total app_request_duration_seconds_bucket app_requests_in_flight app_worker_processes; do
+    if echo "$metrics" | grep -q "^$name{"; then
+        echo "  PASS: $name"
+    else
+        echo "  FAIL: $name missing"
+    fi
+done
+if echo "$metrics" | grep -q 'route="/metrics"'; then
+    echo "  FAIL: the scrape is counted as a request"
+else
+    echo "  PASS: the scrape is not counted as a request"
+fi
+# The scrape itself is in flight, so an idle backend reports at least 1
+in_flight=$(echo "$metrics" | awk '/^app_requests_in_flight\{/ {print $2}')
+if [ "${in_flight:-0}" -ge 1 ] 2>/dev/null; then
+    echo "  PASS: app_requests_in_flight counts the scrape ($in_flight)"
+else
+    echo "  FAIL: app_requests_in_flight is ${in_flight:-missing}, expected >= 1"
+fi
+echo ""
+
 echo ">>> Checking Prometheus targets..."
 curl -s http://localhost:9090/api/v1/targets | jq '.data.activeTargets[] | {instance: .labels.instance, health: .health}'
 echo ""
@@ -0,0 +1,130 @@
+"""
+Unit tests for metrics.py and the /metrics endpoint of app.py.
+
+    pip install pytest flask && python -m pytest -q test_metrics.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from metrics import Registry
+
+
+def sample(text, line_start):
+    """Value of the one sample line starting with line_start."""
+    values = [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_start + ' ')]
+    assert len(values) == 1, f'{line_start}: {values}'
+    return values[0]
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+def test_render_counters_gauges_and_histograms():
+    registry = Registry(const_labels={'server': 'b1'})
+    requests = registry.counter('reqs_total', 'Requests', ('route', 'status'))
+    in_flight = registry.gauge('in_flight', 'In flight')
+    latency = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1))
+    requests.inc(route='/', status=200)
+    requests.inc(2, route='/', status=200)
+    in_flight.inc()
+    for seconds in (0.05, 0.5, 5):
+        latency.observe(seconds, route='/heavy')
+
+    text = registry.render()
+    assert '# TYPE reqs_total counter' in text and '# TYPE latency_seconds histogram' in text
+    assert sample(text, 'reqs_total{server="b1",route="/",status="200"}') == '3'
+    assert sample(text, 'in_flight{server="b1"}') == '1'
+    assert sample(text, 'latency_seconds_bucket{server="b1",route="/heavy",le="0.1"}') == '1'
+    assert sample(text, 'latency_seconds_bucket{server="b1",route="/heavy",le="1.0"}') == '2'
+    assert sample(text, 'latency_seconds_bucket{server="b1",route="/heavy",le="+Inf"}') == '3'
+    assert sample(text, 'latency_seconds_sum{server="b1",route="/heavy"}') == '5.55'
+    assert sample(text, 'latency_seconds_count{server="b1",route="/heavy"}') == '3'
+
+
+def test_label_values_are_escaped_and_checked():
+    registry = Registry()
+    requests = registry.counter('reqs_total', 'Requests', ('route',))
+    requests.inc(route='/a"b\\c\n')
+    assert 'reqs_total{route="/a\\"b\\\\c\\n"} 1' in registry.render()
+    with pytest.raises(ValueError):
+        requests.inc(route='/', status=200)
+    with pytest.raises(ValueError):
+        requests.inc(-1, route='/')
+
+
+def test_multiprocess_merge(tmp_path):
+    registry = Registry(multiprocess_dir=str(tmp_path), flush_interval=3600)
+    requests = registry.counter('reqs_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency', (), buckets=(1,))
+    in_flight = registry.gauge('in_flight', 'In flight')
+    uptime = registry.gauge('uptime_seconds', 'Uptime', multiprocess_mode='max')
+    requests.inc(route='/')
+    latency.observe(0.5)
+    in_flight.set(1)
+    uptime.set(10)
+
+    def worker_file(pid, reqs, in_flight, uptime):
+        data = {'reqs_total': [[['/'], reqs]], 'latency_seconds': [[[], [0, 1, 2.0]]],
+                'in_flight': [[[], in_flight]], 'uptime_seconds': [[[], uptime]]}
+        (tmp_path / f'metrics_{pid}.json').write_text(json.dumps(data))
+
+    worker_file(os.getppid(), reqs=5, in_flight=2, uptime=30)    # another live worker
+    worker_file(dead_pid(), reqs=7, in_flight=4, uptime=99)      # a worker that died
+    (tmp_path / 'metrics_1.json.tmp').write_text('{half written')
+
+    text = registry.render()
+    # Counters and histograms: every worker, dead ones too
+    assert sample(text, 'reqs_total{route="/"}') == '13'
+    assert sample(text, 'latency_seconds_bucket{le="1.0"}') == '1'
+    assert sample(text, 'latency_seconds_bucket{le="+Inf"}') == '3'
+    assert sample(text, 'latency_seconds_sum') == '4.5'
+    # Gauges: live workers only - summed, or the largest for 'max'
+    assert sample(text, 'in_flight') == '3'
+    assert sample(text, 'uptime_seconds') == '30'
+
+
+def test_dump_writes_this_workers_file(tmp_path):
+    registry = Registry(multiprocess_dir=str(tmp_path), flush_interval=3600)
+    registry.counter('reqs_total', 'Requests').inc(4)
+    registry._dump()
+    data = json.loads((tmp_path / f'metrics_{os.getpid()}.json').read_text())
+    assert data == {'reqs_total': [[[], 4]]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pytest.importorskip('flask')
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    monkeypatch.setenv('SERVER_NAME', 'backend1')
+    sys.modules.pop('app', None)
+    import app
+    return app.app.test_client()
+
+
+def test_scrape_counts_itself_in_flight(client):
+    text = client.get('/metrics').get_data(as_text=True)
+    # The scrape holds the only worker: in-flight / workers reaches 1, so BackendSaturated can fire
+    assert sample(text, 'app_requests_in_flight{server="backend1"}') == '1'
+    assert sample(text, 'app_worker_processes{server="backend1"}') == '1'
+    # ...but it is not a request in the counters, and it leaves the gauge when it ends
+    assert 'route="/metrics"' not in text
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'app_requests_in_flight{server="backend1"}') == '1'
+
+
+def test_requests_are_labelled_by_route(client):
+    client.get('/health')
+    client.get('/no/such/page')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'app_requests_total{server="backend1",route="/health",method="GET",status="200"}') == '1'
+    assert sample(text, 'app_requests_total{server="backend1",route="unmatched",method="GET",status="404"}') == '1'
+    assert sample(text, 'app_request_duration_seconds_count{server="backend1",route="/health",'
+                        'method="GET",status="200"}') == '1'